@@ -0,0 +1,165 @@
+"""API HTTP de consulta aos mesmos agregados do dashboard, sem sessão do Shiny.
+
+Rotas (montadas em ``ROTA_API`` ao lado do app):
+
+- ``/operacional``: métricas, load factor e destinos por empresa, por mês,
+  trimestre ou no total (``nivel``), filtradas por ``inicio``/``fim``
+  (AAAA-MM-DD), ``nacionalidade`` e ``empresa``;
+- ``/financeiro``: saldos por conta, empresa e período, filtrados por
+  ``conta`` (descrição), ``empresa``, ``periodo`` e ``tipo_saldo``.
+
+Filtros com vários valores são repetidos na query (``empresa=AZU&empresa=GLO``).
+A resposta sai em blocos, como JSON, CSV ou Arrow IPC (``formato``). O ETag
+combina a versão do snapshot com a consulta, então um GET condicional
+(``If-None-Match``) responde 304 enquanto os dados não mudarem.
+"""
+import hashlib
+import io
+import json
+
+import pandas as pd
+import pyarrow as pa
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route, Router
+
+from cubo import NIVEIS, agregar_por_empresa, filtrar_selecao
+from financeiro import SALDO_PADRAO, empresas_disponiveis, tabela_contas
+from metricas import metricas
+
+
+ROTA_API = '/api'
+LINHAS_BLOCO = 10_000
+
+FORMATOS = {
+    'json': 'application/json',
+    'csv': 'text/csv; charset=utf-8',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+
+class ConsultaInvalida(ValueError):
+    """Parâmetro de consulta ausente ou com valor inválido"""
+
+
+def _valores(request, nome):
+    return [valor for valor in request.query_params.getlist(nome) if valor]
+
+
+def _data(request, nome, padrao):
+    valor = request.query_params.get(nome)
+    if not valor:
+        return padrao
+    try:
+        return pd.Timestamp(valor)
+    except ValueError:
+        raise ConsultaInvalida(f"{nome}: data inválida {valor!r}") from None
+
+
+def _opcao(request, nome, opcoes, padrao):
+    valor = request.query_params.get(nome) or padrao
+    if valor not in opcoes:
+        raise ConsultaInvalida(f"{nome}: use um de {', '.join(opcoes)}")
+    return valor
+
+
+def consultar_operacional(snapshot, request):
+    """Tabela de indicadores operacionais por empresa para os filtros da query"""
+    cubo = snapshot.cubo
+    nivel = _opcao(request, 'nivel', list(NIVEIS), 'mensal')
+    inicio = _data(request, 'inicio', cubo['dt_referencia'].min())
+    fim = _data(request, 'fim', cubo['dt_referencia'].max())
+    empresas = _valores(request, 'empresa') or cubo['EMPRESA (SIGLA)'].unique().tolist()
+    nacionalidades = _valores(request, 'nacionalidade')
+    if nacionalidades:
+        # O índice de destinos não tem a nacionalidade: o filtro vira um filtro de empresas
+        da_nacionalidade = cubo.loc[cubo['EMPRESA (NACIONALIDADE)'].isin(nacionalidades), 'EMPRESA (SIGLA)'].unique()
+        empresas = [empresa for empresa in empresas if empresa in set(da_nacionalidade)]
+
+    cubo, destinos = filtrar_selecao(cubo, snapshot.indice_destinos, inicio, fim, empresas)
+    df = agregar_por_empresa(cubo, destinos, nivel)
+    df['EMPRESA (SIGLA)'] = df['EMPRESA (SIGLA)'].astype(str)
+    if nivel == 'trimestral':
+        df['quarter'] = df['quarter'].astype(str)
+    return df
+
+
+def consultar_financeiro(snapshot, request):
+    """Tabela de saldos por conta, empresa e período para os filtros da query"""
+    contas = _valores(request, 'conta')
+    if not contas:
+        raise ConsultaInvalida("conta: informe ao menos uma descrição de conta")
+    empresas = _valores(request, 'empresa') or empresas_disponiveis(snapshot.financeiro)
+    tipo_saldo = request.query_params.get('tipo_saldo') or SALDO_PADRAO
+    return tabela_contas(snapshot.financeiro, contas, empresas, _valores(request, 'periodo'), tipo_saldo)
+
+
+def etag(versao, request):
+    """ETag da consulta em uma versão dos dados; None para dados sem versão publicada"""
+    if versao is None:
+        return None
+    consulta = sorted(request.query_params.multi_items())
+    digest = hashlib.sha256(json.dumps([request.url.path, consulta]).encode()).hexdigest()[:16]
+    return f'"{versao}-{digest}"'
+
+
+def _blocos_json(df):
+    yield b'['
+    for inicio in range(0, len(df), LINHAS_BLOCO):
+        registros = df.iloc[inicio:inicio + LINHAS_BLOCO].to_json(orient='records', date_format='iso', force_ascii=False)
+        yield (b',' if inicio else b'') + registros[1:-1].encode()
+    yield b']'
+
+
+def _blocos_csv(df):
+    for inicio in range(0, len(df), LINHAS_BLOCO):
+        yield df.iloc[inicio:inicio + LINHAS_BLOCO].to_csv(index=False, header=inicio == 0).encode()
+    if df.empty:
+        yield df.to_csv(index=False).encode()
+
+
+def _blocos_arrow(df):
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    buffer = io.BytesIO()
+    with pa.ipc.new_stream(buffer, tabela.schema) as writer:
+        for lote in tabela.to_batches(max_chunksize=LINHAS_BLOCO):
+            writer.write_batch(lote)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+BLOCOS = {
+    'json': _blocos_json,
+    'csv': _blocos_csv,
+    'arrow': _blocos_arrow,
+}
+
+
+def criar_api(obter_snapshot):
+    """Router com as rotas da API; ``obter_snapshot`` retorna o snapshot corrente"""
+
+    def rota(nome, consultar):
+        # Endpoints síncronos: o Starlette os executa no pool de threads
+        def endpoint(request):
+            snapshot = obter_snapshot()
+            tag = etag(snapshot.versao, request)
+            cabecalhos = {'Cache-Control': 'no-cache'}
+            if tag is not None:
+                cabecalhos['ETag'] = tag
+                if tag in request.headers.get('if-none-match', ''):
+                    return Response(status_code=304, headers=cabecalhos)
+            try:
+                formato = _opcao(request, 'formato', list(FORMATOS), 'json')
+                with metricas.medir(f'api.{nome}') as medicao:
+                    df = consultar(snapshot, request)
+                    medicao.linhas = len(df)
+            except ConsultaInvalida as erro:
+                return JSONResponse({'erro': str(erro)}, status_code=400)
+            return StreamingResponse(BLOCOS[formato](df), media_type=FORMATOS[formato], headers=cabecalhos)
+        return Route(f'/{nome}', endpoint, methods=['GET'])
+
+    return Router(routes=[
+        rota('operacional', consultar_operacional),
+        rota('financeiro', consultar_financeiro),
+    ])
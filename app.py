@@ -1,50 +1,94 @@
-from shiny import App, render, ui, reactive
+import time
+
+# Referência do tempo de inicialização reportado no boot
+inicio_app = time.perf_counter()
+
+from shiny import App, reactive, render, req, ui
 from shiny.types import ImgData
+from starlette.responses import FileResponse, PlainTextResponse, Response
+from starlette.routing import Mount, Route
 from shinywidgets import output_widget, render_widget
-import pandas as pd
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import plotly.express as px
+import functools
 import os
 
+from api import ROTA_API, criar_api
+from cache_figuras import CacheFiguras
+from cubo import MESES_COMPARACAO, agregar_selecao, comparar_selecao, filtrar_selecao
+from exportacao import FORMATOS_EXPORTACAO, NIVEIS_FINANCEIRO, NIVEIS_OPERACIONAL, lotes_agregados, lotes_financeiro, lotes_rotas, serializar
+from figuras import ARQUIVO_WIDGET, ROTA_WIDGET, como_widget, figura_empresas_aeroporto, figura_financeiro, figura_rpk_ask_load_factor, figura_serie_rota, figura_trimestral
+from financeiro import CONTAS_KPI, empresas_disponiveis, periodos_disponiveis, saldos_comparacao, saldos_periodo
+from formatacao import format_numbers, format_percent
+from metricas import ROTA_METRICAS, PrimeiraResposta, metricas
+from padrao import EMPRESAS_PADRAO, figura, saidas_padrao, textos_financeiros, textos_operacionais
+from rotas import empresas_aeroporto, serie_rota, top_rotas
+from reatividade import debounce, invocar_mais_recente, iterar_em_thread, resultado_da_chave, tarefa_com_chave
+from snapshot import ObservadorSnapshot
+
 
 logo_path = os.path.join(os.path.dirname(__file__), 'assets', 'vlls_logo.png')
 
-file_operacional_path = os.path.join(os.path.dirname(__file__), 'data', 'anac_dados_estatisticos.csv')
-file_financeiro_path = os.path.join(os.path.dirname(__file__), 'data', 'demonstrativos.csv')
+# Snapshot publicado por snapshot.py, compartilhado via memory-map entre os workers.
+# Novas versões são carregadas em segundo plano e trocadas sem reiniciar o app.
+observador_snapshot = ObservadorSnapshot()
+observador_snapshot.iniciar()
+
+
+@reactive.poll(lambda: observador_snapshot.atual.versao, interval_secs=5)
+def dados_dashboard():
+    return observador_snapshot.atual
+
 
-df_operacional = pd.read_csv(file_operacional_path)
-df_operacional['dt_referencia'] = pd.to_datetime(df_operacional['dt_referencia'], format='%Y-%m-%d').dt.date
-date_min = df_operacional['dt_referencia'].min()
-date_max = df_operacional['dt_referencia'].max()
+# Figuras compartilhadas entre as sessões do worker, invalidadas a cada nova versão dos dados
+cache_figuras = CacheFiguras()
+metricas.observar_cache(cache_figuras)
+metricas.iniciar_log()
 
-df_financeiro = pd.read_csv(file_financeiro_path)
-periodo_fin = df_financeiro['periodo'].sort_values(ascending=False).unique().tolist()
-empresas_fin = df_financeiro['empresa'].sort_values().unique().tolist()
+# Tempo sem mudanças no período/empresas antes de recalcular os indicadores
+ATRASO_FILTROS = 0.4
 
-color_mapping = {
-    'AZU': '#53B2E5',
-    'GLO': '#EE793A',
-    'TAM': '#D93555',
+# Modos de comparação das duas abas (chaves de cubo.MESES_COMPARACAO)
+OPCOES_COMPARACAO = {
+    'nenhuma': 'Sem comparação',
+    'yoy': 'Ano anterior',
+    'qoq': 'Trimestre anterior',
 }
 
-def format_number(value):
-    """Formata números com abreviações K, M, B"""
-    if pd.isna(value) or value == 0:
-        return '0'
-    
-    abs_value = abs(value)
-    sign = '-' if value < 0 else ''
-    
-    if abs_value >= 1e9:
-        return f'{sign}{abs_value/1e9:.1f}B'
-    elif abs_value >= 1e6:
-        return f'{sign}{abs_value/1e6:.1f}M'
-    elif abs_value >= 1e3:
-        return f'{sign}{abs_value/1e3:.1f}K'
-    else:
-        return f'{sign}{abs_value:.0f}'
-    
+# Métricas do explorador de rotas
+METRICAS_ROTAS = {
+    'RPK': 'RPK',
+    'ASK': 'ASK',
+    'PASSAGEIROS PAGOS': 'Passageiros pagos',
+    'DECOLAGENS': 'Decolagens',
+}
+N_ROTAS = 10
+
+
+def calcular_agregados(dados, date_range, empresas, comparacao='nenhuma'):
+    """Agregados operacionais de uma seleção e, se pedido, do período anterior; roda fora do event loop"""
+    with metricas.medir('calcular_agregados') as medicao:
+        if comparacao in MESES_COMPARACAO:
+            return comparar_selecao(dados.cubo, dados.indice_destinos, date_range[0], date_range[1], empresas, MESES_COMPARACAO[comparacao])
+        cubo, destinos = filtrar_selecao(dados.cubo, dados.indice_destinos, date_range[0], date_range[1], empresas)
+        medicao.linhas = len(cubo)
+        return agregar_selecao(cubo, destinos), None
+
+
+def opcoes_filtros(snapshot):
+    """Limites de datas e nacionalidades disponíveis em uma versão dos dados"""
+    cubo = snapshot.cubo
+    return {
+        'date_min': cubo['dt_referencia'].min().date(),
+        'date_max': cubo['dt_referencia'].max().date(),
+        'nacionalidades': cubo['EMPRESA (NACIONALIDADE)'].sort_values().unique().tolist(),
+    }
+
+
+# A UI operacional é montada com a versão dos dados disponível no import; a
+# financeira só quando a aba é aberta (aba_financeira), junto com os demonstrativos
+versao_ui = observador_snapshot.atual.versao
+opcoes_ui = opcoes_filtros(observador_snapshot.atual)
+date_min = opcoes_ui['date_min']
+date_max = opcoes_ui['date_max']
 
 kpis_operacionais = ui.layout_sidebar(
     ui.sidebar(
@@ -64,7 +108,7 @@ kpis_operacionais = ui.layout_sidebar(
         ui.input_selectize(
             "select_nacionalidade",
             "Nacionalidade Empresa",
-            choices=df_operacional['EMPRESA (NACIONALIDADE)'].sort_values().unique().tolist(),
+            choices=opcoes_ui['nacionalidades'],
             selected="BRASILEIRA",
             multiple=True,
         ),
@@ -72,9 +116,27 @@ kpis_operacionais = ui.layout_sidebar(
             "select_empresa",
             "Empresa",
             choices=[],
-            selected=['AZU', 'GLO', 'TAM'],
+            selected=EMPRESAS_PADRAO,
             multiple=True
         ),
+        ui.input_radio_buttons(
+            "comparacao",
+            "Comparar com",
+            choices=OPCOES_COMPARACAO,
+        ),
+        ui.input_select(
+            "nivel_exportacao",
+            "Exportar",
+            choices=NIVEIS_OPERACIONAL,
+            selected='mensal',
+        ),
+        ui.input_radio_buttons(
+            "formato_exportacao",
+            None,
+            choices=FORMATOS_EXPORTACAO,
+            inline=True,
+        ),
+        ui.download_button("download_operacional", "Baixar dados"),
         bg="#f8f8f8",
         open="always",
         fillable=True,
@@ -132,72 +194,162 @@ kpis_operacionais = ui.layout_sidebar(
     )
 )
 
-kpis_financeiros = ui.layout_sidebar(
+indice_rotas_ui = observador_snapshot.atual.indice_rotas
+
+explorador_rotas = ui.layout_sidebar(
     ui.sidebar(
-        ui.h2("Indicadores Financeiros"),
-        ui.input_selectize(
-            "select_periodo_fin",
+        ui.h2("Rotas"),
+        ui.input_date_range(
+            "select_date_rotas",
             "Período",
-            choices=periodo_fin,
-            selected=periodo_fin[0],
-            multiple=False,
+            start=date_min,
+            end=date_max,
+            min=date_min,
+            max=date_max,
+            format="mm/yyyy",
+            startview="year",
+            separator=" a "
         ),
         ui.input_selectize(
-            "select_empresa_fin",
+            "select_empresa_rotas",
             "Empresa",
-            choices=empresas_fin,
-            selected=empresas_fin,
+            choices=indice_rotas_ui.empresas.tolist(),
             multiple=True,
+            options={"placeholder": "Todas"},
+        ),
+        ui.input_select(
+            "metrica_rotas",
+            "Ordenar por",
+            choices=METRICAS_ROTAS,
+        ),
+        ui.input_numeric(
+            "n_rotas",
+            "Número de rotas",
+            value=N_ROTAS,
+            min=1,
+            max=50,
+        ),
+        ui.input_selectize(
+            "select_rota",
+            "Rota",
+            choices=[],
+        ),
+        ui.input_selectize(
+            "select_aeroporto",
+            "Aeroporto",
+            choices=indice_rotas_ui.aeroportos.tolist(),
         ),
         bg="#f8f8f8",
         open="always",
         fillable=True,
     ),
     ui.layout_columns(
-        ui.value_box(
-            "Receita Operacional Líquida",
-            ui.output_text("kpi_receita_operacional"),
-            fill=False
-        ),
-        ui.value_box(
-            "Custo do Serviços Prestados",
-            ui.output_text("kpi_custo_servicos"),
-            fill=False
-        ),
-        ui.value_box(
-            "Lucro Bruto",
-            ui.output_text("kpi_lucro_bruto"),
-            fill=False
+        ui.card(
+            ui.card_header("Principais rotas"),
+            ui.card_body(ui.output_data_frame("tabela_rotas"))
         ),
-        ui.value_box(
-            "Resultado Líquido",
-            ui.output_text("kpi_resultado_liquido"),
-            fill=False
+        ui.card(
+            ui.card_header("Série da rota"),
+            ui.card_body(output_widget("plot_rota"))
         ),
         ui.card(
-            ui.card_header(
-                ui.input_selectize(
-                    "select_conta_fin",
-                    "",
-                    choices=[
-                        '(=) Receita Operacional Líquida',
-                        '(-) Custos dos Serviços Prestados',
-                        '(=) Lucro Bruto',
-                        '(=) Resultado Líquido do Período'
-                    ],
-                    selected='(=) Receita Operacional Líquida',
-                    multiple=False,
-                    width="100%"
-                )
-            ),
-            ui.card_body(output_widget("plot_financeiro")),
+            ui.card_header("Empresas no aeroporto"),
+            ui.card_body(output_widget("plot_aeroporto"))
         ),
-        col_widths=[3, 3, 3, 3, 12],
+        col_widths=[12, 6, 6],
         align="center",
     )
-
 )
 
+def ui_financeiro(periodos, empresas, selecionados):
+    """Aba financeira; ``selecionados`` traz o valor inicial de cada entrada"""
+    return ui.layout_sidebar(
+        ui.sidebar(
+            ui.h2("Indicadores Financeiros"),
+            ui.input_selectize(
+                "select_periodo_fin",
+                "Período",
+                choices=periodos,
+                selected=selecionados['select_periodo_fin'],
+                multiple=False,
+            ),
+            ui.input_selectize(
+                "select_empresa_fin",
+                "Empresa",
+                choices=empresas,
+                selected=selecionados['select_empresa_fin'],
+                multiple=True,
+            ),
+            ui.input_radio_buttons(
+                "comparacao_fin",
+                "Comparar com",
+                choices=OPCOES_COMPARACAO,
+                selected=selecionados['comparacao_fin'],
+            ),
+            ui.input_select(
+                "nivel_exportacao_fin",
+                "Exportar",
+                choices=NIVEIS_FINANCEIRO,
+                selected=selecionados['nivel_exportacao_fin'],
+            ),
+            ui.input_radio_buttons(
+                "formato_exportacao_fin",
+                None,
+                choices=FORMATOS_EXPORTACAO,
+                selected=selecionados['formato_exportacao_fin'],
+                inline=True,
+            ),
+            ui.download_button("download_financeiro", "Baixar dados"),
+            bg="#f8f8f8",
+            open="always",
+            fillable=True,
+        ),
+        ui.layout_columns(
+            ui.value_box(
+                "Receita Operacional Líquida",
+                ui.output_text("kpi_receita_operacional"),
+                fill=False
+            ),
+            ui.value_box(
+                "Custo do Serviços Prestados",
+                ui.output_text("kpi_custo_servicos"),
+                fill=False
+            ),
+            ui.value_box(
+                "Lucro Bruto",
+                ui.output_text("kpi_lucro_bruto"),
+                fill=False
+            ),
+            ui.value_box(
+                "Resultado Líquido",
+                ui.output_text("kpi_resultado_liquido"),
+                fill=False
+            ),
+            ui.card(
+                ui.card_header(
+                    ui.input_selectize(
+                        "select_conta_fin",
+                        "",
+                        choices=[
+                            '(=) Receita Operacional Líquida',
+                            '(-) Custos dos Serviços Prestados',
+                            '(=) Lucro Bruto',
+                            '(=) Resultado Líquido do Período'
+                        ],
+                        selected=selecionados['select_conta_fin'],
+                        multiple=False,
+                        width="100%"
+                    )
+                ),
+                ui.card_body(output_widget("plot_financeiro")),
+            ),
+            col_widths=[3, 3, 3, 3, 12],
+            align="center",
+        )
+
+    )
+
+
 app_ui = ui.page_fluid(
     ui.page_navbar(
         ui.nav_panel(
@@ -206,10 +358,16 @@ app_ui = ui.page_fluid(
                 kpis_operacionais
             ),
         ),
+        ui.nav_panel(
+            "Rotas",
+            ui.card(
+                explorador_rotas
+            ),
+        ),
         ui.nav_panel(
             "Indicadores Financeiros",
             ui.card(
-                kpis_financeiros
+                ui.output_ui("aba_financeira")
             ),
         ),
         title=ui.output_image("logo", height="60px"),
@@ -218,392 +376,438 @@ app_ui = ui.page_fluid(
 )
 
 def server(input, output, session):
+    metricas.sessao_iniciada()
+    session.on_ended(metricas.sessao_encerrada)
+    versao_exibida = reactive.Value(versao_ui)
+    opcoes_exibidas = reactive.Value(opcoes_ui)
+
+    def fim_estendido(periodo, anteriores, opcoes):
+        # Um período que ia até o último mês da versão anterior passa a ir até o
+        # último mês da nova; os demais ficam como o usuário deixou
+        return opcoes['date_max'] if periodo and periodo[1] == anteriores['date_max'] else None
+
+    @reactive.effect
+    def update_filtros_versao():
+        # Atualiza limites e opções dos filtros quando uma nova versão dos dados chega
+        dados = dados_dashboard()
+        if dados.versao == versao_exibida.get():
+            return
+        with reactive.isolate():
+            opcoes = opcoes_filtros(dados)
+            anteriores = opcoes_exibidas.get()
+            ui.update_date_range(
+                "select_date_kpis",
+                end=fim_estendido(input.select_date_kpis(), anteriores, opcoes),
+                min=opcoes['date_min'],
+                max=opcoes['date_max'],
+            )
+            ui.update_selectize(
+                "select_nacionalidade",
+                choices=opcoes['nacionalidades'],
+                selected=[n for n in input.select_nacionalidade() if n in opcoes['nacionalidades']],
+            )
+            cubo_operacional = dados.cubo
+            empresas = cubo_operacional[cubo_operacional['EMPRESA (NACIONALIDADE)'].isin(input.select_nacionalidade())]['EMPRESA (SIGLA)'].sort_values().unique().tolist()
+            ui.update_selectize(
+                "select_empresa",
+                choices=empresas,
+                selected=[e for e in input.select_empresa() if e in empresas],
+            )
+            ui.update_date_range(
+                "select_date_rotas",
+                end=fim_estendido(input.select_date_rotas(), anteriores, opcoes),
+                min=opcoes['date_min'],
+                max=opcoes['date_max'],
+            )
+            indice_rotas = dados.indice_rotas
+            ui.update_selectize(
+                "select_empresa_rotas",
+                choices=indice_rotas.empresas.tolist(),
+                selected=[e for e in input.select_empresa_rotas() if e in indice_rotas.empresas],
+            )
+            ui.update_selectize(
+                "select_aeroporto",
+                choices=indice_rotas.aeroportos.tolist(),
+                selected=input.select_aeroporto() if input.select_aeroporto() in indice_rotas.aeroportos else None,
+            )
+            versao_exibida.set(dados.versao)
+            opcoes_exibidas.set(opcoes)
+
+    @render.ui
+    @metricas.instrumentar
+    def aba_financeira():
+        # Só é renderizada com a aba visível: os demonstrativos são carregados
+        # no primeiro acesso e a aba é remontada, mantendo as seleções, a cada
+        # nova versão dos dados
+        demonstrativos = dados_dashboard().financeiro
+        periodos = periodos_disponiveis(demonstrativos)
+        empresas = empresas_disponiveis(demonstrativos)
+        padroes = {
+            'select_periodo_fin': periodos[0],
+            'select_empresa_fin': empresas,
+            'select_conta_fin': CONTAS_KPI[0],
+            'comparacao_fin': 'nenhuma',
+            'nivel_exportacao_fin': 'conta',
+            'formato_exportacao_fin': 'csv',
+        }
+        with reactive.isolate():
+            selecionados = {nome: input[nome]() if nome in input else padrao for nome, padrao in padroes.items()}
+        if selecionados['select_periodo_fin'] not in periodos:
+            selecionados['select_periodo_fin'] = periodos[0]
+        selecionados['select_empresa_fin'] = [e for e in selecionados['select_empresa_fin'] if e in empresas]
+        return ui_financeiro(periodos, empresas, selecionados)
+
     @reactive.effect
     def update_empresa_choices():
         nacionalidades = input.select_nacionalidade()
-        empresas = df_operacional[df_operacional['EMPRESA (NACIONALIDADE)'].isin(nacionalidades)]['EMPRESA (SIGLA)'].sort_values().unique().tolist()
-        empresas_default = ['AZU', 'GLO', 'TAM']
+        with reactive.isolate():
+            cubo_operacional = dados_dashboard().cubo
+        empresas = cubo_operacional[cubo_operacional['EMPRESA (NACIONALIDADE)'].isin(nacionalidades)]['EMPRESA (SIGLA)'].sort_values().unique().tolist()
         return ui.update_selectize(
             "select_empresa",
             choices=empresas,
-            selected=empresas_default if "BRASILEIRA" in nacionalidades else [],
+            selected=EMPRESAS_PADRAO if "BRASILEIRA" in nacionalidades else [],
             )
     
+    @debounce(ATRASO_FILTROS)
+    @metricas.instrumentar
+    def filtros_operacionais():
+        # Arrastar o período ou marcar várias empresas gera um único recálculo
+        return input.select_date_kpis(), tuple(sorted(input.select_empresa())), input.comparacao()
+
+    # Agregação e figuras rodam no pool de threads (reatividade.tarefa_com_chave):
+    # o event loop segue atendendo as outras sessões e, se os filtros mudam de
+    # novo, a execução obsoleta é cancelada e as saídas ficam em carregamento.
+    # A chave (versão e filtros) impede que um resultado da seleção anterior
+    # seja exibido antes de a nova invocação começar.
+    tarefa_agregados = tarefa_com_chave(calcular_agregados)
+
+    # Visões padrão pré-renderizadas na publicação do snapshot (padrao.py): com os
+    # filtros iniciais, as saídas do grupo vêm prontas e nada é calculado
+    @reactive.calc
+    def padrao_operacional():
+        date_range, empresas, comparacao = filtros_operacionais()
+        return saidas_padrao(dados_dashboard().padrao, 'operacional', date_range[0], date_range[1], empresas, comparacao)
+
+    @reactive.calc
+    def padrao_kpis_financeiros():
+        empresas = tuple(sorted(input.select_empresa_fin()))
+        return saidas_padrao(dados_dashboard().padrao, 'kpis_financeiros', input.select_periodo_fin(), empresas, input.comparacao_fin())
+
+    @reactive.calc
+    def padrao_financeiro():
+        empresas = tuple(sorted(input.select_empresa_fin()))
+        return saidas_padrao(dados_dashboard().padrao, 'financeiro', input.select_conta_fin(), empresas, input.comparacao_fin())
+
+    def chave_agregados():
+        return (dados_dashboard().versao, filtros_operacionais())
+
+    @reactive.effect
+    def _agregar():
+        if padrao_operacional() is not None:
+            return
+        date_range, empresas, comparacao = filtros_operacionais()
+        invocar_mais_recente(tarefa_agregados, chave_agregados(), dados_dashboard(), date_range, empresas, comparacao)
+
+    @reactive.calc
+    @metricas.instrumentar
+    def agregados_operacionais():
+        # Todos os KPIs e gráficos operacionais leem deste único agrupamento
+        return resultado_da_chave(tarefa_agregados, chave_agregados(), aguardar_invocacao=True)[0]
+
+    @reactive.calc
+    @metricas.instrumentar
+    def comparacao_operacional():
+        # Período anterior alinhado aos agregados, calculado na mesma tarefa; None sem comparação
+        return resultado_da_chave(tarefa_agregados, chave_agregados(), aguardar_invocacao=True)[1]
+
+    def anterior_operacional(campo):
+        comparacao = comparacao_operacional()
+        return None if comparacao is None else getattr(comparacao, campo)
+
+    @reactive.calc
+    @metricas.instrumentar
+    def textos_kpis_operacionais():
+        padrao = padrao_operacional()
+        if padrao is not None:
+            return padrao
+        return textos_operacionais(agregados_operacionais(), comparacao_operacional())
+
     @reactive.calc
-    def filtered_data_operacional():
-        date_range = input.select_date_kpis()
-        empresas = input.select_empresa()
-        # if not date_range or not empresas:
-        #     return pd.DataFrame()  # Return empty DataFrame if no date range or companies selected
-        start_date, end_date = date_range
-        mask = (
-            (df_operacional['dt_referencia'] >= start_date) &
-            (df_operacional['dt_referencia'] <= end_date) &
-            (df_operacional['EMPRESA (SIGLA)'].isin(empresas))
+    @metricas.instrumentar
+    def kpis_financeiros():
+        # Os quatro KPIs saem de um único recorte da matriz de saldos
+        return saldos_periodo(
+            dados_dashboard().financeiro,
+            CONTAS_KPI,
+            input.select_empresa_fin(),
+            input.select_periodo_fin(),
         )
-        return df_operacional.loc[mask]
-    
+
     @reactive.calc
-    def filtered_data_financeiro():
-        empresas = input.select_empresa_fin()
-        mask = (
-            (df_financeiro['empresa'].isin(empresas))
+    @metricas.instrumentar
+    def kpis_financeiros_anteriores():
+        if input.comparacao_fin() == 'nenhuma':
+            return None
+        return saldos_comparacao(
+            dados_dashboard().financeiro,
+            CONTAS_KPI,
+            input.select_empresa_fin(),
+            input.select_periodo_fin(),
+            input.comparacao_fin(),
         )
-        return df_financeiro.loc[mask]
 
+    @reactive.calc
+    @metricas.instrumentar
+    def textos_kpis_financeiros():
+        padrao = padrao_kpis_financeiros()
+        if padrao is not None:
+            return padrao
+        return textos_financeiros(kpis_financeiros(), kpis_financeiros_anteriores())
+
+    def chave_operacional():
+        date_range, empresas, comparacao = filtros_operacionais()
+        return (dados_dashboard().versao, str(date_range[0]), str(date_range[1]), empresas, comparacao)
+
+    def chave_rotas():
+        date_range, empresas = filtros_rotas()
+        return (dados_dashboard().versao, str(date_range[0]), str(date_range[1]), empresas, input.metrica_rotas())
+
+    def chave_financeiro():
+        return (dados_dashboard().versao, tuple(sorted(input.select_empresa_fin())), input.select_conta_fin(), input.comparacao_fin())
+
+    def figura_em_thread(chave, entradas, padrao=None):
+        """Decorador para funções de figura montadas no pool de threads, com cache.
+
+        ``chave`` retorna ``(versao, filtros...)`` e ``entradas`` os argumentos
+        da função; ambas são lidas no event loop, onde criam as dependências
+        reativas, e a função só recebe os valores. ``padrao`` retorna as saídas
+        pré-renderizadas do grupo da figura, ou None quando é preciso montá-la.
+        """
+        def decorator(fn):
+            tarefa = tarefa_com_chave(cache_figuras.obter)
+            montar = metricas.instrumentar(fn, nome=f'{fn.__name__}.montar')
+
+            @reactive.effect
+            def _montar():
+                if padrao is not None and padrao() is not None:
+                    return
+                versao, *filtros = chave()
+                construir = functools.partial(montar, *entradas())
+                invocar_mais_recente(tarefa, (versao, *filtros), versao, (fn.__name__, *filtros), construir, fn.__name__)
+
+            @functools.wraps(fn)
+            def wrapper():
+                saidas = None if padrao is None else padrao()
+                if saidas is not None:
+                    # JSON lido uma vez por worker e versão; as demais sessões acertam o cache
+                    construir = functools.partial(figura, saidas[fn.__name__])
+                    return cache_figuras.obter(dados_dashboard().versao, (fn.__name__, 'padrao'), construir, fn.__name__)
+                # Figura de outra seleção: a saída fica em carregamento até a nova chegar.
+                # Ao sair das visões pré-renderizadas a tarefa ainda não foi invocada
+                return resultado_da_chave(tarefa, tuple(chave()), aguardar_invocacao=padrao is not None)
+            return wrapper
+        return decorator
 
     @render.image
+    @metricas.instrumentar
     def logo():
         img: ImgData = {"src": str(logo_path), "width": "200px"}
         return img
 
     @render.text
+    @metricas.instrumentar
     def kpi_ask():
-        df_operacional = filtered_data_operacional()
-        return format_number(df_operacional['ASK'].sum())
-    
+        return textos_kpis_operacionais()['kpi_ask']
+
     @render.text
+    @metricas.instrumentar
     def kpi_rpk():
-        df_operacional = filtered_data_operacional()
-        return format_number(df_operacional['RPK'].sum())
-    
+        return textos_kpis_operacionais()['kpi_rpk']
+
     @render.text
+    @metricas.instrumentar
     def kpi_load_factor():
-        df_operacional = filtered_data_operacional()
-        total_rpk = df_operacional['RPK'].sum()
-        total_ask = df_operacional['ASK'].sum()
-        if total_ask == 0:
-            return "0%"
-        load_factor = (total_rpk / total_ask) * 100
-        return f"{load_factor:.2f}%"
+        return textos_kpis_operacionais()['kpi_load_factor']
 
     @render.text
+    @metricas.instrumentar
     def kpi_passageiros():
-        df_operacional = filtered_data_operacional()
-        passageiros_pagos = df_operacional['PASSAGEIROS PAGOS'].sum()
-        passageiros_gratuitos = df_operacional['PASSAGEIROS GRÁTIS'].sum()
-        return format_number(passageiros_pagos + passageiros_gratuitos)
+        return textos_kpis_operacionais()['kpi_passageiros']
 
     @render.text
+    @metricas.instrumentar
     def kpi_decolagens():
-        df_operacional = filtered_data_operacional()
-        return format_number(df_operacional['DECOLAGENS'].sum())
-    
+        return textos_kpis_operacionais()['kpi_decolagens']
+
     @render.text
+    @metricas.instrumentar
     def kpi_destinos():
-        df_operacional = filtered_data_operacional()
-        return format_number(df_operacional['AEROPORTO DE DESTINO (SIGLA)'].nunique())
+        return textos_kpis_operacionais()['kpi_destinos']
 
     @render_widget
-    def plot_rpk_ask_loadf_operacionalactor():
-        df_operacional = filtered_data_operacional()
-        grouped = df_operacional.groupby('dt_referencia').agg({'RPK': 'sum', 'ASK': 'sum'}).reset_index()
-        grouped['Load Factor'] = (grouped['RPK'] / grouped['ASK']) * 100
-        fig = make_subplots(specs=[[{"secondary_y": True}]])
-        fig.add_trace(
-            go.Bar(
-            x=grouped['dt_referencia'],
-            y=grouped['RPK'],
-            name='RPK',
-            marker_color='#B3B3B3',
-            yaxis='y1',
-            text=grouped['RPK'].apply(lambda x: format_number(x)),
-            textangle=-90,
-            textposition='inside',
-            textfont=dict(color='white', size=12),
-            hovertext=[f"{format_number(val)}" for val in grouped['RPK']],
-            hoverinfo='text+name',
-            ),
-            secondary_y=False,
-        )
-        fig.add_trace(
-            go.Bar(
-                x=grouped['dt_referencia'],
-                y=grouped['ASK'],
-                name='ASK',
-                marker_color='#666666',
-                yaxis='y1',
-                text=grouped['ASK'].apply(lambda x: format_number(x)),
-                textangle=-90,
-                textposition='inside',
-                textfont=dict(color='white', size=12),
-                hovertext=[f"{format_number(val)}" for val in grouped['ASK']],
-                hoverinfo='text+name',
-            ),
-            secondary_y=False,
-        )
-
-        fig.add_trace(
-            go.Scatter(
-                x=grouped['dt_referencia'],
-                y=grouped['Load Factor'],
-                name='Load Factor',
-                mode='lines+markers',
-                line=dict(color='black', width=2),
-                text=grouped['Load Factor'].apply(lambda x: f'{x:.2f}%'),
-                textposition='top center',
-                textfont=dict(color='black', size=12),
-                yaxis='y2',
-                hovertext=[f"{lf:.2f}%" for lf in grouped['Load Factor']],
-                hoverinfo='text+name',
-            ),
-            secondary_y=True,
-        )
-
-        # Configurar layout para melhor visualização dos rótulos
-        fig.update_layout(
-            showlegend=True,
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-            hovermode='x unified',
-            margin=dict(t=50, b=50, l=50, r=50),
-            plot_bgcolor='rgba(0,0,0,0)',  # Remove cor de fundo do gráfico
-            paper_bgcolor='rgba(0,0,0,0)',  # Remove cor de fundo do papel
-        )
-        
-        # Remover completamente o menu de opções do Plotly
-        fig.update_layout(
-            modebar={'remove': ['pan2d', 'select2d', 'lasso2d', 'resetScale2d', 'zoomIn2d', 'zoomOut2d', 'autoScale2d', 'zoom2d', 'toImage', 'downloadPlot']}
-        )
-        
-        # Configurar eixos
-        fig.update_xaxes(
-            dtick="M1",
-            tickformat="%b\n%Y",
-        )
-
-        fig.update_yaxes(
-            title_text="RPK / ASK",
-            secondary_y=False,
-            showgrid=True,  # Adiciona linhas de grade ao eixo y primário
-            gridcolor='LightGray',
-        )
-        fig.update_yaxes(
-            title_text="Load Factor (%)", 
-            secondary_y=True,
-            showgrid=False,  # Remove linhas de grade do eixo y secundário
-            # range=[50, 100],  # Define range de 50% a 100%
-            ticksuffix="%",  # Adiciona símbolo % aos números do eixo
-        )
-
-        return fig
+    @metricas.instrumentar
+    @como_widget
+    @figura_em_thread(chave_operacional, lambda: (agregados_operacionais().mensal, anterior_operacional('mensal')), padrao_operacional)
+    def plot_rpk_ask_loadf_operacionalactor(mensal, anterior):
+        return figura_rpk_ask_load_factor(mensal, anterior)
     
     @render_widget
-    def plot_passageiros():
-        df_operacional = filtered_data_operacional()
-        df_operacional['quarter'] = pd.to_datetime(df_operacional['dt_referencia']).dt.to_period('Q')
-        grouped = df_operacional.groupby(['EMPRESA (SIGLA)','quarter']).agg({'PASSAGEIROS PAGOS': 'sum', 'PASSAGEIROS GRÁTIS': 'sum'}).reset_index()
-        grouped['Total Passageiros'] = grouped['PASSAGEIROS PAGOS'] + grouped['PASSAGEIROS GRÁTIS']
-        fig = go.Figure()
-        for empresa in grouped['EMPRESA (SIGLA)'].unique():
-            empresa_data = grouped[grouped['EMPRESA (SIGLA)'] == empresa]
-            fig.add_trace(
-                go.Bar(
-                    x=empresa_data['quarter'].astype(str),
-                    y=empresa_data['PASSAGEIROS PAGOS'],
-                    name=f'{empresa}',
-                    marker_color=color_mapping.get(empresa, '#f8f8f8'),
-                    text=empresa_data['PASSAGEIROS PAGOS'].apply(lambda x: format_number(x)),
-                    textangle=-90,
-                    textposition='inside',
-                    textfont=dict(color='white', size=12),
-                    hovertext=[f"{format_number(val)}" for val in empresa_data['PASSAGEIROS PAGOS']],
-                    hoverinfo='text+name',
-                )
-            )
+    @metricas.instrumentar
+    @como_widget
+    @figura_em_thread(chave_operacional, lambda: (agregados_operacionais().trimestral, anterior_operacional('trimestral')), padrao_operacional)
+    def plot_passageiros(trimestral, anterior):
+        return figura_trimestral(trimestral, 'PASSAGEIROS PAGOS', anterior)
 
-        fig.update_xaxes(
-            tickangle=-45,
-        )
-
-        # Configurar layout para melhor visualização dos rótulos
-        fig.update_layout(
-            showlegend=True,
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-            hovermode='x unified',
-            margin=dict(t=50, b=50, l=50, r=50),
-            plot_bgcolor='rgba(0,0,0,0)',  # Remove cor de fundo do gráfico
-            paper_bgcolor='rgba(0,0,0,0)',  # Remove cor de fundo do papel
-        )
-        
-        # Remover completamente o menu de opções do Plotly
-        fig.update_layout(
-            modebar={'remove': ['pan2d', 'select2d', 'lasso2d', 'resetScale2d', 'zoomIn2d', 'zoomOut2d', 'autoScale2d', 'zoom2d', 'toImage', 'downloadPlot']}
-        )
-        return fig
-    
     @render_widget
-    def plot_decolagens():
-        df_operacional = filtered_data_operacional()
-        df_operacional['quarter'] = pd.to_datetime(df_operacional['dt_referencia']).dt.to_period('Q')
-        grouped = df_operacional.groupby(['EMPRESA (SIGLA)','quarter']).agg({'DECOLAGENS': 'sum'}).reset_index()
-        fig = go.Figure()
-        for empresa in grouped['EMPRESA (SIGLA)'].unique():
-            empresa_data = grouped[grouped['EMPRESA (SIGLA)'] == empresa]
-            fig.add_trace(
-                go.Bar(
-                    x=empresa_data['quarter'].astype(str),
-                    y=empresa_data['DECOLAGENS'],
-                    name=f'{empresa}',
-                    marker_color=color_mapping.get(empresa, '#f8f8f8'),
-                    text=empresa_data['DECOLAGENS'].apply(lambda x: format_number(x)),
-                    textangle=-90,
-                    textposition='inside',
-                    textfont=dict(color='white', size=12),
-                    hovertext=[f"{format_number(val)}" for val in empresa_data['DECOLAGENS']],
-                    hoverinfo='text+name',
-                )
-            )
-        fig.update_xaxes(
-            tickangle=-45,
-        )
-        # Configurar layout para melhor visualização dos rótulos
-        fig.update_layout(
-            showlegend=True,
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-            hovermode='x unified',
-            margin=dict(t=50, b=50, l=50, r=50),
-            plot_bgcolor='rgba(0,0,0,0)',  # Remove cor de fundo do gráfico
-            paper_bgcolor='rgba(0,0,0,0)',  # Remove cor de fundo do papel
-        )
-        
-        # Remover completamente o menu de opções do Plotly
-        fig.update_layout(
-            modebar={'remove': ['pan2d', 'select2d', 'lasso2d', 'resetScale2d', 'zoomIn2d', 'zoomOut2d', 'autoScale2d', 'zoom2d', 'toImage', 'downloadPlot']}
-        )
-        return fig
-    
+    @metricas.instrumentar
+    @como_widget
+    @figura_em_thread(chave_operacional, lambda: (agregados_operacionais().trimestral, anterior_operacional('trimestral')), padrao_operacional)
+    def plot_decolagens(trimestral, anterior):
+        return figura_trimestral(trimestral, 'DECOLAGENS', anterior)
+
     @render_widget
-    def plot_destinos():
-        df_operacional = filtered_data_operacional()
-        df_operacional['quarter'] = pd.to_datetime(df_operacional['dt_referencia']).dt.to_period('Q')
-        grouped = df_operacional.groupby(['EMPRESA (SIGLA)','quarter']).agg({'AEROPORTO DE DESTINO (SIGLA)': 'nunique'}).reset_index()
-        fig = go.Figure()
-        for empresa in grouped['EMPRESA (SIGLA)'].unique():
-            empresa_data = grouped[grouped['EMPRESA (SIGLA)'] == empresa]
-            fig.add_trace(
-                go.Bar(
-                    x=empresa_data['quarter'].astype(str),
-                    y=empresa_data['AEROPORTO DE DESTINO (SIGLA)'],
-                    name=f'{empresa}',
-                    marker_color=color_mapping.get(empresa, '#f8f8f8'),
-                    text=empresa_data['AEROPORTO DE DESTINO (SIGLA)'].apply(lambda x: format_number(x)),
-                    textangle=-90,
-                    textposition='inside',
-                    textfont=dict(color='white', size=12),
-                    hovertext=[f"{format_number(val)}" for val in empresa_data['AEROPORTO DE DESTINO (SIGLA)']],
-                    hoverinfo='text+name',
-                )
-            )
-        fig.update_xaxes(
-            tickangle=-45,
-        )
-        # Configurar layout para melhor visualização dos rótulos
-        fig.update_layout(
-            showlegend=True,
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-            hovermode='x unified',
-            margin=dict(t=50, b=50, l=50, r=50),
-            plot_bgcolor='rgba(0,0,0,0)',  # Remove cor de fundo do gráfico
-            paper_bgcolor='rgba(0,0,0,0)',  # Remove cor de fundo do papel
-        )
-        
-        # Remover completamente o menu de opções do Plotly
-        fig.update_layout(
-            modebar={'remove': ['pan2d', 'select2d', 'lasso2d', 'resetScale2d', 'zoomIn2d', 'zoomOut2d', 'autoScale2d', 'zoom2d', 'toImage', 'downloadPlot']}
-        )
-        return fig
+    @metricas.instrumentar
+    @como_widget
+    @figura_em_thread(chave_operacional, lambda: (agregados_operacionais().destinos_trimestral, anterior_operacional('destinos_trimestral')), padrao_operacional)
+    def plot_destinos(destinos_trimestral, anterior):
+        return figura_trimestral(destinos_trimestral, 'AEROPORTO DE DESTINO (SIGLA)', anterior)
 
     @render.text
+    @metricas.instrumentar
     def kpi_receita_operacional():
-        df_financeiro = filtered_data_financeiro()
-        periodo = input.select_periodo_fin()
-        df_financeiro = df_financeiro[
-            (df_financeiro['periodo'] == periodo) &
-            (df_financeiro['tipo_saldo'] == 'saldo_inicio_periodo') &
-            (df_financeiro['descricao_conta'] == '(=) Receita Operacional Líquida')
-            ]
-        valor = df_financeiro['valor_saldo'].sum()
-        return format_number(valor)
-    
+        return textos_kpis_financeiros()['kpi_receita_operacional']
+
     @render.text
+    @metricas.instrumentar
     def kpi_custo_servicos():
-        df_financeiro = filtered_data_financeiro()
-        periodo = input.select_periodo_fin()
-        df_financeiro = df_financeiro[
-            (df_financeiro['periodo'] == periodo) &
-            (df_financeiro['tipo_saldo'] == 'saldo_inicio_periodo') &
-            (df_financeiro['descricao_conta'] == '(-) Custos dos Serviços Prestados')
-            ]
-        valor = -df_financeiro['valor_saldo'].sum()
-        return format_number(valor)
-    
+        return textos_kpis_financeiros()['kpi_custo_servicos']
+
     @render.text
+    @metricas.instrumentar
     def kpi_lucro_bruto():
-        df_financeiro = filtered_data_financeiro()
-        periodo = input.select_periodo_fin()
-        df_financeiro = df_financeiro[
-            (df_financeiro['periodo'] == periodo) &
-            (df_financeiro['tipo_saldo'] == 'saldo_inicio_periodo') &
-            (df_financeiro['descricao_conta'] == '(=) Lucro Bruto')
-            ]
-        valor = df_financeiro['valor_saldo'].sum()
-        return format_number(valor)
-    
+        return textos_kpis_financeiros()['kpi_lucro_bruto']
+
     @render.text
+    @metricas.instrumentar
     def kpi_resultado_liquido():
-        df_financeiro = filtered_data_financeiro()
-        periodo = input.select_periodo_fin()
-        df_financeiro = df_financeiro[
-            (df_financeiro['periodo'] == periodo) &
-            (df_financeiro['tipo_saldo'] == 'saldo_inicio_periodo') &
-            (df_financeiro['descricao_conta'] == '(=) Resultado Líquido do Período')
-            ]
-        valor = df_financeiro['valor_saldo'].sum()
-        return format_number(valor)
-    
-    @render_widget
-    def plot_financeiro():
-        df_financeiro = filtered_data_financeiro()
-        conta = input.select_conta_fin()
-        df_financeiro = df_financeiro[
-            (df_financeiro['tipo_saldo'] == 'saldo_inicio_periodo') &
-            (df_financeiro['descricao_conta'] == conta)
-            ]
-        if conta == "(-) Custos dos Serviços Prestados":
-            df_financeiro['valor_saldo'] = -df_financeiro['valor_saldo']
-        
-        df_financeiro = df_financeiro.sort_values(by=['periodo'])
-        fig = go.Figure()
-        for empresa in df_financeiro['empresa'].sort_values().unique():
-            empresa_data = df_financeiro[df_financeiro['empresa'] == empresa]
-            fig.add_trace(
-                go.Bar(
-                    x=empresa_data['periodo'],
-                    y=empresa_data['valor_saldo'],
-                    name=f'{empresa}',
-                    marker_color=color_mapping.get(empresa, '#f8f8f8'),
-                    text=empresa_data['valor_saldo'].apply(lambda x: format_number(x)),
-                    textangle=-90,
-                    textposition='inside',
-                    textfont=dict(color='white', size=12),
-                    hovertext=[f"{format_number(val)}" for val in empresa_data['valor_saldo']],
-                    hoverinfo='text+name',
-                )
-            )
-        # Configurar layout para melhor visualização dos rótulos
-        fig.update_layout(
-            showlegend=True,
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-            hovermode='x unified',
-            margin=dict(t=50, b=50, l=50, r=50),
-            plot_bgcolor='rgba(0,0,0,0)',  # Remove cor de fundo do gráfico
-            paper_bgcolor='rgba(0,0,0,0)',  # Remove cor de fundo do papel
-        )
-        
-        # Remover completamente o menu de opções do Plotly
-        fig.update_layout(
-            modebar={'remove': ['pan2d', 'select2d', 'lasso2d', 'resetScale2d', 'zoomIn2d', 'zoomOut2d', 'autoScale2d', 'zoom2d', 'toImage', 'downloadPlot']}
+        return textos_kpis_financeiros()['kpi_resultado_liquido']
+
+    # Explorador de rotas: as consultas ao índice de rotas levam milissegundos
+    # e rodam direto no event loop; só as figuras vão para o pool de threads
+    @debounce(ATRASO_FILTROS)
+    @metricas.instrumentar
+    def filtros_rotas():
+        return input.select_date_rotas(), tuple(sorted(input.select_empresa_rotas()))
+
+    @reactive.calc
+    @metricas.instrumentar
+    def rotas_principais():
+        date_range, empresas = filtros_rotas()
+        return top_rotas(dados_dashboard().indice_rotas, date_range[0], date_range[1], empresas, input.metrica_rotas(), input.n_rotas() or N_ROTAS)
+
+    @reactive.effect
+    def update_rota_choices():
+        rotas = rotas_principais()
+        rotas = {f'{origem}-{destino}': f'{origem} → {destino}' for origem, destino in zip(rotas['ORIGEM'], rotas['DESTINO'])}
+        with reactive.isolate():
+            selecionada = input.select_rota()
+        ui.update_selectize(
+            "select_rota",
+            choices=rotas,
+            selected=selecionada if selecionada in rotas else next(iter(rotas), None),
         )
-        return fig
 
-app = App(app_ui, server)
\ No newline at end of file
+    @reactive.effect
+    @reactive.event(input.select_rota)
+    def update_aeroporto_rota():
+        # Ao escolher uma rota, o detalhamento por empresa passa para a sua origem
+        if input.select_rota():
+            ui.update_selectize("select_aeroporto", selected=input.select_rota().split('-')[0])
+
+    @reactive.calc
+    @metricas.instrumentar
+    def serie_rota_selecionada():
+        req(input.select_rota())
+        origem, destino = input.select_rota().split('-')
+        date_range, empresas = filtros_rotas()
+        return serie_rota(dados_dashboard().indice_rotas, origem, destino, date_range[0], date_range[1], empresas)
+
+    @reactive.calc
+    @metricas.instrumentar
+    def empresas_aeroporto_selecionado():
+        req(input.select_aeroporto())
+        date_range, empresas = filtros_rotas()
+        return empresas_aeroporto(dados_dashboard().indice_rotas, input.select_aeroporto(), date_range[0], date_range[1], empresas)
+
+    @render.data_frame
+    @metricas.instrumentar
+    def tabela_rotas():
+        rotas = rotas_principais()
+        tabela = rotas[['ORIGEM', 'DESTINO']].assign(**{
+            rotulo: format_numbers(rotas[coluna]) for coluna, rotulo in METRICAS_ROTAS.items()
+        })
+        tabela['Participação'] = format_percent(rotas['PARTICIPAÇÃO'])
+        return render.DataGrid(tabela, width="100%")
+
+    @render_widget
+    @metricas.instrumentar
+    @como_widget
+    @figura_em_thread(lambda: (*chave_rotas(), input.select_rota()), lambda: (serie_rota_selecionada(), input.metrica_rotas()))
+    def plot_rota(serie, metrica):
+        return figura_serie_rota(serie, metrica)
+
+    @render_widget
+    @metricas.instrumentar
+    @como_widget
+    @figura_em_thread(lambda: (*chave_rotas(), input.select_aeroporto()), lambda: (empresas_aeroporto_selecionado(), input.metrica_rotas()))
+    def plot_aeroporto(empresas, metrica):
+        return figura_empresas_aeroporto(empresas, metrica)
+
+    # Downloads em blocos: cada lote é lido e serializado no pool de threads
+    # e enviado antes do próximo, sem montar o arquivo inteiro em memória
+    @render.download(filename=lambda: f"anac_operacional_{input.nivel_exportacao()}.{input.formato_exportacao()}")
+    async def download_operacional():
+        date_range, empresas = input.select_date_kpis(), input.select_empresa()
+        if input.nivel_exportacao() == 'rotas':
+            lotes = lotes_rotas(date_range[0], date_range[1], empresas)
+        else:
+            lotes = lotes_agregados(dados_dashboard(), date_range[0], date_range[1], empresas, input.nivel_exportacao())
+        async for bloco in iterar_em_thread(serializar(lotes, input.formato_exportacao())):
+            yield bloco
+
+    @render.download(filename=lambda: f"anac_financeiro_{input.nivel_exportacao_fin()}.{input.formato_exportacao_fin()}")
+    async def download_financeiro():
+        lotes = lotes_financeiro(dados_dashboard().financeiro, input.select_empresa_fin(), input.nivel_exportacao_fin(), input.select_conta_fin())
+        async for bloco in iterar_em_thread(serializar(lotes, input.formato_exportacao_fin())):
+            yield bloco
+
+    @render_widget
+    @metricas.instrumentar
+    @como_widget
+    @figura_em_thread(chave_financeiro, lambda: (input.select_conta_fin(), input.select_empresa_fin(), input.comparacao_fin(), dados_dashboard().financeiro), padrao_financeiro)
+    def plot_financeiro(conta, empresas, comparacao, financeiro):
+        return figura_financeiro(financeiro, conta, empresas, None if comparacao == 'nenhuma' else comparacao)
+
+
+async def exportar_metricas(request):
+    return PlainTextResponse(metricas.prometheus(), media_type='text/plain; version=0.0.4')
+
+
+async def servir_widget(request):
+    resposta = FileResponse(ARQUIVO_WIDGET, media_type='text/javascript', stat_result=os.stat(ARQUIVO_WIDGET))
+    # Revalidação do cache do navegador, como nos arquivos estáticos
+    if request.headers.get('if-none-match') == resposta.headers['etag']:
+        return Response(status_code=304, headers={'etag': resposta.headers['etag']})
+    return resposta
+
+
+app = App(app_ui, server)
+# Código JS dos gráficos, baixado uma vez por página em vez de ir em cada figura
+app.starlette_app.router.routes.insert(0, Route(ROTA_WIDGET, servir_widget))
+# API de consulta para quem só precisa dos números, sem abrir uma sessão
+app.starlette_app.router.routes.insert(0, Mount(ROTA_API, app=criar_api(lambda: observador_snapshot.atual)))
+if 'prometheus' in metricas.modos:
+    app.starlette_app.router.routes.insert(0, Route(ROTA_METRICAS, exportar_metricas))
+app.starlette_app.add_middleware(PrimeiraResposta, inicio=inicio_app)
+metricas.registrar_inicializacao('import', time.perf_counter() - inicio_app)
\ No newline at end of file
@@ -0,0 +1,330 @@
+"""Benchmarks de carga, filtros e renderização com dados sintéticos.
+
+Gera bases operacionais (linhas de rota, como o CSV da ANAC) e demonstrativos
+(no formato de ``demonstrativos.csv``) para cada tamanho pedido, em anos, e
+mede os caminhos do dashboard: import dos módulos, conversão para Parquet,
+carga, montagem e abertura do snapshot, filtro da seleção padrão, agregação,
+cada KPI e cada figura. Cada medição tem o tempo da primeira execução no
+processo (``frio``) e a mediana das repetições seguintes (``quente``).
+
+O resultado vai para um JSON. Com ``--baseline``, os tempos quentes são
+comparados aos de uma execução anterior, na mesma máquina, e o processo
+termina com código 1 se algum ficou mais lento que a tolerância.
+
+Uso: python benchmark.py [--anos 1 5 10] [--saida ARQUIVO] [--baseline ARQUIVO]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from cache_figuras import CacheFiguras
+from cubo import MESES_COMPARACAO, agregar_selecao, build_cubo, build_indice_destinos, comparar_selecao, filtrar_selecao
+from dados import build_dataset_operacional, load_operacional
+from figuras import figura_financeiro, figura_rpk_ask_load_factor, figura_trimestral
+from financeiro import CONTAS_KPI, build_demonstrativos, empresas_disponiveis, periodos_disponiveis, saldos_periodo
+from formatacao import format_number
+from motores import montar_agregados
+from padrao import renderizar_padrao
+from rotas import build_indice_rotas, empresas_aeroporto, serie_rota, top_rotas
+from snapshot import Snapshot, abrir_snapshot, publicar_snapshot, sob_demanda
+
+
+ANOS = [1, 5, 10]
+ANO_FINAL = 2024
+LINHAS_MES = 3000
+REPETICOES = 5
+TOLERANCIA = 0.25
+# Diferenças abaixo disso são ruído de medição, mesmo que acima da tolerância
+PISO_SEGUNDOS = 0.002
+
+EMPRESAS = {
+    'AZU': 'BRASILEIRA',
+    'GLO': 'BRASILEIRA',
+    'TAM': 'BRASILEIRA',
+    'PTB': 'BRASILEIRA',
+    'AAL': 'ESTRANGEIRA',
+    'TAP': 'ESTRANGEIRA',
+    'CMP': 'ESTRANGEIRA',
+}
+EMPRESAS_PADRAO = ['AZU', 'GLO', 'TAM']
+
+# Módulos importados pelo app antes de carregar os dados
+MODULOS = ['dados', 'cubo', 'financeiro', 'formatacao', 'figuras', 'cache_figuras', 'reatividade', 'rotas', 'motores', 'padrao', 'snapshot']
+
+# Contas da DRE com as descrições usadas pelos KPIs
+CONTAS_DRE = {
+    '5': '(=) Receita Operacional Líquida',
+    '6': '(-) Custos dos Serviços Prestados',
+    '7': '(=) Lucro Bruto',
+    '17': '(=) Resultado Líquido do Período',
+}
+TIPOS_SALDO = [
+    'saldo_inicio_periodo',
+    'saldo_fim_periodo',
+    'saldo_inicio_periodo_ano_anterior',
+    'saldo_fim_periodo_ano_anterior',
+]
+
+
+def _aeroportos(rng, quantidade):
+    letras = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+    codigos = rng.choice(letras, size=(quantidade * 2, 2))
+    siglas = pd.unique(np.char.add('SB', np.char.add(codigos[:, 0], codigos[:, 1])))
+    return siglas[:quantidade]
+
+
+def gerar_operacional(anos, linhas_mes=LINHAS_MES, semente=0):
+    """Base operacional sintética, uma linha por (mês, empresa, rota), com as colunas do CSV da ANAC"""
+    rng = np.random.default_rng(semente)
+    meses = pd.date_range(end=f'{ANO_FINAL}-12-01', periods=12 * anos, freq='MS')
+    aeroportos = _aeroportos(rng, 150)
+    n = len(meses) * linhas_mes
+
+    dt_referencia = np.repeat(meses.to_numpy(), linhas_mes)
+    empresas = rng.choice(list(EMPRESAS), size=n, p=[0.3, 0.3, 0.25, 0.05, 0.04, 0.03, 0.03])
+    decolagens = rng.integers(1, 300, size=n).astype('float64')
+    assentos = decolagens * rng.integers(70, 220, size=n)
+    distancia = rng.uniform(300, 3500, size=n)
+    ocupacao = rng.uniform(0.6, 0.95, size=n)
+    passageiros = np.rint(assentos * ocupacao)
+    datas = pd.DatetimeIndex(dt_referencia)
+    return pd.DataFrame({
+        'EMPRESA (SIGLA)': empresas,
+        'EMPRESA (NACIONALIDADE)': pd.Series(empresas).map(EMPRESAS).to_numpy(),
+        'ANO': datas.year,
+        'MÊS': datas.month,
+        'AEROPORTO DE ORIGEM (SIGLA)': rng.choice(aeroportos, size=n),
+        'AEROPORTO DE DESTINO (SIGLA)': rng.choice(aeroportos, size=n),
+        'GRUPO DE VOO': 'REGULAR',
+        'PASSAGEIROS PAGOS': passageiros,
+        'PASSAGEIROS GRÁTIS': np.rint(passageiros * 0.005),
+        'ASK': assentos * distancia,
+        'RPK': passageiros * distancia,
+        'DECOLAGENS': decolagens,
+        'HORAS VOADAS': decolagens * distancia / 750,
+        'ano_mes': datas.strftime('%Y%m'),
+        'dt_referencia': datas.strftime('%Y-%m-%d'),
+    })
+
+
+def _plano_contas():
+    # Quantidades de contas próximas às dos demonstrativos reais (BP 106, DRE 180, DFC 6)
+    contas = []
+    for demonstrativo, raizes, filhas in [('BP', 2, 52), ('DRE', 20, 8), ('DFC', 6, 0)]:
+        for i in range(1, raizes + 1):
+            descricao = CONTAS_DRE.get(str(i), f'Conta {i}') if demonstrativo == 'DRE' else f'Conta {i}'
+            contas.append((demonstrativo, str(i), descricao, 1))
+            contas += [(demonstrativo, f'{i}.{j}', f'Conta {i}.{j}', 2) for j in range(1, filhas + 1)]
+    return pd.DataFrame(contas, columns=['demonstrativo', 'conta', 'descricao_conta', 'nivel_conta'])
+
+
+def gerar_financeiro(anos, semente=0):
+    """Demonstrativos sintéticos no formato longo de ``demonstrativos.csv``"""
+    rng = np.random.default_rng(semente)
+    contas = _plano_contas()
+    abas = pd.DataFrame(
+        [(empresa, ano, trimestre) for ano in range(ANO_FINAL - anos + 1, ANO_FINAL + 1) for trimestre in range(1, 5) for empresa in EMPRESAS_PADRAO],
+        columns=['empresa', 'ano', 'trimestre'],
+    )
+    sufixo = (abas['ano'] % 100).astype(str).str.zfill(2)
+    abas['file_name'] = 'demonstracoes_t' + abas['trimestre'].astype(str) + '_' + sufixo + '.xlsx'
+    abas['sheet_name'] = abas['empresa'] + '_T' + abas['trimestre'].astype(str) + '_' + sufixo
+    abas['periodo'] = abas['ano'].astype(str) + 'T' + abas['trimestre'].astype(str)
+    abas['trimestre'] = 'T' + abas['trimestre'].astype(str)
+
+    df = abas.merge(contas, how='cross').merge(pd.DataFrame({'tipo_saldo': TIPOS_SALDO}), how='cross')
+    df['valor_saldo'] = np.round(rng.normal(0, 2e9, size=len(df)), 2)
+    return df[['file_name', 'sheet_name', 'empresa', 'periodo', 'ano', 'trimestre', 'demonstrativo', 'conta', 'descricao_conta', 'tipo_saldo', 'valor_saldo', 'nivel_conta']]
+
+
+def medir(fn, repeticoes=REPETICOES):
+    """Executa ``fn`` uma vez (frio) e mais ``repeticoes`` vezes (quente, mediana)"""
+    inicio = time.perf_counter()
+    resultado = fn()
+    frio = time.perf_counter() - inicio
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        fn()
+        tempos.append(time.perf_counter() - inicio)
+    return resultado, {'frio': frio, 'quente': statistics.median(tempos) if tempos else frio}
+
+
+def medir_importacao(repeticoes=REPETICOES):
+    """Tempo de import dos módulos do app, cada execução em um interpretador novo"""
+    codigo = (
+        "import time; inicio = time.perf_counter(); "
+        f"import {', '.join(MODULOS)}; "
+        "print(time.perf_counter() - inicio)"
+    )
+    diretorio = os.path.dirname(os.path.abspath(__file__))
+    tempos = [
+        float(subprocess.run([sys.executable, '-c', codigo], cwd=diretorio, capture_output=True, text=True, check=True).stdout)
+        for _ in range(repeticoes + 1)
+    ]
+    return {'frio': tempos[0], 'quente': statistics.median(tempos[1:])}
+
+
+def medir_tamanho(anos, linhas_mes=LINHAS_MES, repeticoes=REPETICOES):
+    """Medições de um tamanho de base; as chaves são os nomes dos caminhos medidos"""
+    medicoes = {}
+
+    def registrar(nome, fn, **extras):
+        resultado, tempos = medir(fn, repeticoes)
+        medicoes[nome] = {**tempos, **extras}
+        return resultado
+
+    with tempfile.TemporaryDirectory(prefix='benchmark-') as tmp:
+        csv_path = os.path.join(tmp, 'operacional.csv')
+        dataset_path = os.path.join(tmp, 'operacional')
+        snapshot_path = os.path.join(tmp, 'snapshot')
+        df_rotas = gerar_operacional(anos, linhas_mes)
+        df_rotas.to_csv(csv_path, index=False)
+        linhas = len(df_rotas)
+        del df_rotas
+
+        registrar('parquet', lambda: build_dataset_operacional(csv_path, dataset_path), linhas=linhas)
+        df = registrar('carga_operacional', lambda: load_operacional(dataset_path=dataset_path, csv_path=csv_path), linhas=linhas)
+        cubo = registrar('cubo', lambda: build_cubo(df))
+        indice_destinos = registrar('indice_destinos', lambda: build_indice_destinos(df))
+        indice_rotas = registrar('indice_rotas', lambda: build_indice_rotas(df))
+        del df
+        # Mesmos agregados lidos partição por partição, sem carregar as linhas de rota inteiras
+        registrar('agregados_arrow', lambda: montar_agregados(dataset_path, 'arrow'), linhas=linhas)
+        df_financeiro = gerar_financeiro(anos)
+        financeiro = registrar('demonstrativos', lambda: build_demonstrativos(df_financeiro), linhas=len(df_financeiro))
+
+        snapshot = Snapshot(None, cubo, indice_destinos, indice_rotas, sob_demanda(lambda: financeiro))
+        # Visões padrão pré-renderizadas, que também entram no tempo de publicação
+        registrar('renderizar_padrao', lambda: renderizar_padrao(snapshot))
+        registrar('publicar_snapshot', lambda: publicar_snapshot(snapshot, snapshot_path))
+        snapshot = registrar('abrir_snapshot', lambda: abrir_snapshot(destino=snapshot_path))
+        # Os demonstrativos são abertos no primeiro acesso, à parte do snapshot
+        registrar('abrir_demonstrativos', lambda: abrir_snapshot(destino=snapshot_path).financeiro)
+
+        # Seleção padrão do dashboard: todo o período, principais empresas
+        inicio, fim = snapshot.cubo['dt_referencia'].min(), snapshot.cubo['dt_referencia'].max()
+        selecao = registrar('filtro', lambda: filtrar_selecao(snapshot.cubo, snapshot.indice_destinos, inicio, fim, EMPRESAS_PADRAO))
+        agregados = registrar('agregacao', lambda: agregar_selecao(*selecao))
+        # Modo de comparação: recorte e agregação da seleção junto com o ano anterior
+        registrar('agregacao_comparacao', lambda: comparar_selecao(snapshot.cubo, snapshot.indice_destinos, inicio, fim, EMPRESAS_PADRAO, MESES_COMPARACAO['yoy']))
+
+        kpis = {
+            'kpi_ask': lambda: format_number(agregados.totais['ASK']),
+            'kpi_rpk': lambda: format_number(agregados.totais['RPK']),
+            'kpi_load_factor': lambda: f"{agregados.totais['RPK'] / agregados.totais['ASK'] * 100:.2f}%",
+            'kpi_passageiros': lambda: format_number(agregados.totais['PASSAGEIROS PAGOS'] + agregados.totais['PASSAGEIROS GRÁTIS']),
+            'kpi_decolagens': lambda: format_number(agregados.totais['DECOLAGENS']),
+            'kpi_destinos': lambda: format_number(agregados.destinos),
+        }
+        for nome, fn in kpis.items():
+            registrar(nome, fn)
+        demonstrativos = snapshot.financeiro
+        empresas_fin = empresas_disponiveis(demonstrativos)
+        periodo = periodos_disponiveis(demonstrativos)[0]
+        registrar('kpis_financeiros', lambda: saldos_periodo(demonstrativos, CONTAS_KPI, empresas_fin, periodo))
+
+        # Explorador de rotas: todo o período, todas as empresas
+        rotas = registrar('top_rotas', lambda: top_rotas(snapshot.indice_rotas, inicio, fim))
+        registrar('empresas_aeroporto', lambda: empresas_aeroporto(snapshot.indice_rotas, rotas['ORIGEM'].iloc[0], inicio, fim))
+        registrar('serie_rota', lambda: serie_rota(snapshot.indice_rotas, rotas['ORIGEM'].iloc[0], rotas['DESTINO'].iloc[0], inicio, fim))
+
+        figuras = {
+            'plot_rpk_ask_loadf_operacionalactor': lambda: figura_rpk_ask_load_factor(agregados.mensal),
+            'plot_passageiros': lambda: figura_trimestral(agregados.trimestral, 'PASSAGEIROS PAGOS'),
+            'plot_decolagens': lambda: figura_trimestral(agregados.trimestral, 'DECOLAGENS'),
+            'plot_destinos': lambda: figura_trimestral(agregados.destinos_trimestral, 'AEROPORTO DE DESTINO (SIGLA)'),
+            'plot_financeiro': lambda: figura_financeiro(demonstrativos, CONTAS_KPI[0], empresas_fin),
+        }
+        for nome, fn in figuras.items():
+            registrar(nome, fn)
+
+        # Mesmo caminho do app: a primeira sessão monta e serializa, as demais acertam o cache
+        cache = CacheFiguras()
+        for nome, fn in figuras.items():
+            registrar(f'{nome}_cache', lambda: cache.obter(snapshot.versao, nome, fn, nome))
+            medicoes[f'{nome}_cache']['bytes'] = cache.payloads[nome]
+
+    return medicoes
+
+
+def executar(anos=ANOS, linhas_mes=LINHAS_MES, repeticoes=REPETICOES):
+    """Executa todas as medições e retorna o documento salvo em JSON"""
+    medicoes = {'importacao': medir_importacao(repeticoes)}
+    for n in anos:
+        print(f"medindo {n} ano(s)...", file=sys.stderr)
+        for nome, medicao in medir_tamanho(n, linhas_mes, repeticoes).items():
+            medicoes[f'{n}a/{nome}'] = medicao
+    return {
+        'meta': {
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'processadores': os.cpu_count(),
+            'versoes': {modulo: sys.modules[modulo].__version__ for modulo in ['numpy', 'pandas', 'pyarrow', 'plotly'] if modulo in sys.modules},
+            'anos': list(anos),
+            'linhas_mes': linhas_mes,
+            'repeticoes': repeticoes,
+        },
+        'medicoes': medicoes,
+    }
+
+
+def comparar(resultado, baseline, tolerancia=TOLERANCIA, piso=PISO_SEGUNDOS):
+    """Linhas (nome, base, atual, variação, regrediu) das medições presentes nas duas execuções"""
+    linhas = []
+    for nome, medicao in resultado['medicoes'].items():
+        base = baseline['medicoes'].get(nome)
+        if base is None:
+            continue
+        antes, depois = base['quente'], medicao['quente']
+        variacao = depois / antes - 1 if antes else 0.0
+        regrediu = variacao > tolerancia and depois - antes > piso
+        linhas.append((nome, antes, depois, variacao, regrediu))
+    return linhas
+
+
+def imprimir(resultado, comparacao=None):
+    """Tabela das medições (e da comparação com a baseline, se houver)"""
+    if comparacao is None:
+        for nome, medicao in resultado['medicoes'].items():
+            print(f"{nome:<50} frio {medicao['frio'] * 1e3:10.2f} ms   quente {medicao['quente'] * 1e3:10.2f} ms")
+        return
+    for nome, antes, depois, variacao, regrediu in comparacao:
+        marca = '  REGRESSÃO' if regrediu else ''
+        print(f"{nome:<50} {antes * 1e3:10.2f} ms -> {depois * 1e3:10.2f} ms  {variacao:+7.1%}{marca}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--anos', nargs='+', type=int, default=ANOS, help='tamanhos das bases sintéticas, em anos')
+    parser.add_argument('--linhas-mes', type=int, default=LINHAS_MES, help='linhas de rota por mês')
+    parser.add_argument('--repeticoes', type=int, default=REPETICOES)
+    parser.add_argument('--saida', help='arquivo JSON com o resultado')
+    parser.add_argument('--baseline', help='JSON de uma execução anterior para comparação')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA, help='piora relativa aceita no tempo quente')
+    args = parser.parse_args()
+
+    resultado = executar(args.anos, args.linhas_mes, args.repeticoes)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            comparacao = comparar(resultado, json.load(f), args.tolerancia)
+        imprimir(resultado, comparacao)
+        if any(regrediu for *_, regrediu in comparacao):
+            raise SystemExit(1)
+    else:
+        imprimir(resultado)
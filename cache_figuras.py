@@ -0,0 +1,88 @@
+"""Cache LRU de figuras do Plotly, compartilhado entre as sessões de um worker.
+
+A maioria dos acessos usa as mesmas seleções padrão, então a figura montada
+para uma combinação (versão dos dados, gráfico, filtros) é reaproveitada por
+todas as sessões: um acerto pula o agrupamento e a montagem da figura.
+
+As figuras guardadas são tratadas como imutáveis (o ``render_widget`` copia a
+figura para o widget de cada sessão). O tamanho de cada entrada é uma
+estimativa do JSON que vai para o navegador, calculada a partir dos arrays dos
+traces sem serializar a figura, e limita a memória do cache; o último tamanho
+de cada gráfico fica nas estatísticas, para acompanhar o payload enviado às
+sessões.
+"""
+import threading
+from collections import OrderedDict
+
+from figuras import tamanho_payload
+from metricas import metricas
+
+
+MAX_BYTES = 64 * 1024 * 1024
+
+
+class CacheFiguras:
+    """Cache LRU limitado em bytes, com contadores de acertos e falhas"""
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.versao = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self.payloads = {}
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _invalidar_versao(self, versao):
+        # Uma nova versão dos dados torna todas as figuras guardadas obsoletas
+        if versao != self.versao:
+            self._itens.clear()
+            self.bytes = 0
+            self.versao = versao
+
+    def obter(self, versao, chave, construir, nome=None):
+        """Figura guardada para (versao, chave) ou constrói, guarda e retorna"""
+        with self._lock:
+            self._invalidar_versao(versao)
+            item = self._itens.get(chave)
+            if item is not None:
+                self._itens.move_to_end(chave)
+                self.hits += 1
+                return item[0]
+            self.misses += 1
+
+        fig = construir()
+        with metricas.medir(f'{nome or "figura"}.payload') as medicao:
+            tamanho = medicao.bytes = tamanho_payload(fig)
+
+        with self._lock:
+            if nome is not None:
+                self.payloads[nome] = tamanho
+            if versao != self.versao or tamanho > self.max_bytes:
+                return fig
+            if chave not in self._itens:
+                self._itens[chave] = (fig, tamanho)
+                self.bytes += tamanho
+            while self.bytes > self.max_bytes:
+                _, (_, tamanho_removido) = self._itens.popitem(last=False)
+                self.bytes -= tamanho_removido
+                self.evictions += 1
+        return fig
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self.bytes = 0
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'itens': len(self._itens),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'payloads': dict(self.payloads),
+            }
@@ -0,0 +1,426 @@
+"""Teste de carga com sessões simultâneas contra uma instância local do app.
+
+Sobe ``app.py`` no uvicorn, com o número de workers pedido, e abre N sessões
+pelo mesmo websocket que o navegador usa. Cada sessão simulada abre as abas
+operacional e financeira e, com um tempo de reflexão aleatório entre as
+interações (exponencial, com a média pedida), altera uma das entradas
+``select_date_kpis``, ``select_empresa``, ``select_nacionalidade``,
+``select_periodo_fin`` ou ``select_conta_fin``. As opções sorteadas (meses,
+empresas de cada nacionalidade, períodos e contas) vêm do snapshot local.
+
+A latência de uma saída é o tempo entre o envio da entrada e a chegada do
+valor da saída; a dos indicadores operacionais inclui o debounce dos
+filtros, como para o usuário. O relatório traz p50/p95/p99 por saída, na
+abertura da sessão e nas interações, a vazão (interações e saídas por
+segundo) e CPU e memória residente de cada processo do servidor, lidos de
+``/proc`` (só em Linux).
+
+Uso: python carga.py [--sessoes 10] [--workers 1] [--duracao 60] [--pensar 3] [--saida ARQUIVO]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from collections import Counter, defaultdict
+from datetime import datetime
+
+import numpy as np
+import websockets
+
+from financeiro import CONTAS_KPI, empresas_disponiveis, periodos_disponiveis
+from padrao import EMPRESAS_PADRAO
+from snapshot import carregar_snapshot
+
+
+SESSOES = 10
+WORKERS = 1
+DURACAO = 60
+PENSAR = 3.0
+RAMPA = 5.0
+PORTA = 8799
+TEMPO_LIMITE = 30
+TEMPO_INICIO = 120
+INTERVALO_AMOSTRAS = 0.5
+PERCENTIS = [50, 95, 99]
+
+SAIDAS_OPERACIONAIS = [
+    'kpi_ask',
+    'kpi_rpk',
+    'kpi_load_factor',
+    'kpi_passageiros',
+    'kpi_decolagens',
+    'kpi_destinos',
+    'plot_rpk_ask_loadf_operacionalactor',
+    'plot_passageiros',
+    'plot_decolagens',
+    'plot_destinos',
+]
+SAIDAS_KPI_FINANCEIROS = [
+    'kpi_receita_operacional',
+    'kpi_custo_servicos',
+    'kpi_lucro_bruto',
+    'kpi_resultado_liquido',
+]
+SAIDAS = ['aba_financeira'] + SAIDAS_OPERACIONAIS + SAIDAS_KPI_FINANCEIROS + ['plot_financeiro']
+
+# Saídas recalculadas quando cada entrada muda
+SAIDAS_POR_ENTRADA = {
+    'select_date_kpis': SAIDAS_OPERACIONAIS,
+    'select_empresa': SAIDAS_OPERACIONAIS,
+    'select_nacionalidade': SAIDAS_OPERACIONAIS,
+    'select_periodo_fin': SAIDAS_KPI_FINANCEIROS,
+    'select_conta_fin': ['plot_financeiro'],
+}
+
+TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+PAGINA = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def opcoes_carga(snapshot):
+    """Valores que as sessões simuladas podem escolher em cada entrada"""
+    cubo = snapshot.cubo
+    empresas = cubo.groupby('EMPRESA (NACIONALIDADE)', observed=True)['EMPRESA (SIGLA)'].unique()
+    return {
+        'meses': [mes.date().isoformat() for mes in sorted(cubo['dt_referencia'].unique())],
+        'empresas': {str(nacionalidade): sorted(map(str, siglas)) for nacionalidade, siglas in empresas.items()},
+        'periodos_fin': periodos_disponiveis(snapshot.financeiro),
+        'empresas_fin': empresas_disponiveis(snapshot.financeiro),
+    }
+
+
+def entradas_iniciais(opcoes):
+    """Entradas de uma sessão recém-aberta, com os padrões do app"""
+    return {
+        'select_date_kpis:shiny.date': [opcoes['meses'][0], opcoes['meses'][-1]],
+        'select_nacionalidade': ['BRASILEIRA'],
+        'select_empresa': EMPRESAS_PADRAO,
+        'comparacao': 'nenhuma',
+        'select_periodo_fin': opcoes['periodos_fin'][0],
+        'select_empresa_fin': opcoes['empresas_fin'],
+        'select_conta_fin': CONTAS_KPI[0],
+        'comparacao_fin': 'nenhuma',
+    }
+
+
+def _sortear_diferente(sortear, atual, tentativas=20):
+    # Uma interação que não muda a entrada não recalcula nada
+    for _ in range(tentativas):
+        valor = sortear()
+        if valor != atual:
+            return valor
+    return None
+
+
+def _sortear_empresas(rng, nacionalidades, opcoes):
+    candidatas = sorted({sigla for nacionalidade in nacionalidades for sigla in opcoes['empresas'].get(nacionalidade, [])})
+    return sorted(rng.sample(candidatas, rng.randint(1, min(3, len(candidatas))))) if candidatas else []
+
+
+def proxima_interacao(rng, entradas, opcoes):
+    """Entrada alterada e valores enviados em uma interação sorteada.
+
+    Ao trocar a nacionalidade, a sessão também escolhe empresas dela, como o
+    usuário faz depois que o app atualiza as opções de empresa.
+    """
+    while True:
+        entrada = rng.choice(list(SAIDAS_POR_ENTRADA))
+        if entrada == 'select_date_kpis':
+            meses = opcoes['meses']
+            valor = _sortear_diferente(lambda: sorted(rng.sample(meses, 2)) if len(meses) > 1 else meses * 2, entradas['select_date_kpis:shiny.date'])
+            valores = None if valor is None else {'select_date_kpis:shiny.date': valor}
+        elif entrada == 'select_empresa':
+            valor = _sortear_diferente(lambda: _sortear_empresas(rng, entradas['select_nacionalidade'], opcoes), entradas['select_empresa'])
+            valores = None if valor is None else {'select_empresa': valor}
+        elif entrada == 'select_nacionalidade':
+            todas = sorted(opcoes['empresas'])
+            nacionalidades = _sortear_diferente(lambda: sorted(rng.sample(todas, rng.randint(1, len(todas)))), entradas['select_nacionalidade'])
+            empresas = None if nacionalidades is None else _sortear_diferente(lambda: _sortear_empresas(rng, nacionalidades, opcoes), entradas['select_empresa'])
+            valores = None if empresas is None else {'select_nacionalidade': nacionalidades, 'select_empresa': empresas}
+        elif entrada == 'select_periodo_fin':
+            valor = _sortear_diferente(lambda: rng.choice(opcoes['periodos_fin']), entradas['select_periodo_fin'])
+            valores = None if valor is None else {'select_periodo_fin': valor}
+        else:
+            valor = _sortear_diferente(lambda: rng.choice(CONTAS_KPI), entradas['select_conta_fin'])
+            valores = None if valor is None else {'select_conta_fin': valor}
+        if valores is not None:
+            return entrada, valores
+
+
+class Coleta:
+    """Latências, erros e contagens de todas as sessões"""
+
+    def __init__(self):
+        self.latencias = defaultdict(list)  # (fase, saída) -> segundos
+        self.erros = Counter()  # (fase, saída) -> erros de renderização
+        self.sem_resposta = Counter()  # (fase, saída) -> valores que não chegaram no tempo limite
+        self.interacoes = Counter()  # entrada -> interações concluídas
+        self.falhas = []  # sessões encerradas por erro de conexão
+
+    def registrar(self, fase, latencias, erros, pendentes):
+        for nome, segundos in latencias.items():
+            self.latencias[fase, nome].append(segundos)
+        self.erros.update((fase, nome) for nome in erros)
+        self.sem_resposta.update((fase, nome) for nome in pendentes)
+
+
+async def aguardar_saidas(ws, saidas, inicio, tempo_limite=TEMPO_LIMITE):
+    """Segundos desde ``inicio`` até cada saída receber valor; também as com erro e as que não chegaram"""
+    pendentes = set(saidas)
+    latencias, erros = {}, set()
+    limite = inicio + tempo_limite
+    while pendentes:
+        restante = limite - time.perf_counter()
+        if restante <= 0:
+            break
+        try:
+            mensagem = await asyncio.wait_for(ws.recv(), restante)
+        except asyncio.TimeoutError:
+            break
+        if isinstance(mensagem, bytes):
+            continue
+        dados = json.loads(mensagem)
+        agora = time.perf_counter()
+        # Enquanto a saída é calculada no pool de threads o app envia um valor nulo
+        for nome, valor in (dados.get('values') or {}).items():
+            if nome in pendentes and valor is not None:
+                latencias[nome] = agora - inicio
+        for nome in pendentes.intersection(dados.get('errors') or {}):
+            erros.add(nome)
+        pendentes -= set(latencias) | erros
+    return latencias, erros, pendentes
+
+
+async def simular_sessao(url, opcoes, fim, pensar, rng, coleta, tempo_limite=TEMPO_LIMITE):
+    """Uma sessão: abre o dashboard e interage até ``fim`` (relógio ``time.perf_counter``)"""
+    entradas = entradas_iniciais(opcoes)
+    visiveis = {f'.clientdata_output_{nome}_hidden': False for nome in SAIDAS}
+    async with websockets.connect(url, max_size=None) as ws:
+        inicio = time.perf_counter()
+        await ws.send(json.dumps({'method': 'init', 'data': {**visiveis, **entradas}}))
+        coleta.registrar('abertura', *await aguardar_saidas(ws, SAIDAS, inicio, tempo_limite))
+
+        while True:
+            espera = rng.expovariate(1 / pensar) if pensar > 0 else 0
+            if time.perf_counter() + espera >= fim:
+                break
+            await asyncio.sleep(espera)
+            entrada, valores = proxima_interacao(rng, entradas, opcoes)
+            entradas.update(valores)
+            inicio = time.perf_counter()
+            await ws.send(json.dumps({'method': 'update', 'data': valores}))
+            coleta.registrar('interacao', *await aguardar_saidas(ws, SAIDAS_POR_ENTRADA[entrada], inicio, tempo_limite))
+            coleta.interacoes[entrada] += 1
+
+
+async def executar_sessoes(url, opcoes, sessoes=SESSOES, duracao=DURACAO, pensar=PENSAR, rampa=RAMPA, semente=None, tempo_limite=TEMPO_LIMITE):
+    """Roda as sessões simultâneas; a abertura delas é espalhada ao longo de ``rampa`` segundos"""
+    coleta = Coleta()
+    fim = time.perf_counter() + duracao
+    rng = random.Random(semente)
+
+    async def sessao(i):
+        await asyncio.sleep(rampa * i / sessoes)
+        try:
+            await simular_sessao(url, opcoes, fim, pensar, random.Random(rng.random()), coleta, tempo_limite)
+        except (OSError, websockets.WebSocketException) as erro:
+            coleta.falhas.append(f'{type(erro).__name__}: {erro}')
+
+    await asyncio.gather(*(sessao(i) for i in range(sessoes)))
+    return coleta
+
+
+def _ler_processo(pid):
+    # Campos 14, 15 (utime, stime) e 24 (rss) de /proc/<pid>/stat, contados após o nome
+    with open(f'/proc/{pid}/stat') as f:
+        campos = f.read().rsplit(')', 1)[1].split()
+    return (int(campos[11]) + int(campos[12])) / TICKS, int(campos[21]) * PAGINA
+
+
+def processos_servidor(pid, workers):
+    """Papel de cada processo do servidor: o próprio ``pid`` e seus filhos diretos"""
+    papeis = {pid: 'worker' if workers == 1 else 'supervisor'}
+    for entrada in os.listdir('/proc'):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entrada}/stat') as f:
+                pai = int(f.read().rsplit(')', 1)[1].split()[1])
+            with open(f'/proc/{entrada}/cmdline', 'rb') as f:
+                comando = f.read()
+        except OSError:
+            continue
+        if pai == pid:
+            papeis[int(entrada)] = 'worker' if b'spawn_main' in comando else 'auxiliar'
+    return papeis
+
+
+class MonitorProcessos:
+    """Amostra CPU e memória residente dos processos do servidor em uma thread"""
+
+    def __init__(self, pid, workers, intervalo=INTERVALO_AMOSTRAS):
+        self.pid = pid
+        self.workers = workers
+        self.intervalo = intervalo
+        self.amostras = defaultdict(list)  # pid -> [(instante, segundos de CPU, rss)]
+        self.papeis = {}
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, name='monitor-processos', daemon=True)
+
+    def iniciar(self):
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        self._thread.join()
+
+    def _amostrar(self):
+        while True:
+            self.papeis.update(processos_servidor(self.pid, self.workers))
+            agora = time.perf_counter()
+            for pid in self.papeis:
+                try:
+                    self.amostras[pid].append((agora, *_ler_processo(pid)))
+                except OSError:
+                    continue
+            if self._parar.wait(self.intervalo):
+                break
+
+    def resumo(self):
+        """CPU média e de pico (% de um núcleo) e memória residente de pico e final de cada processo"""
+        resumo = {}
+        for pid, amostras in sorted(self.amostras.items()):
+            if len(amostras) < 2:
+                continue
+            instantes, cpu, rss = (np.array(coluna) for coluna in zip(*amostras))
+            uso = np.diff(cpu) / np.diff(instantes) * 100
+            resumo[pid] = {
+                'papel': self.papeis[pid],
+                'cpu_medio': float((cpu[-1] - cpu[0]) / (instantes[-1] - instantes[0]) * 100),
+                'cpu_pico': float(uso.max()),
+                'rss_pico': int(rss.max()),
+                'rss_final': int(rss[-1]),
+            }
+        return resumo
+
+
+def iniciar_servidor(porta=PORTA, workers=WORKERS, tempo_inicio=TEMPO_INICIO):
+    """Sobe o app no uvicorn e espera a primeira resposta HTTP"""
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app:app', '--host', '127.0.0.1', '--port', str(porta), '--workers', str(workers), '--log-level', 'warning'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    limite = time.monotonic() + tempo_inicio
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"o servidor terminou com código {processo.returncode}")
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{porta}/', timeout=1).close()
+            return processo
+        except OSError:
+            time.sleep(0.5)
+    processo.terminate()
+    raise RuntimeError(f"o servidor não respondeu em {tempo_inicio} s")
+
+
+def percentis(valores):
+    return {f'p{p}': float(v) for p, v in zip(PERCENTIS, np.percentile(valores, PERCENTIS))}
+
+
+def executar(sessoes=SESSOES, workers=WORKERS, duracao=DURACAO, pensar=PENSAR, rampa=RAMPA, porta=PORTA, url=None, semente=None, tempo_limite=TEMPO_LIMITE):
+    """Executa o teste de carga e retorna o documento salvo em JSON.
+
+    Com ``url`` (ws://.../websocket/), usa um servidor já em execução e não
+    mede CPU e memória.
+    """
+    opcoes = opcoes_carga(carregar_snapshot())
+    processo = monitor = None
+    if url is None:
+        processo = iniciar_servidor(porta, workers)
+        url = f'ws://127.0.0.1:{porta}/websocket/'
+        if os.path.isdir('/proc'):
+            monitor = MonitorProcessos(processo.pid, workers)
+            monitor.iniciar()
+    try:
+        inicio = time.perf_counter()
+        coleta = asyncio.run(executar_sessoes(url, opcoes, sessoes, duracao, pensar, rampa, semente, tempo_limite))
+        decorrido = time.perf_counter() - inicio
+    finally:
+        if monitor is not None:
+            monitor.parar()
+        if processo is not None:
+            processo.terminate()
+            processo.wait()
+
+    saidas = {
+        f'{fase}/{nome}': {
+            'n': len(coleta.latencias[fase, nome]),
+            **(percentis(coleta.latencias[fase, nome]) if coleta.latencias[fase, nome] else {}),
+            'erros': coleta.erros[fase, nome],
+            'sem_resposta': coleta.sem_resposta[fase, nome],
+        }
+        for fase, nome in sorted(set(coleta.latencias) | set(coleta.erros) | set(coleta.sem_resposta))
+    }
+    return {
+        'meta': {
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'sessoes': sessoes,
+            'workers': workers if processo is not None else None,
+            'duracao': duracao,
+            'pensar': pensar,
+            'semente': semente,
+        },
+        'vazao': {
+            'segundos': decorrido,
+            'interacoes': sum(coleta.interacoes.values()),
+            'interacoes_por_segundo': sum(coleta.interacoes.values()) / decorrido,
+            'saidas_por_segundo': sum(len(valores) for valores in coleta.latencias.values()) / decorrido,
+            'por_entrada': dict(coleta.interacoes),
+        },
+        'saidas': saidas,
+        'processos': {} if monitor is None else monitor.resumo(),
+        'falhas': coleta.falhas,
+    }
+
+
+def imprimir(resultado):
+    """Tabela de latências por saída, vazão e uso dos processos"""
+    print(f"{'saída':<50} {'n':>6} {'p50':>10} {'p95':>10} {'p99':>10} {'erros':>6} {'sem resp.':>9}")
+    for nome, saida in resultado['saidas'].items():
+        tempos = ''.join(f"{saida[f'p{p}'] * 1e3:8.0f} ms" if f'p{p}' in saida else f"{'-':>11}" for p in PERCENTIS)
+        print(f"{nome:<50} {saida['n']:>6} {tempos} {saida['erros']:>6} {saida['sem_resposta']:>9}")
+
+    vazao = resultado['vazao']
+    print(f"\n{vazao['interacoes']} interações em {vazao['segundos']:.1f} s: "
+          f"{vazao['interacoes_por_segundo']:.2f} interações/s, {vazao['saidas_por_segundo']:.2f} saídas/s")
+    for pid, processo in resultado['processos'].items():
+        print(f"{processo['papel']:<10} {pid:>8}  CPU média {processo['cpu_medio']:6.1f}%  pico {processo['cpu_pico']:6.1f}%  "
+              f"RSS pico {processo['rss_pico'] / 2**20:8.1f} MiB  final {processo['rss_final'] / 2**20:8.1f} MiB")
+    if resultado['falhas']:
+        print(f"\n{len(resultado['falhas'])} sessão(ões) com falha: {resultado['falhas'][0]}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessoes', type=int, default=SESSOES, help='sessões simultâneas')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='workers do uvicorn')
+    parser.add_argument('--duracao', type=float, default=DURACAO, help='duração do teste, em segundos')
+    parser.add_argument('--pensar', type=float, default=PENSAR, help='tempo médio entre interações de uma sessão, em segundos')
+    parser.add_argument('--rampa', type=float, default=RAMPA, help='segundos ao longo dos quais as sessões são abertas')
+    parser.add_argument('--porta', type=int, default=PORTA)
+    parser.add_argument('--url', help='websocket de um servidor já em execução (ws://host:porta/websocket/)')
+    parser.add_argument('--semente', type=int, help='semente das escolhas das sessões')
+    parser.add_argument('--tempo-limite', type=float, default=TEMPO_LIMITE, help='espera máxima pelas saídas de uma interação, em segundos')
+    parser.add_argument('--saida', help='arquivo JSON com o resultado')
+    args = parser.parse_args()
+
+    resultado = executar(args.sessoes, args.workers, args.duracao, args.pensar, args.rampa, args.porta, args.url, args.semente, args.tempo_limite)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+    imprimir(resultado)
@@ -0,0 +1,217 @@
+"""Cubo mensal pré-agregado dos dados operacionais.
+
+Os indicadores operacionais só precisam dos dados no grão (mês, empresa,
+nacionalidade), além dos destinos atendidos por empresa em cada mês. O cubo
+é montado uma vez na carga e os filtros do dashboard passam a rodar sobre
+alguns milhares de linhas em vez das linhas de rota.
+
+Contagens de destinos distintos não são aditivas, então os destinos ficam em
+um índice de bitsets: cada aeroporto recebe um id inteiro e cada (mês,
+empresa) guarda um bitset dos destinos atendidos. A contagem para qualquer
+seleção é um OR dos bitsets seguido de popcount.
+
+Para uma seleção do dashboard, ``agregar_selecao`` calcula de uma vez todos
+os agregados usados pelos KPIs e gráficos operacionais; ``agregar_por_empresa``
+abre os mesmos indicadores por empresa, para a API de consulta.
+
+No modo de comparação, ``comparar_selecao`` recorta o cubo uma única vez,
+cobrindo a seleção e o período anterior (12 meses antes para ano contra ano,
+3 para trimestre contra trimestre). O período anterior é deslocado para as
+datas da seleção, agregado como ela, e os valores são alinhados às mesmas
+linhas (mês ou empresa e trimestre) por reindexação.
+"""
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from dados import COLUNAS_METRICAS
+
+
+GRAO_CUBO = ['dt_referencia', 'EMPRESA (SIGLA)', 'EMPRESA (NACIONALIDADE)']
+GRAO_DESTINOS = ['dt_referencia', 'EMPRESA (SIGLA)']
+COLUNA_DESTINO = 'AEROPORTO DE DESTINO (SIGLA)'
+
+# Coluna de tempo de cada nível de agregação por empresa
+NIVEIS = {
+    'mensal': 'dt_referencia',
+    'trimestral': 'quarter',
+    'total': None,
+}
+
+# Deslocamento, em meses, do período anterior em cada modo de comparação
+MESES_COMPARACAO = {
+    'yoy': 12,
+    'qoq': 3,
+}
+
+
+class Agregados(NamedTuple):
+    """Agregados de uma seleção, compartilhados pelos KPIs e gráficos"""
+    totais: pd.Series  # soma de cada métrica
+    mensal: pd.DataFrame  # métricas por mês, todas as empresas
+    trimestral: pd.DataFrame  # métricas por empresa e trimestre (coluna quarter)
+    destinos: int  # destinos distintos
+    destinos_trimestral: pd.DataFrame  # destinos distintos por empresa e trimestre
+
+
+class Comparacao(NamedTuple):
+    """Agregados do período anterior alinhados às linhas dos ``Agregados`` da seleção"""
+    totais: pd.Series  # soma de cada métrica; NaN se os dados não cobrem o período anterior
+    mensal: pd.DataFrame  # métricas nas mesmas linhas de Agregados.mensal
+    trimestral: pd.DataFrame  # métricas nas mesmas linhas de Agregados.trimestral
+    destinos: float  # destinos distintos; NaN se os dados não cobrem o período anterior
+    destinos_trimestral: pd.DataFrame  # destinos nas mesmas linhas de Agregados.destinos_trimestral
+
+
+class IndiceDestinos(NamedTuple):
+    """Bitsets de destinos: ``bits[i]`` guarda os aeroportos da chave ``chaves.iloc[i]``"""
+    chaves: pd.DataFrame  # uma linha por (mês, empresa)
+    bits: np.ndarray  # uint64, chaves x ceil(aeroportos / 64)
+    aeroportos: pd.Index  # sigla de cada aeroporto, na posição do seu id
+
+
+def build_cubo(df):
+    """Soma as métricas operacionais por mês, empresa e nacionalidade"""
+    return df.groupby(GRAO_CUBO, observed=True)[COLUNAS_METRICAS].sum().reset_index()
+
+
+def agregar_trimestres(cubo, colunas):
+    """Soma as colunas por empresa e trimestre (coluna ``quarter``)"""
+    trimestre = cubo['dt_referencia'].dt.to_period('Q').rename('quarter')
+    return cubo.groupby([cubo['EMPRESA (SIGLA)'], trimestre], observed=True)[colunas].sum().reset_index()
+
+
+def build_indice_destinos(df):
+    """Monta o bitset de destinos atendidos por empresa em cada mês"""
+    aeroportos = pd.Index(df[COLUNA_DESTINO].cat.categories)
+    codigos = df[COLUNA_DESTINO].cat.codes.to_numpy()
+    grupos = df.groupby(GRAO_DESTINOS, observed=True, sort=True)
+    chave = grupos.ngroup().to_numpy()
+    chaves = grupos.size().reset_index()[GRAO_DESTINOS]
+
+    validos = codigos >= 0
+    chave, codigos = chave[validos], codigos[validos].astype(np.uint64)
+    bits = np.zeros((len(chaves), max(1, -(-len(aeroportos) // 64))), dtype=np.uint64)
+    np.bitwise_or.at(bits, (chave, codigos // 64), np.left_shift(np.uint64(1), codigos % 64))
+    return IndiceDestinos(chaves, bits, aeroportos)
+
+
+def filtrar_destinos(indice, mask):
+    """Subconjunto do índice para uma máscara sobre as chaves"""
+    mask = np.asarray(mask)
+    return IndiceDestinos(indice.chaves.loc[mask].reset_index(drop=True), indice.bits[mask], indice.aeroportos)
+
+
+def contar_destinos(indice):
+    """Número de destinos distintos em todo o índice"""
+    return int(np.bitwise_count(np.bitwise_or.reduce(indice.bits, axis=0)).sum())
+
+
+def contar_destinos_por(indice, by):
+    """Destinos distintos por grupo; ``by`` mapeia nome da coluna -> Series alinhada às chaves"""
+    if len(indice.chaves) == 0:
+        return pd.DataFrame(columns=[*by.keys(), COLUNA_DESTINO])
+    grupos = indice.chaves.groupby(list(by.values()), observed=True, sort=True)
+    ids = grupos.ngroup().to_numpy()
+    ordem = np.argsort(ids, kind='stable')
+    inicios = np.flatnonzero(np.r_[True, np.diff(ids[ordem]) != 0])
+    uniao = np.bitwise_or.reduceat(indice.bits[ordem], inicios, axis=0)
+
+    resultado = grupos.size().index.to_frame(index=False)
+    resultado.columns = list(by.keys())
+    resultado[COLUNA_DESTINO] = np.bitwise_count(uniao).sum(axis=1)
+    return resultado
+
+
+def filtrar_selecao(cubo, indice_destinos, inicio, fim, empresas):
+    """Recorte do cubo e do índice de destinos para um período (inclusivo) e empresas"""
+    inicio, fim = pd.Timestamp(inicio), pd.Timestamp(fim)
+    mask = (
+        (cubo['dt_referencia'] >= inicio) &
+        (cubo['dt_referencia'] <= fim) &
+        (cubo['EMPRESA (SIGLA)'].isin(empresas))
+    )
+    chaves = indice_destinos.chaves
+    mask_destinos = (
+        (chaves['dt_referencia'] >= inicio) &
+        (chaves['dt_referencia'] <= fim) &
+        (chaves['EMPRESA (SIGLA)'].isin(empresas))
+    )
+    return cubo.loc[mask], filtrar_destinos(indice_destinos, mask_destinos)
+
+
+def agregar_selecao(cubo, indice_destinos):
+    """Agregados mensais, trimestrais e totais de uma seleção a partir de um único agrupamento"""
+    # (mês, empresa) é o menor grão comum: os demais níveis saem desse frame pequeno
+    por_mes = cubo.groupby(GRAO_DESTINOS, observed=True)[COLUNAS_METRICAS].sum().reset_index()
+    mensal = por_mes.groupby('dt_referencia')[COLUNAS_METRICAS].sum().reset_index()
+    return Agregados(
+        totais=mensal[COLUNAS_METRICAS].sum(),
+        mensal=mensal,
+        trimestral=agregar_trimestres(por_mes, COLUNAS_METRICAS),
+        destinos=contar_destinos(indice_destinos),
+        destinos_trimestral=contar_destinos_por(indice_destinos, {
+            'EMPRESA (SIGLA)': indice_destinos.chaves['EMPRESA (SIGLA)'],
+            'quarter': indice_destinos.chaves['dt_referencia'].dt.to_period('Q'),
+        }),
+    )
+
+
+def alinhar(atual, anterior, chaves, colunas):
+    """Colunas de ``anterior`` nas linhas de ``atual`` com as mesmas chaves (NaN sem correspondência)"""
+    return anterior.set_index(chaves)[colunas].reindex(atual.set_index(chaves).index).reset_index(drop=True)
+
+
+def comparar_selecao(cubo, indice_destinos, inicio, fim, empresas, meses):
+    """Agregados da seleção e do mesmo período ``meses`` antes, a partir de um único recorte do cubo"""
+    inicio, fim = pd.Timestamp(inicio), pd.Timestamp(fim)
+    deslocamento = pd.DateOffset(months=meses)
+    recorte, destinos = filtrar_selecao(cubo, indice_destinos, inicio - deslocamento, fim, empresas)
+    datas_destinos = destinos.chaves['dt_referencia']
+
+    atual = agregar_selecao(
+        recorte.loc[recorte['dt_referencia'] >= inicio],
+        filtrar_destinos(destinos, datas_destinos >= inicio),
+    )
+    # Com as datas deslocadas, meses e trimestres do período anterior têm os rótulos da seleção
+    destinos_anteriores = filtrar_destinos(destinos, datas_destinos <= fim - deslocamento)
+    anterior = agregar_selecao(
+        recorte.loc[recorte['dt_referencia'] <= fim - deslocamento].assign(dt_referencia=lambda df: df['dt_referencia'] + deslocamento),
+        destinos_anteriores._replace(chaves=destinos_anteriores.chaves.assign(dt_referencia=lambda df: df['dt_referencia'] + deslocamento)),
+    )
+
+    # Totais de um período anterior sem dados seriam uma base de comparação falsa
+    completo = inicio - deslocamento >= cubo['dt_referencia'].min()
+    trimestre = ['EMPRESA (SIGLA)', 'quarter']
+    return atual, Comparacao(
+        totais=anterior.totais if completo else anterior.totais * np.nan,
+        mensal=alinhar(atual.mensal, anterior.mensal, ['dt_referencia'], COLUNAS_METRICAS),
+        trimestral=alinhar(atual.trimestral, anterior.trimestral, trimestre, COLUNAS_METRICAS),
+        destinos=anterior.destinos if completo else np.nan,
+        destinos_trimestral=alinhar(atual.destinos_trimestral, anterior.destinos_trimestral, trimestre, [COLUNA_DESTINO]),
+    )
+
+
+def agregar_por_empresa(cubo, indice_destinos, nivel='mensal'):
+    """Métricas, load factor e destinos distintos por empresa em cada mês, trimestre ou no total"""
+    coluna_tempo = NIVEIS[nivel]
+
+    def chaves(frame):
+        grupos = {'EMPRESA (SIGLA)': frame['EMPRESA (SIGLA)']}
+        if coluna_tempo == 'dt_referencia':
+            grupos[coluna_tempo] = frame['dt_referencia']
+        elif coluna_tempo == 'quarter':
+            grupos[coluna_tempo] = frame['dt_referencia'].dt.to_period('Q')
+        return grupos
+
+    grupos = chaves(cubo)
+    metricas = cubo.groupby(list(grupos.values()), observed=True, sort=True)[COLUNAS_METRICAS].sum()
+    metricas.index.names = list(grupos.keys())
+    metricas = metricas.reset_index()
+    metricas['LOAD FACTOR'] = (metricas['RPK'] / metricas['ASK'].where(metricas['ASK'] != 0)) * 100
+    if len(indice_destinos.chaves) == 0:
+        metricas[COLUNA_DESTINO] = 0
+        return metricas
+    destinos = contar_destinos_por(indice_destinos, chaves(indice_destinos.chaves))
+    return metricas.merge(destinos, on=list(grupos.keys()), how='left')
@@ -0,0 +1,128 @@
+"""Armazenamento colunar (Parquet) dos dados operacionais da ANAC.
+
+O CSV gerado pelo notebook é convertido uma única vez em um dataset Parquet
+particionado por ano/mês, já tipado e apenas com as colunas usadas pelo
+dashboard. O app carrega esse dataset em vez de fazer o parse do CSV.
+
+Uso: python dados.py [--csv CAMINHO] [--destino DIRETORIO]
+"""
+import argparse
+import os
+import shutil
+
+import pandas as pd
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+file_operacional_path = os.path.join(DATA_DIR, 'anac_dados_estatisticos.csv')
+dataset_operacional_path = os.path.join(DATA_DIR, 'operacional')
+file_financeiro_path = os.path.join(DATA_DIR, 'demonstrativos.csv')
+dataset_financeiro_path = os.path.join(DATA_DIR, 'financeiro')
+
+COLUNAS_CATEGORICAS = [
+    'EMPRESA (SIGLA)',
+    'EMPRESA (NACIONALIDADE)',
+    'AEROPORTO DE ORIGEM (SIGLA)',
+    'AEROPORTO DE DESTINO (SIGLA)',
+]
+
+COLUNAS_METRICAS = [
+    'ASK',
+    'RPK',
+    'PASSAGEIROS PAGOS',
+    'PASSAGEIROS GRÁTIS',
+    'DECOLAGENS',
+]
+
+# Colunas efetivamente usadas pelos indicadores operacionais
+COLUNAS_OPERACIONAIS = ['dt_referencia'] + COLUNAS_CATEGORICAS + COLUNAS_METRICAS
+
+COLUNAS_FINANCEIRO = [
+    'file_name',
+    'sheet_name',
+    'empresa',
+    'periodo',
+    'ano',
+    'trimestre',
+    'demonstrativo',
+    'conta',
+    'descricao_conta',
+    'tipo_saldo',
+    'valor_saldo',
+    'nivel_conta',
+]
+
+
+def tipar_operacional(df, categorias=True):
+    """Aplica os tipos do armazenamento colunar às colunas operacionais"""
+    if 'dt_referencia' in df.columns:
+        df['dt_referencia'] = pd.to_datetime(df['dt_referencia'])
+    if categorias:
+        for coluna in df.columns.intersection(COLUNAS_CATEGORICAS):
+            df[coluna] = df[coluna].astype('category')
+    for coluna in df.columns.intersection(COLUNAS_METRICAS):
+        df[coluna] = pd.to_numeric(df[coluna], errors='coerce').fillna(0).astype('float64')
+    return df
+
+
+def ordenar_categorias(df):
+    """Ordena as categorias; dicionários vindos de partições diferentes não chegam ordenados"""
+    for coluna in df.columns.intersection(COLUNAS_CATEGORICAS):
+        df[coluna] = df[coluna].cat.reorder_categories(sorted(df[coluna].cat.categories))
+    return df
+
+
+def build_dataset_operacional(csv_path=file_operacional_path, dataset_path=dataset_operacional_path):
+    """Converte o CSV operacional em um dataset Parquet particionado por ano/mês"""
+    df = pd.read_csv(csv_path, usecols=COLUNAS_OPERACIONAIS)
+    df = tipar_operacional(df)
+    df['ano'] = df['dt_referencia'].dt.year.astype('int16')
+    df['mes'] = df['dt_referencia'].dt.month.astype('int8')
+
+    # Escreve em um diretório temporário e troca no final para não deixar o
+    # dataset pela metade caso a conversão falhe
+    tmp_path = dataset_path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    df.to_parquet(tmp_path, partition_cols=['ano', 'mes'], index=False)
+    shutil.rmtree(dataset_path, ignore_errors=True)
+    os.replace(tmp_path, dataset_path)
+    return dataset_path
+
+
+def load_operacional(columns=COLUNAS_OPERACIONAIS, dataset_path=dataset_operacional_path, csv_path=file_operacional_path):
+    """Carrega os dados operacionais, preferindo o dataset Parquet ao CSV"""
+    if os.path.isdir(dataset_path):
+        df = pd.read_parquet(dataset_path, columns=columns)
+    else:
+        df = pd.read_csv(csv_path, usecols=columns)
+        df = tipar_operacional(df)
+    return ordenar_categorias(df)
+
+
+def tipar_financeiro(df):
+    """Aplica os tipos do armazenamento colunar aos demonstrativos"""
+    df = df.astype({
+        'ano': 'int16',
+        'nivel_conta': 'int8',
+        'valor_saldo': 'float64',
+    })
+    for coluna in ['file_name', 'sheet_name', 'empresa', 'periodo', 'trimestre', 'demonstrativo', 'conta', 'descricao_conta', 'tipo_saldo']:
+        df[coluna] = df[coluna].astype(str).astype('category')
+    return df
+
+
+def load_financeiro(dataset_path=dataset_financeiro_path, csv_path=file_financeiro_path):
+    """Carrega os demonstrativos financeiros, preferindo o Parquet das planilhas ao CSV"""
+    if os.path.isdir(dataset_path) and any(nome.endswith('.parquet') for nome in os.listdir(dataset_path)):
+        return pd.read_parquet(dataset_path)
+    # Códigos como "1.10" não podem virar número
+    return pd.read_csv(csv_path, dtype={'conta': str})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', default=file_operacional_path)
+    parser.add_argument('--destino', default=dataset_operacional_path)
+    args = parser.parse_args()
+    print(build_dataset_operacional(args.csv, args.destino))
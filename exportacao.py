@@ -0,0 +1,180 @@
+"""Exportação dos dados filtrados em blocos, com memória constante.
+
+Os dados saem como uma sequência de lotes Arrow (``RecordBatch``), e cada
+lote é serializado e entregue antes de o próximo ser lido:
+
+- linhas de rota vêm direto do dataset Parquet, lidas em lotes com o filtro
+  de período e empresas aplicado na leitura (partições ano/mês fora do
+  período nem são abertas); sem o dataset, o CSV é lido em blocos;
+- os níveis mensal e trimestral saem do cubo, já pequenos;
+- os demonstrativos saem da matriz de saldos, uma coluna (empresa, período)
+  por vez.
+
+O CSV é escrito bloco a bloco e o Parquet ganha um row group por lote; em
+ambos só o lote corrente fica em memória, qualquer que seja o tamanho da
+seleção. Uma seleção vazia ainda rende um lote vazio com o schema, para o
+arquivo sair com cabeçalho (CSV) ou rodapé (Parquet) válidos.
+"""
+import io
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from cubo import agregar_por_empresa, filtrar_selecao
+from dados import COLUNAS_OPERACIONAIS, dataset_operacional_path, file_operacional_path, tipar_operacional
+from financeiro import INDICE_COLUNAS, INDICE_LINHAS, tabela_contas
+
+
+LINHAS_LOTE = 50_000
+
+NIVEIS_OPERACIONAL = {
+    'rotas': 'Linhas de rota',
+    'mensal': 'Mensal por empresa',
+    'trimestral': 'Trimestral por empresa',
+}
+NIVEIS_FINANCEIRO = {
+    'conta': 'Conta selecionada',
+    'demonstrativos': 'Todas as contas',
+}
+FORMATOS_EXPORTACAO = {
+    'csv': 'CSV',
+    'parquet': 'Parquet',
+}
+
+
+class _Saida(io.RawIOBase):
+    """Destino de escrita que acumula os bytes até serem retirados com ``retirar``.
+
+    ``tell`` continua contando os bytes já retirados, como em um arquivo, o
+    que o writer de Parquet usa para os offsets do rodapé.
+    """
+
+    def __init__(self):
+        self._partes = []
+        self._posicao = 0
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self._posicao
+
+    def retirar(self):
+        dados = b''.join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+def _sem_dicionarios(lote):
+    # Categorias vêm com o dicionário de cada partição; texto simples é estável entre lotes
+    return pa.RecordBatch.from_arrays(
+        [pc.cast(coluna, pa.string()) if pa.types.is_dictionary(coluna.type) else coluna for coluna in lote.columns],
+        names=lote.schema.names,
+    )
+
+
+def _lote_vazio(schema):
+    # Um lote vazio ainda leva o schema, para o Parquet sair válido e o CSV com
+    # cabeçalho; colunas sem nenhum valor (tipo null) saem como texto
+    schema = pa.schema([campo.with_type(pa.string()) if pa.types.is_null(campo.type) else campo for campo in schema])
+    return pa.RecordBatch.from_pylist([], schema=schema)
+
+
+def lotes_rotas(inicio, fim, empresas, dataset_path=dataset_operacional_path, csv_path=file_operacional_path, linhas_lote=LINHAS_LOTE):
+    """Linhas de rota do período e empresas, em lotes lidos do armazenamento colunar"""
+    inicio, fim = pd.Timestamp(inicio), pd.Timestamp(fim)
+    if os.path.isdir(dataset_path):
+        dataset = ds.dataset(dataset_path, format='parquet', partitioning='hive')
+        filtro = (
+            (ds.field('ano') >= inicio.year) & (ds.field('ano') <= fim.year) &
+            (ds.field('dt_referencia') >= pa.scalar(inicio, pa.timestamp('ns'))) &
+            (ds.field('dt_referencia') <= pa.scalar(fim, pa.timestamp('ns'))) &
+            ds.field('EMPRESA (SIGLA)').isin(pa.array(list(empresas), pa.string()))
+        )
+        vazio = True
+        for lote in dataset.to_batches(columns=COLUNAS_OPERACIONAIS, filter=filtro, batch_size=linhas_lote):
+            if lote.num_rows:
+                vazio = False
+                yield _sem_dicionarios(lote)
+        if vazio:
+            yield _lote_vazio(_sem_dicionarios(pa.RecordBatch.from_pylist([], schema=dataset.schema).select(COLUNAS_OPERACIONAIS)).schema)
+        return
+
+    lote = None
+    vazio = True
+    for bloco in pd.read_csv(csv_path, usecols=COLUNAS_OPERACIONAIS, chunksize=linhas_lote):
+        bloco = tipar_operacional(bloco, categorias=False)
+        bloco = bloco[bloco['dt_referencia'].between(inicio, fim) & bloco['EMPRESA (SIGLA)'].isin(empresas)]
+        lote = pa.RecordBatch.from_pandas(bloco[COLUNAS_OPERACIONAIS], preserve_index=False)
+        if lote.num_rows:
+            vazio = False
+            yield lote
+    if vazio and lote is not None:
+        yield _lote_vazio(lote.schema)
+
+
+def lotes_agregados(snapshot, inicio, fim, empresas, nivel, linhas_lote=LINHAS_LOTE):
+    """Métricas por empresa e mês ou trimestre, a partir do cubo"""
+    cubo, destinos = filtrar_selecao(snapshot.cubo, snapshot.indice_destinos, inicio, fim, empresas)
+    df = agregar_por_empresa(cubo, destinos, nivel)
+    df['EMPRESA (SIGLA)'] = df['EMPRESA (SIGLA)'].astype(str)
+    if 'quarter' in df.columns:
+        df['quarter'] = df['quarter'].astype(str)
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    yield from tabela.to_batches(max_chunksize=linhas_lote) or [_lote_vazio(tabela.schema)]
+
+
+def lotes_financeiro(demonstrativos, empresas, nivel, conta=None):
+    """Saldos da conta selecionada ou de todas as contas, uma coluna (empresa, período) por lote"""
+    if nivel == 'conta':
+        df = tabela_contas(demonstrativos, [conta], empresas)
+        lote = pa.RecordBatch.from_pandas(df, preserve_index=False)
+        yield lote if lote.num_rows else _lote_vazio(lote.schema)
+        return
+
+    saldos = demonstrativos.saldos
+    linhas = saldos.index.to_frame(index=False)
+    vazio = True
+    for (empresa, periodo), posicao in demonstrativos.colunas.items():
+        if empresa not in empresas:
+            continue
+        valores = saldos.iloc[:, posicao].to_numpy()
+        presentes = ~pd.isna(valores)
+        lote = linhas.loc[presentes, INDICE_LINHAS].assign(empresa=empresa, periodo=periodo, valor_saldo=valores[presentes])
+        vazio = False
+        yield pa.RecordBatch.from_pandas(lote[INDICE_COLUNAS + INDICE_LINHAS + ['valor_saldo']], preserve_index=False)
+    if vazio:
+        yield _lote_vazio(pa.schema([(nome, pa.string()) for nome in INDICE_COLUNAS + INDICE_LINHAS] + [('valor_saldo', pa.float64())]))
+
+
+def serializar(lotes, formato):
+    """Bytes do arquivo CSV ou Parquet, entregues à medida que cada lote é escrito"""
+    saida = _Saida()
+    if formato == 'csv':
+        cabecalho = True
+        for lote in lotes:
+            lote.to_pandas().to_csv(saida, index=False, header=cabecalho, mode='wb')
+            cabecalho = False
+            yield saida.retirar()
+        return
+
+    writer = None
+    try:
+        for lote in lotes:
+            if writer is None:
+                writer = pq.ParquetWriter(saida, lote.schema)
+            writer.write_batch(lote)
+            yield saida.retirar()
+    finally:
+        if writer is not None:
+            writer.close()
+    yield saida.retirar()
@@ -0,0 +1,349 @@
+"""Emissão compacta das figuras do Plotly enviadas aos widgets.
+
+Cada figura vai para o navegador como JSON pelo ``shinywidgets``. Para manter
+esse payload pequeno:
+
+- o ``FigureWidget`` do Plotly é um anywidget que envia o próprio código JS
+  (~5 MB) junto com cada figura, em cada sessão; aqui esse código é servido
+  uma vez como arquivo estático (com cache do navegador) e o widget só
+  carrega um módulo de poucas linhas que o importa;
+- o template padrão do Plotly (~7 KB, com estilos de mapas, polar, 3D e
+  escalas de cor que o dashboard não usa) é trocado por um recorte com o que
+  afeta barras e linhas em eixos cartesianos, mais o estilo dos rótulos das
+  barras (assim ele não se repete em cada trace);
+- as séries numéricas saem como arrays float64 contíguos, que o widget envia
+  como buffers binários em vez de listas JSON;
+- rótulos e hovers são templates do Plotly (``texttemplate`` e
+  ``hovertemplate``) sobre os valores, em vez de um texto Python por ponto;
+- datas mensais viram textos ``AAAA-MM``, em vez de timestamps completos;
+- séries mensais longas são agregadas por trimestre no servidor.
+
+Os gráficos de barras por empresa saem todos de ``barras_por_empresa``: o
+frame já agrupado é dividido por empresa em um único ``groupby`` e as barras
+são montadas sobre um layout base criado uma vez no import.
+
+As funções ``figura_*`` montam cada gráfico do dashboard a partir dos
+agregados já calculados, sem depender de uma sessão do Shiny. No modo de
+comparação recebem também os valores do período anterior, já alinhados às
+mesmas linhas: as barras ganham a variação no rótulo e o gráfico mensal uma
+linha com o load factor do período anterior.
+
+O explorador de rotas usa as mesmas barras por empresa, sobre as consultas
+ao índice de rotas (``rotas.py``).
+"""
+import functools
+import os
+
+import numpy as np
+import pandas as pd
+import plotly
+import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.subplots import make_subplots
+
+from financeiro import serie_comparacao, serie_conta
+from formatacao import escala, format_variacoes, variacao
+
+
+# Código JS do FigureWidget, servido pelo app em ROTA_WIDGET. Só este arquivo é
+# exposto, não o resto de package_data (plotly.min.js, datasets, templates)
+ARQUIVO_WIDGET = os.path.join(os.path.dirname(plotly.__file__), 'package_data', 'widgetbundle.js')
+ROTA_WIDGET = '/plotly-widget/widgetbundle.js'
+
+# Módulo do widget: importa o pacote estático (baixado uma vez por página)
+ESM_WIDGET = f"""
+const url = new URL("{ROTA_WIDGET.lstrip('/')}", document.baseURI);
+const widget = await import(url.href);
+export default widget.default;
+"""
+
+# Partes do template "plotly" usadas por gráficos de barras e linhas
+CHAVES_TEMPLATE = [
+    'autotypenumbers',
+    'colorway',
+    'font',
+    'hoverlabel',
+    'hovermode',
+    'paper_bgcolor',
+    'plot_bgcolor',
+    'title',
+    'xaxis',
+    'yaxis',
+]
+
+TEMPLATE = go.layout.Template(
+    layout={chave: pio.templates['plotly'].layout[chave] for chave in CHAVES_TEMPLATE},
+    data={
+        # Rótulos de todas as barras do dashboard, uma vez por figura e não por trace
+        'bar': [
+            go.Bar(barra, textangle=-90, textposition='inside', textfont=dict(color='white', size=12))
+            for barra in pio.templates['plotly'].data.bar
+        ],
+        'scatter': pio.templates['plotly'].data.scatter,
+    },
+)
+
+# Acima disso uma série mensal é agregada por trimestre
+MAX_PONTOS_MENSAIS = 36
+
+color_mapping = {
+    'AZU': '#53B2E5',
+    'GLO': '#EE793A',
+    'TAM': '#D93555',
+}
+COR_PADRAO = '#f8f8f8'
+
+# Layout comum a todos os gráficos, validado uma única vez
+LAYOUT_BASE = go.Layout(
+    template=TEMPLATE,
+    showlegend=True,
+    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+    hovermode='x unified',
+    margin=dict(t=50, b=50, l=50, r=50),
+    plot_bgcolor='rgba(0,0,0,0)',  # Remove cor de fundo do gráfico
+    paper_bgcolor='rgba(0,0,0,0)',  # Remove cor de fundo do papel
+    # Remover completamente o menu de opções do Plotly
+    modebar={'remove': ['pan2d', 'select2d', 'lasso2d', 'resetScale2d', 'zoomIn2d', 'zoomOut2d', 'autoScale2d', 'zoom2d', 'toImage', 'downloadPlot']},
+)
+
+
+class FiguraWidget(go.FigureWidget):
+    """FigureWidget que carrega o código JS do arquivo estático em vez de enviá-lo"""
+    # Depende de detalhes internos do plotly 6.3: BaseFigureWidget
+    # (plotly/basewidget.py) é um anywidget com _esm apontando para
+    # package_data/widgetbundle.js, que exporta o widget como default. Ao
+    # atualizar o plotly, conferir se o caminho e o export continuam os mesmos
+    _esm = ESM_WIDGET
+
+
+def como_widget(fn):
+    """Decorador para funções de figura: cada render recebe um FiguraWidget próprio"""
+    @functools.wraps(fn)
+    def wrapper():
+        fig = fn()
+        return FiguraWidget(fig.data, fig.layout)
+    return wrapper
+
+
+def valores(serie):
+    """Array float64 contíguo, enviado ao navegador como buffer binário"""
+    return np.ascontiguousarray(serie, dtype='float64')
+
+
+def rotulos_mes(datas):
+    """Datas mensais como textos ``AAAA-MM``, que o Plotly lê como datas"""
+    return pd.Series(datas).dt.strftime('%Y-%m').to_numpy()
+
+
+def agregar_meses(df, colunas, coluna_data='dt_referencia'):
+    """Soma as colunas por trimestre se a série tiver mais de MAX_PONTOS_MENSAIS meses.
+
+    Um trimestre com algum mês sem valor (por exemplo, sem dados do ano
+    anterior) fica sem valor na coluna, em vez de somar só parte dos meses.
+    Retorna o frame (já ordenado por data) e o espaçamento dos ticks do eixo x.
+    """
+    if df[coluna_data].nunique() <= MAX_PONTOS_MENSAIS:
+        return df.sort_values(coluna_data), 'M1'
+    trimestre = df[coluna_data].dt.to_period('Q').dt.start_time.rename(coluna_data)
+    grupos = df.groupby(trimestre)[colunas]
+    completos = grupos.count().eq(grupos.size(), axis=0)
+    return grupos.sum(min_count=1).where(completos).reset_index(), 'M3'
+
+
+def rotulos(valores, variacoes=None):
+    """Dados dos rótulos das barras, montados no navegador por um template do Plotly.
+
+    Retorna ``customdata`` (os valores divididos pela escala K, M ou B do maior
+    deles, em float32, e a variação, se houver), o texto por ponto (só a
+    variação, quando algum ponto não tem base de comparação; senão None) e o
+    template, um só para todas as barras da figura.
+    """
+    divisor, sufixo = escala(valores)
+    casas = 1 if sufixo else 0
+    customdata = (np.asarray(valores, dtype='float64') / divisor).astype(np.float32)
+    if variacoes is None:
+        return customdata, None, f'%{{customdata:.{casas}f}}{sufixo}'
+    variacoes = np.asarray(variacoes, dtype='float64')
+    sem_base = np.isnan(variacoes)
+    if sem_base.any():
+        # O template não tem como omitir um NaN: com pontos sem base de
+        # comparação, a variação vai como texto, vazio nesses pontos
+        texto = np.where(sem_base, '', np.strings.add(np.strings.add(' (', format_variacoes(variacoes)), ')'))
+        return customdata, texto, f'%{{customdata:.{casas}f}}{sufixo}%{{text}}'
+    customdata = np.column_stack([customdata, variacoes.astype(np.float32)])
+    return customdata, None, f'%{{customdata[0]:.{casas}f}}{sufixo} (%{{customdata[1]:+.1f}}%)'
+
+
+def com_rotulos(fig, modelo):
+    """Usa ``modelo`` no texto e no hover das barras, uma vez no template da figura"""
+    fig.layout.template.data.bar[0].update(texttemplate=modelo, hovertemplate=modelo)
+    return fig
+
+
+def barras_por_empresa(df, x, y, empresa='EMPRESA (SIGLA)', coluna_variacao=None):
+    """Barras de ``y`` por ``x``, uma série por empresa, a partir de um frame já agrupado"""
+    df = df.reset_index(drop=True)
+    customdata, texto, modelo = rotulos(df[y], None if coluna_variacao is None else df[coluna_variacao])
+    traces = [
+        go.Bar(
+            x=dados[x].astype(str).to_numpy(),
+            y=valores(dados[y]),
+            name=f'{nome}',
+            marker_color=color_mapping.get(nome, COR_PADRAO),
+            customdata=customdata[dados.index],
+            text=None if texto is None else texto[dados.index],
+        )
+        for nome, dados in df.groupby(empresa, observed=True, sort=True)
+    ]
+    return com_rotulos(go.Figure(data=traces, layout=LAYOUT_BASE), modelo)
+
+
+def _tamanho_json(valor):
+    # Arrays numéricos vão para o navegador em base64 (4 bytes para cada 3);
+    # textos, com aspas e separador por item
+    if isinstance(valor, np.ndarray):
+        if valor.dtype.kind in 'iufb':
+            return valor.nbytes * 4 // 3 + 32
+        return int(np.strings.str_len(valor.astype(str)).sum()) + 3 * valor.size
+    if isinstance(valor, dict):
+        return sum(len(chave) + 4 + _tamanho_json(item) for chave, item in valor.items())
+    if isinstance(valor, (list, tuple)):
+        return sum(_tamanho_json(item) + 1 for item in valor) + 2
+    return len(str(valor)) + 2
+
+
+def tamanho_payload(fig):
+    """Bytes estimados do JSON da figura, a partir dos arrays dos traces e sem serializá-la"""
+    return sum(_tamanho_json(trace.to_plotly_json()) for trace in fig.data) + _tamanho_json(fig.layout.to_plotly_json())
+
+
+def figura_rpk_ask_load_factor(mensal, anterior=None):
+    """Barras de RPK e ASK por mês (ou trimestre) com a linha do load factor"""
+    grouped = mensal[['dt_referencia', 'RPK', 'ASK']]
+    colunas = ['RPK', 'ASK']
+    if anterior is not None:
+        grouped = grouped.assign(**{'RPK anterior': anterior['RPK'].to_numpy(), 'ASK anterior': anterior['ASK'].to_numpy()})
+        colunas += ['RPK anterior', 'ASK anterior']
+    # Períodos longos são agregados por trimestre para limitar o número de barras
+    grouped, dtick = agregar_meses(grouped, colunas)
+    grouped['Load Factor'] = (grouped['RPK'] / grouped['ASK']) * 100
+    datas = rotulos_mes(grouped['dt_referencia'])
+    # RPK e ASK na mesma escala, com um template só
+    customdata, _, modelo = rotulos(np.concatenate([grouped['RPK'], grouped['ASK']]))
+    customdata_rpk, customdata_ask = np.split(customdata, 2)
+    fig = make_subplots(specs=[[{"secondary_y": True}]], figure=com_rotulos(go.Figure(layout=LAYOUT_BASE), modelo))
+    fig.add_trace(
+        go.Bar(
+            x=datas,
+            y=valores(grouped['RPK']),
+            name='RPK',
+            marker_color='#B3B3B3',
+            yaxis='y1',
+            customdata=customdata_rpk,
+        ),
+        secondary_y=False,
+    )
+    fig.add_trace(
+        go.Bar(
+            x=datas,
+            y=valores(grouped['ASK']),
+            name='ASK',
+            marker_color='#666666',
+            yaxis='y1',
+            customdata=customdata_ask,
+        ),
+        secondary_y=False,
+    )
+
+    fig.add_trace(
+        go.Scatter(
+            x=datas,
+            y=valores(grouped['Load Factor']),
+            name='Load Factor',
+            mode='lines+markers',
+            line=dict(color='black', width=2),
+            yaxis='y2',
+            hovertemplate='%{y:.2f}%',
+        ),
+        secondary_y=True,
+    )
+
+    if anterior is not None:
+        load_factor_anterior = (grouped['RPK anterior'] / grouped['ASK anterior']) * 100
+        fig.add_trace(
+            go.Scatter(
+                x=datas,
+                y=valores(load_factor_anterior),
+                name='Load Factor (anterior)',
+                mode='lines',
+                line=dict(color='black', width=1, dash='dash'),
+                yaxis='y2',
+                hovertemplate='%{y:.2f}%',
+            ),
+            secondary_y=True,
+        )
+
+    # Configurar eixos
+    fig.update_xaxes(
+        dtick=dtick,
+        tickformat="%b\n%Y",
+    )
+
+    fig.update_yaxes(
+        title_text="RPK / ASK",
+        secondary_y=False,
+        showgrid=True,  # Adiciona linhas de grade ao eixo y primário
+        gridcolor='LightGray',
+    )
+    fig.update_yaxes(
+        title_text="Load Factor (%)", 
+        secondary_y=True,
+        showgrid=False,  # Remove linhas de grade do eixo y secundário
+        # range=[50, 100],  # Define range de 50% a 100%
+        ticksuffix="%",  # Adiciona símbolo % aos números do eixo
+    )
+
+    return fig
+
+
+def figura_trimestral(trimestral, coluna, anterior=None):
+    """Barras de uma métrica por empresa e trimestre"""
+    if anterior is None:
+        fig = barras_por_empresa(trimestral, 'quarter', coluna)
+    else:
+        trimestral = trimestral.assign(variacao=variacao(trimestral[coluna], anterior[coluna]))
+        fig = barras_por_empresa(trimestral, 'quarter', coluna, coluna_variacao='variacao')
+    fig.update_xaxes(
+        tickangle=-45,
+    )
+    return fig
+
+
+def figura_financeiro(financeiro, conta, empresas, comparacao=None):
+    """Barras do saldo de uma conta por empresa e período"""
+    df_financeiro = serie_conta(financeiro, conta, empresas).rename('valor_saldo').reset_index()
+    sinal = -1 if conta == "(-) Custos dos Serviços Prestados" else 1
+    df_financeiro['valor_saldo'] = sinal * df_financeiro['valor_saldo']
+    coluna_variacao = None
+    if comparacao is not None:
+        anterior = sinal * serie_comparacao(financeiro, conta, empresas, comparacao).to_numpy()
+        df_financeiro['variacao'] = variacao(df_financeiro['valor_saldo'], anterior)
+        coluna_variacao = 'variacao'
+
+    df_financeiro = df_financeiro.sort_values(by=['periodo'])
+    return barras_por_empresa(df_financeiro, 'periodo', 'valor_saldo', empresa='empresa', coluna_variacao=coluna_variacao)
+
+
+def figura_serie_rota(serie, metrica):
+    """Barras mensais de uma métrica de uma rota, por empresa"""
+    serie = serie.assign(mes=rotulos_mes(serie['dt_referencia']))
+    fig = barras_por_empresa(serie, 'mes', metrica)
+    fig.update_xaxes(
+        tickangle=-45,
+    )
+    return fig
+
+
+def figura_empresas_aeroporto(empresas, metrica):
+    """Barras de uma métrica por empresa nas rotas de um aeroporto"""
+    return barras_por_empresa(empresas, 'EMPRESA (SIGLA)', metrica)
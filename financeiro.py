@@ -0,0 +1,155 @@
+"""Demonstrativos financeiros pivotados para consulta direta.
+
+O CSV longo (uma linha por empresa, período, conta e tipo de saldo, com
+``file_name``, ``sheet_name`` e ``descricao_conta`` repetidos em cada linha)
+vira uma matriz de saldos: linhas (demonstrativo, conta, descricao_conta,
+tipo_saldo) e colunas (empresa, período). Os índices são MultiIndex, que guardam cada texto
+uma única vez (códigos inteiros + níveis), e dicionários levam de uma conta
+ou de um (empresa, período) direto à posição na matriz. Cada KPI é um recorte
+da matriz e a série de um gráfico é a leitura das linhas de uma conta.
+
+As comparações também são leituras da matriz: ano contra ano usa os saldos
+``*_ano_anterior`` já publicados nos demonstrativos, na mesma coluna (empresa,
+período); trimestre contra trimestre lê a coluna do período anterior.
+"""
+from collections import defaultdict
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+
+# A descrição faz parte da linha: uma conta renomeada entre planilhas (5 códigos
+# nos dados atuais) vira duas linhas, e cada descrição soma só os saldos
+# publicados com ela, como o filtro por descricao_conta sobre o CSV
+INDICE_LINHAS = ['demonstrativo', 'conta', 'descricao_conta', 'tipo_saldo']
+INDICE_COLUNAS = ['empresa', 'periodo']
+COLUNAS_CONTAS = ['demonstrativo', 'conta', 'descricao_conta', 'nivel_conta']
+
+SALDO_PADRAO = 'saldo_inicio_periodo'
+
+# Contas exibidas nos KPIs financeiros do dashboard
+CONTAS_KPI = [
+    '(=) Receita Operacional Líquida',
+    '(-) Custos dos Serviços Prestados',
+    '(=) Lucro Bruto',
+    '(=) Resultado Líquido do Período',
+]
+
+
+class Demonstrativos(NamedTuple):
+    saldos: pd.DataFrame  # linhas (demonstrativo, conta, descricao_conta, tipo_saldo) x colunas (empresa, periodo)
+    contas: pd.DataFrame  # descrições e nível de cada (demonstrativo, conta)
+    linhas: dict  # (descricao_conta, tipo_saldo) -> posições das linhas em saldos
+    colunas: dict  # (empresa, periodo) -> posição da coluna em saldos
+
+
+def indexar_demonstrativos(saldos, contas):
+    """Monta os dicionários de posição a partir da matriz de saldos; ``contas`` só acompanha"""
+    linhas = defaultdict(list)
+    chaves = zip(saldos.index.get_level_values('descricao_conta'), saldos.index.get_level_values('tipo_saldo'))
+    for posicao, chave in enumerate(chaves):
+        linhas[chave].append(posicao)
+    colunas = {chave: posicao for posicao, chave in enumerate(saldos.columns)}
+    return Demonstrativos(saldos, contas, dict(linhas), colunas)
+
+
+def build_demonstrativos(df):
+    """Pivota o CSV longo de demonstrativos na matriz de saldos"""
+    df = df.astype({coluna: str for coluna in INDICE_LINHAS + INDICE_COLUNAS})
+    saldos = df.pivot_table(
+        index=INDICE_LINHAS,
+        columns=INDICE_COLUNAS,
+        values='valor_saldo',
+        aggfunc='sum',
+    ).sort_index().sort_index(axis=1)
+    contas = df[COLUNAS_CONTAS].drop_duplicates().reset_index(drop=True)
+    return indexar_demonstrativos(saldos, contas)
+
+
+def periodos_disponiveis(demonstrativos):
+    """Períodos disponíveis, do mais recente para o mais antigo"""
+    return sorted(demonstrativos.saldos.columns.unique('periodo'), reverse=True)
+
+
+def empresas_disponiveis(demonstrativos):
+    """Empresas disponíveis, em ordem alfabética"""
+    return sorted(demonstrativos.saldos.columns.unique('empresa'))
+
+
+def saldos_periodo(demonstrativos, descricoes, empresas, periodo, tipo_saldo=SALDO_PADRAO):
+    """Soma dos saldos das empresas no período para cada conta, em um único recorte da matriz"""
+    linhas = [demonstrativos.linhas.get((descricao, tipo_saldo), []) for descricao in descricoes]
+    colunas = [demonstrativos.colunas[(empresa, periodo)] for empresa in empresas if (empresa, periodo) in demonstrativos.colunas]
+
+    bloco = demonstrativos.saldos.to_numpy()[np.ix_(np.concatenate(linhas).astype(int), colunas)]
+    por_linha = np.nansum(bloco, axis=1)
+    limites = np.cumsum([0] + [len(l) for l in linhas])
+    return pd.Series(
+        [por_linha[inicio:fim].sum() for inicio, fim in zip(limites[:-1], limites[1:])],
+        index=list(descricoes),
+        dtype='float64',
+    )
+
+
+def serie_conta(demonstrativos, descricao, empresas, tipo_saldo=SALDO_PADRAO):
+    """Saldo da conta por (empresa, período) para as empresas selecionadas, sem períodos vazios"""
+    linhas = demonstrativos.linhas.get((descricao, tipo_saldo), [])
+    valores = demonstrativos.saldos.to_numpy()[linhas]
+    serie = pd.Series(
+        np.where(np.isnan(valores).all(axis=0), np.nan, np.nansum(valores, axis=0)),
+        index=demonstrativos.saldos.columns,
+    )
+    serie = serie[serie.index.get_level_values('empresa').isin(list(empresas))]
+    return serie.dropna()
+
+
+def saldo_ano_anterior(tipo_saldo):
+    """Tipo de saldo com o valor do mesmo período no ano anterior"""
+    return f'{tipo_saldo}_ano_anterior'
+
+
+def periodo_anterior(periodo):
+    """Trimestre anterior a um período ``AAAATn``"""
+    ano, trimestre = int(periodo[:4]), int(periodo[-1])
+    return f'{ano - 1}T4' if trimestre == 1 else f'{ano}T{trimestre - 1}'
+
+
+def saldos_comparacao(demonstrativos, descricoes, empresas, periodo, comparacao, tipo_saldo=SALDO_PADRAO):
+    """``saldos_periodo`` no ano anterior (``yoy``) ou no trimestre anterior (``qoq``); NaN sem dados"""
+    if comparacao == 'yoy':
+        tipo_saldo = saldo_ano_anterior(tipo_saldo)
+    else:
+        periodo = periodo_anterior(periodo)
+    if not any((empresa, periodo) in demonstrativos.colunas for empresa in empresas):
+        return pd.Series(np.nan, index=list(descricoes), dtype='float64')
+    return saldos_periodo(demonstrativos, descricoes, empresas, periodo, tipo_saldo)
+
+
+def serie_comparacao(demonstrativos, descricao, empresas, comparacao, tipo_saldo=SALDO_PADRAO):
+    """Saldos de comparação alinhados a ``serie_conta``: mesmo índice (empresa, período)"""
+    atual = serie_conta(demonstrativos, descricao, empresas, tipo_saldo)
+    if comparacao == 'yoy':
+        anterior, chaves = serie_conta(demonstrativos, descricao, empresas, saldo_ano_anterior(tipo_saldo)), atual.index
+    else:
+        anterior = atual
+        chaves = pd.MultiIndex.from_arrays([
+            atual.index.get_level_values('empresa'),
+            atual.index.get_level_values('periodo').map(periodo_anterior),
+        ], names=INDICE_COLUNAS)
+    return pd.Series(anterior.reindex(chaves).to_numpy(), index=atual.index)
+
+
+def tabela_contas(demonstrativos, descricoes, empresas, periodos=None, tipo_saldo=SALDO_PADRAO):
+    """Saldos de várias contas em formato longo: uma linha por (conta, empresa, período)"""
+    partes = []
+    for descricao in descricoes:
+        serie = serie_conta(demonstrativos, descricao, empresas, tipo_saldo)
+        if periodos:
+            serie = serie[serie.index.get_level_values('periodo').isin(list(periodos))]
+        parte = serie.rename('valor_saldo').reset_index()
+        parte.insert(0, 'descricao_conta', descricao)
+        partes.append(parte)
+    if not partes:
+        return pd.DataFrame(columns=['descricao_conta', *INDICE_COLUNAS, 'valor_saldo'])
+    return pd.concat(partes, ignore_index=True)
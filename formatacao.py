@@ -0,0 +1,116 @@
+"""Formatação de números para os KPIs e para os rótulos dos gráficos.
+
+``format_number`` formata um valor isolado (KPIs). ``format_numbers`` e
+``format_percent`` formatam arrays inteiros com NumPy, sem um laço Python por
+ponto: a escala (K, M, B), o sinal e as casas decimais são escolhidos por
+operações vetoriais e os textos são montados com ``np.strings``.
+
+Os rótulos das barras são montados no navegador por templates do Plotly;
+``escala`` dá o divisor e o sufixo comuns a uma série.
+
+No modo de comparação, ``format_kpi`` e ``format_variacoes`` acrescentam a
+variação percentual em relação ao período anterior.
+"""
+import numpy as np
+import pandas as pd
+
+
+# Limite inferior, divisor e sufixo de cada faixa, da menor para a maior
+ESCALAS = [
+    (0, 1, ''),
+    (1e3, 1e3, 'K'),
+    (1e6, 1e6, 'M'),
+    (1e9, 1e9, 'B'),
+]
+
+
+def format_number(value):
+    """Formata números com abreviações K, M, B"""
+    if pd.isna(value) or value == 0:
+        return '0'
+
+    abs_value = abs(value)
+    sign = '-' if value < 0 else ''
+
+    if abs_value >= 1e9:
+        return f'{sign}{abs_value/1e9:.1f}B'
+    elif abs_value >= 1e6:
+        return f'{sign}{abs_value/1e6:.1f}M'
+    elif abs_value >= 1e3:
+        return f'{sign}{abs_value/1e3:.1f}K'
+    else:
+        return f'{sign}{abs_value:.0f}'
+
+
+def _decimais(valores, casas):
+    # Equivalente a f'{valor:.{casas}f}' para valores não negativos
+    valores = np.asarray(valores)
+    escala = 10 ** casas
+    produtos = valores * escala
+    inteiros = np.asarray(np.rint(produtos)).astype(np.int64)
+    # Perto de um empate (1.05, 1050 / 1e3) o produto arredondado pelo ponto
+    # flutuante pode cair para o lado errado e o rint desempata para o par; esses
+    # poucos valores são arredondados como o f-string, a partir do valor exato
+    empates = np.abs(produtos - np.floor(produtos) - 0.5) <= 1e-9 * np.maximum(produtos, 1)
+    for i in np.flatnonzero(empates):
+        inteiros.flat[i] = int(f'{valores.flat[i]:.{casas}f}'.replace('.', ''))
+    texto = (inteiros // escala).astype(str)
+    if casas:
+        fracao = np.strings.zfill((inteiros % escala).astype(str), casas)
+        texto = np.strings.add(np.strings.add(texto, '.'), fracao)
+    return texto
+
+
+def format_numbers(values):
+    """Versão vetorizada de ``format_number``: um array de textos para um array de valores"""
+    valores = np.asarray(values, dtype='float64')
+    vazios = np.isnan(valores) | (valores == 0)
+    absolutos = np.where(vazios, 0, np.abs(valores))
+
+    faixa = np.searchsorted([limite for limite, _, _ in ESCALAS[1:]], absolutos, side='right')
+    divisores = np.array([divisor for _, divisor, _ in ESCALAS])[faixa]
+    sufixos = np.array([sufixo for _, _, sufixo in ESCALAS])[faixa]
+
+    # Sem escala o valor é arredondado para inteiro; com escala, para décimos
+    numeros = np.where(faixa == 0, _decimais(absolutos, 0), _decimais(absolutos / divisores, 1))
+    texto = np.strings.add(np.where(valores < 0, '-', ''), numeros)
+    texto = np.strings.add(texto, sufixos)
+    return np.where(vazios, '0', texto)
+
+
+def escala(values):
+    """Divisor e sufixo (K, M, B) da faixa do maior valor absoluto, ignorando NaN"""
+    maior = np.fmax.reduce(np.abs(np.asarray(values, dtype='float64')), initial=0)
+    _, divisor, sufixo = ESCALAS[np.searchsorted([limite for limite, _, _ in ESCALAS[1:]], maior, side='right')]
+    return divisor, sufixo
+
+
+def format_percent(values, casas=2):
+    """Percentuais com ``casas`` decimais e o símbolo %, vazios para NaN"""
+    valores = np.asarray(values, dtype='float64')
+    vazios = np.isnan(valores)
+    texto = _decimais(np.where(vazios, 0, np.abs(valores)), casas)
+    texto = np.strings.add(np.strings.add(np.where(valores < 0, '-', ''), texto), '%')
+    return np.where(vazios, '', texto)
+
+
+def variacao(atual, anterior):
+    """Variação percentual de ``anterior`` para ``atual``; NaN sem base de comparação"""
+    atual = np.asarray(atual, dtype='float64')
+    anterior = np.asarray(anterior, dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(anterior != 0, (atual - anterior) / np.abs(anterior) * 100, np.nan)
+
+
+def format_variacoes(values, casas=1):
+    """Variações percentuais com sinal explícito, vazias para NaN"""
+    valores = np.asarray(values, dtype='float64')
+    texto = format_percent(valores, casas)
+    return np.where(valores > 0, np.strings.add('+', texto), texto)
+
+
+def format_kpi(value, anterior=np.nan):
+    """``format_number`` seguido da variação em relação a ``anterior``, quando houver"""
+    texto = format_number(value)
+    variacao_texto = str(format_variacoes(variacao(value, anterior)))
+    return f'{texto} ({variacao_texto})' if variacao_texto else texto
@@ -0,0 +1,208 @@
+"""Ingestão incremental das bases estatísticas da ANAC.
+
+Cada fonte (arquivo anual ou mensal, URL do gov.br ou caminho local) é lida
+em blocos e gravada no dataset Parquet particionado por ano/mês. Um manifesto
+guarda o checksum de cada fonte e de cada mês: fontes inalteradas são
+ignoradas e, dentro de uma fonte alterada, apenas os meses novos ou com
+conteúdo diferente são regravados.
+
+Uso: python ingestao.py FONTE [FONTE ...] [--destino DIRETORIO]
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import urllib.request
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from dados import COLUNAS_CATEGORICAS, COLUNAS_METRICAS, dataset_operacional_path, tipar_operacional
+from snapshot import montar_snapshot, publicar_snapshot
+
+
+URL_BASE_ANAC = "https://www.gov.br/anac/pt-br/assuntos/dados-e-estatisticas/dados-estatisticos/arquivos/base-de-dados-divididas-por-ano"
+
+MANIFESTO = '_manifest.json'
+# Diretórios iniciados por "_" são ignorados na leitura do dataset
+STAGING = '_staging'
+ARQUIVO_PARTICAO = 'part-0.parquet'
+
+COLUNAS_FONTE = ['ANO', 'MÊS'] + COLUNAS_CATEGORICAS + COLUNAS_METRICAS
+CHUNKSIZE = 200_000
+
+SCHEMA_STAGING = pa.schema(
+    [('dt_referencia', pa.timestamp('ns'))]
+    + [(coluna, pa.string()) for coluna in COLUNAS_CATEGORICAS]
+    + [(coluna, pa.float64()) for coluna in COLUNAS_METRICAS]
+)
+
+
+def url_ano(ano):
+    """URL da base anual da ANAC"""
+    return f"{URL_BASE_ANAC}/{ano}"
+
+
+def load_manifesto(dataset_path=dataset_operacional_path):
+    path = os.path.join(dataset_path, MANIFESTO)
+    if not os.path.exists(path):
+        return {'fontes': {}, 'meses': {}}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _salvar_manifesto(manifesto, dataset_path):
+    path = os.path.join(dataset_path, MANIFESTO)
+    with tempfile.NamedTemporaryFile('w', dir=dataset_path, suffix='.tmp', delete=False, encoding='utf-8') as f:
+        json.dump(manifesto, f, indent=2, ensure_ascii=False, sort_keys=True)
+    os.replace(f.name, path)
+
+
+def _baixar(fonte, staging_path):
+    """Copia a fonte para o staging (se for URL) e calcula seu sha256 em blocos"""
+    sha = hashlib.sha256()
+    if fonte.startswith(('http://', 'https://')):
+        destino = os.path.join(staging_path, 'download-' + hashlib.md5(fonte.encode()).hexdigest())
+        with urllib.request.urlopen(fonte) as resposta, open(destino, 'wb') as f:
+            while bloco := resposta.read(1 << 20):
+                sha.update(bloco)
+                f.write(bloco)
+        return destino, sha.hexdigest()
+
+    with open(fonte, 'rb') as f:
+        while bloco := f.read(1 << 20):
+            sha.update(bloco)
+    return fonte, sha.hexdigest()
+
+
+def ler_fonte(path, chunksize=CHUNKSIZE):
+    """Lê uma base da ANAC em blocos, já com dt_referencia e tipos do dataset"""
+    leitor = pd.read_csv(
+        path,
+        sep=';',
+        encoding='latin1',
+        decimal=',',
+        usecols=COLUNAS_FONTE,
+        chunksize=chunksize,
+    )
+    for chunk in leitor:
+        chunk['dt_referencia'] = pd.to_datetime(pd.DataFrame({
+            'year': chunk['ANO'],
+            'month': chunk['MÊS'],
+            'day': 1,
+        }))
+        chunk = chunk.drop(columns=['ANO', 'MÊS'])
+        for coluna in COLUNAS_CATEGORICAS:
+            chunk[coluna] = chunk[coluna].astype('string')
+        yield tipar_operacional(chunk.reindex(columns=SCHEMA_STAGING.names), categorias=False)
+
+
+def _chave_mes(dt):
+    return f"{dt.year:04d}-{dt.month:02d}"
+
+
+def _particao(dataset_path, chave):
+    ano, mes = chave.split('-')
+    return os.path.join(dataset_path, f"ano={int(ano)}", f"mes={int(mes)}")
+
+
+def _publicar_mes(staging_file, dataset_path, chave):
+    """Grava o mês tipado no dataset, substituindo a partição anterior"""
+    df = tipar_operacional(pd.read_parquet(staging_file))
+    particao = _particao(dataset_path, chave)
+    os.makedirs(particao, exist_ok=True)
+    tmp_file = staging_file + '.final'
+    df.to_parquet(tmp_file, index=False)
+    os.replace(tmp_file, os.path.join(particao, ARQUIVO_PARTICAO))
+    for nome in os.listdir(particao):
+        if nome != ARQUIVO_PARTICAO:
+            os.remove(os.path.join(particao, nome))
+
+
+def ingerir_fonte(fonte, dataset_path=dataset_operacional_path, chunksize=CHUNKSIZE, forcar=False):
+    """Processa uma fonte e grava apenas os meses novos ou alterados.
+
+    Retorna um dicionário com os meses gravados e os meses inalterados.
+    """
+    os.makedirs(dataset_path, exist_ok=True)
+    manifesto = load_manifesto(dataset_path)
+    staging_path = tempfile.mkdtemp(prefix=STAGING + '-', dir=dataset_path)
+    resultado = {'fonte': fonte, 'gravados': [], 'inalterados': []}
+    try:
+        path, sha = _baixar(fonte, staging_path)
+        anterior = manifesto['fontes'].get(fonte)
+        if anterior and anterior['sha256'] == sha and not forcar:
+            resultado['inalterados'] = anterior['meses']
+            return resultado
+
+        # Cada mês é acumulado em um arquivo de staging próprio, então a
+        # memória fica limitada ao tamanho do bloco
+        writers = {}
+        hashes = {}
+        linhas = {}
+        try:
+            for chunk in ler_fonte(path, chunksize):
+                for dt, grupo in chunk.groupby('dt_referencia', sort=False):
+                    chave = _chave_mes(dt)
+                    if chave not in writers:
+                        writers[chave] = pq.ParquetWriter(os.path.join(staging_path, f"{chave}.parquet"), SCHEMA_STAGING)
+                        hashes[chave] = hashlib.sha256()
+                        linhas[chave] = 0
+                    writers[chave].write_table(pa.Table.from_pandas(grupo, schema=SCHEMA_STAGING, preserve_index=False))
+                    hashes[chave].update(pd.util.hash_pandas_object(grupo, index=False).values.tobytes())
+                    linhas[chave] += len(grupo)
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+        for chave in sorted(writers):
+            checksum = hashes[chave].hexdigest()
+            atual = manifesto['meses'].get(chave)
+            if atual and atual['checksum'] == checksum and os.path.isdir(_particao(dataset_path, chave)) and not forcar:
+                resultado['inalterados'].append(chave)
+                continue
+            _publicar_mes(os.path.join(staging_path, f"{chave}.parquet"), dataset_path, chave)
+            manifesto['meses'][chave] = {'fonte': fonte, 'checksum': checksum, 'linhas': linhas[chave]}
+            resultado['gravados'].append(chave)
+
+        manifesto['fontes'][fonte] = {
+            'sha256': sha,
+            'meses': sorted(writers),
+            'processado_em': datetime.now().isoformat(timespec='seconds'),
+        }
+        _salvar_manifesto(manifesto, dataset_path)
+        return resultado
+    finally:
+        shutil.rmtree(staging_path, ignore_errors=True)
+
+
+def ingerir(fontes, dataset_path=dataset_operacional_path, chunksize=CHUNKSIZE, forcar=False):
+    """Processa as fontes em sequência, na ordem recebida"""
+    return [ingerir_fonte(fonte, dataset_path, chunksize, forcar) for fonte in fontes]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('fontes', nargs='*', help="URLs ou caminhos locais das bases da ANAC")
+    parser.add_argument('--anos', nargs='*', type=int, default=[], help="anos da base anual do gov.br")
+    parser.add_argument('--destino', default=dataset_operacional_path)
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE)
+    parser.add_argument('--forcar', action='store_true', help="reprocessa mesmo fontes inalteradas")
+    parser.add_argument('--sem-snapshot', action='store_true', help="não publica um novo snapshot para o app")
+    args = parser.parse_args()
+
+    fontes = [url_ano(ano) for ano in args.anos] + args.fontes
+    if not fontes:
+        parser.error("informe ao menos uma fonte ou --anos")
+    resultados = ingerir(fontes, args.destino, args.chunksize, args.forcar)
+    for resultado in resultados:
+        print(
+            f"{resultado['fonte']}: {len(resultado['gravados'])} meses gravados, "
+            f"{len(resultado['inalterados'])} inalterados"
+        )
+    if any(resultado['gravados'] for resultado in resultados) and not args.sem_snapshot:
+        print(f"snapshot {publicar_snapshot(montar_snapshot(args.destino))} publicado")
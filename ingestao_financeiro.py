@@ -0,0 +1,331 @@
+"""Ingestão das planilhas de demonstrativos (DFP/ITR) das empresas aéreas.
+
+Cada pasta de trabalho (``demonstracoes_t1_25.xlsx``, ``compilado_t4_24.xlsx``)
+tem uma aba por empresa e trimestre, nomeada ``EMPRESA_T<trimestre>_<ano>``.
+Dentro da aba, uma linha de cabeçalho identifica as colunas de conta,
+descrição e saldos (início/fim do período e do mesmo período do ano
+anterior); o demonstrativo (BP, DRE, DFC) vem de uma coluna própria ou das
+linhas de título que abrem cada seção.
+
+As abas são lidas em paralelo, uma tarefa por aba em um pool de processos, e
+cada uma tem a hierarquia de contas validada antes de qualquer gravação. O
+resultado é um Parquet tipado por pasta de trabalho em ``data/financeiro``;
+um manifesto guarda o sha256 de cada arquivo e só as pastas alteradas são
+reprocessadas.
+
+Uso: python ingestao_financeiro.py PLANILHA|DIRETORIO [...] [--destino DIRETORIO]
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import tempfile
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import openpyxl
+import pandas as pd
+
+from dados import COLUNAS_FINANCEIRO, dataset_financeiro_path, tipar_financeiro
+from snapshot import montar_snapshot, publicar_snapshot
+
+
+MANIFESTO = '_manifest.json'
+
+TIPOS_SALDO = [
+    'saldo_inicio_periodo',
+    'saldo_fim_periodo',
+    'saldo_inicio_periodo_ano_anterior',
+    'saldo_fim_periodo_ano_anterior',
+]
+
+# Títulos de seção (normalizados) que abrem cada demonstrativo na aba
+TITULOS_DEMONSTRATIVOS = {
+    'bp': 'BP',
+    'balanco patrimonial': 'BP',
+    'dre': 'DRE',
+    'demonstracao do resultado': 'DRE',
+    'demonstracao do resultado do exercicio': 'DRE',
+    'dfc': 'DFC',
+    'demonstracao dos fluxos de caixa': 'DFC',
+    'demonstracao do fluxo de caixa': 'DFC',
+}
+
+RE_ABA = re.compile(r'^(?P<empresa>[A-Z0-9]+)_T(?P<trimestre>[1-4])_(?P<ano>\d{4}|\d{2})$')
+# Códigos numéricos hierárquicos ("1", "1.1", "1.1.4.98"); os demais (FCO, A...) são de nível 1
+RE_CONTA_HIERARQUICA = re.compile(r'^\d+(\.\d+)*$')
+
+MAX_ERROS_ABA = 10
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode()
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', texto.lower()).split())
+
+
+def _coluna_cabecalho(texto):
+    """Nome padronizado de uma coluna do cabeçalho, ou None se não for usada"""
+    texto = _normalizar(texto)
+    if texto in ('conta', 'codigo', 'codigo da conta', 'cod conta'):
+        return 'conta'
+    if texto.startswith('descricao'):
+        return 'descricao_conta'
+    if texto in ('nivel', 'nivel conta', 'nivel da conta'):
+        return 'nivel_conta'
+    if texto == 'demonstrativo':
+        return 'demonstrativo'
+    if 'saldo' in texto:
+        fim = 'fim' in texto or 'final' in texto
+        anterior = 'anterior' in texto
+        return f"saldo_{'fim' if fim else 'inicio'}_periodo{'_ano_anterior' if anterior else ''}"
+    return None
+
+
+def _texto_conta(valor):
+    # Células numéricas ("1" lido como 1.0) voltam ao código textual
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def identificar_aba(sheet_name):
+    """Empresa, ano e trimestre a partir do nome da aba, ou None se não for uma aba de demonstrativos"""
+    match = RE_ABA.match(sheet_name.strip())
+    if match is None:
+        return None
+    ano = int(match['ano'])
+    if ano < 100:
+        ano += 2000
+    return {
+        'empresa': match['empresa'],
+        'periodo': f"{ano}T{match['trimestre']}",
+        'ano': ano,
+        'trimestre': f"T{match['trimestre']}",
+    }
+
+
+def ler_aba(path, sheet_name):
+    """Lê uma aba no formato longo (uma linha por conta e tipo de saldo), sem validar"""
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        linhas = workbook[sheet_name].iter_rows(values_only=True)
+        cabecalho = None
+        for linha in linhas:
+            colunas = [_coluna_cabecalho(celula) if celula is not None else None for celula in linha]
+            if 'conta' in colunas and any(coluna in TIPOS_SALDO for coluna in colunas):
+                cabecalho = colunas
+                break
+        if cabecalho is None:
+            raise ValueError("cabeçalho com conta e saldos não encontrado")
+
+        posicoes = {coluna: i for i, coluna in enumerate(cabecalho) if coluna is not None}
+        registros = []
+        demonstrativo = None
+        for linha in linhas:
+            valores = {coluna: linha[i] if i < len(linha) else None for coluna, i in posicoes.items()}
+            conta = valores['conta']
+            if all(valores.get(tipo_saldo) is None for tipo_saldo in TIPOS_SALDO):
+                # Linha de título de seção ("Balanço Patrimonial", "DRE"...) ou em branco
+                titulo = next((celula for celula in linha if celula is not None), None)
+                if titulo is not None:
+                    demonstrativo = TITULOS_DEMONSTRATIVOS.get(_normalizar(titulo), demonstrativo)
+                if titulo is None or _normalizar(titulo) in TITULOS_DEMONSTRATIVOS:
+                    continue
+            if conta is None or str(conta).strip() == '':
+                continue
+            if valores.get('demonstrativo') is not None:
+                demonstrativo = TITULOS_DEMONSTRATIVOS.get(_normalizar(valores['demonstrativo']), valores['demonstrativo'])
+            registro = {
+                'demonstrativo': demonstrativo,
+                'conta': _texto_conta(conta),
+                'descricao_conta': str(valores.get('descricao_conta') or '').strip(),
+                'nivel_conta': valores.get('nivel_conta'),
+            }
+            for tipo_saldo in TIPOS_SALDO:
+                if tipo_saldo in valores:
+                    registros.append({**registro, 'tipo_saldo': tipo_saldo, 'valor_saldo': valores[tipo_saldo]})
+    finally:
+        workbook.close()
+    return pd.DataFrame(registros, columns=['demonstrativo', 'conta', 'descricao_conta', 'nivel_conta', 'tipo_saldo', 'valor_saldo'])
+
+
+def validar_aba(df):
+    """Problemas de hierarquia e de conteúdo de uma aba; lista vazia se estiver consistente"""
+    erros = []
+    sem_demonstrativo = df['demonstrativo'].isna()
+    if sem_demonstrativo.any():
+        erros.append(f"{sem_demonstrativo.sum()} linhas fora de um demonstrativo (BP, DRE, DFC)")
+
+    valores = pd.to_numeric(df['valor_saldo'], errors='coerce')
+    invalidos = valores.isna() & df['valor_saldo'].notna()
+    for conta, valor in df.loc[invalidos, ['conta', 'valor_saldo']].head(MAX_ERROS_ABA).itertuples(index=False):
+        erros.append(f"conta {conta}: saldo não numérico {valor!r}")
+
+    duplicadas = df[df.duplicated(['demonstrativo', 'conta', 'tipo_saldo'], keep='first')]
+    for demonstrativo, conta, tipo_saldo in duplicadas[['demonstrativo', 'conta', 'tipo_saldo']].head(MAX_ERROS_ABA).itertuples(index=False):
+        erros.append(f"{demonstrativo} {conta}: conta repetida em {tipo_saldo}")
+
+    contas = df.drop_duplicates(['demonstrativo', 'conta'])
+    existentes = set(zip(contas['demonstrativo'], contas['conta']))
+    for demonstrativo, conta, nivel in contas[['demonstrativo', 'conta', 'nivel_conta']].itertuples(index=False):
+        hierarquica = RE_CONTA_HIERARQUICA.match(conta) is not None
+        nivel_esperado = conta.count('.') + 1 if hierarquica else 1
+        if nivel is not None and not pd.isna(nivel) and int(nivel) != nivel_esperado:
+            erros.append(f"{demonstrativo} {conta}: nível {int(nivel)}, esperado {nivel_esperado}")
+        if hierarquica and '.' in conta and (demonstrativo, conta.rsplit('.', 1)[0]) not in existentes:
+            erros.append(f"{demonstrativo} {conta}: conta mãe {conta.rsplit('.', 1)[0]} ausente")
+        if len(erros) >= MAX_ERROS_ABA:
+            break
+    return erros[:MAX_ERROS_ABA]
+
+
+def processar_aba(path, sheet_name):
+    """Lê e valida uma aba (executado nos processos do pool)"""
+    aba = identificar_aba(sheet_name)
+    df = ler_aba(path, sheet_name)
+    erros = validar_aba(df)
+    if erros:
+        raise ValueError(f"{os.path.basename(path)}/{sheet_name}: " + '; '.join(erros))
+
+    # O nível é sempre derivado do código, já conferido contra a coluna da planilha
+    df['nivel_conta'] = [
+        conta.count('.') + 1 if RE_CONTA_HIERARQUICA.match(conta) else 1
+        for conta in df['conta']
+    ]
+    df['valor_saldo'] = pd.to_numeric(df['valor_saldo'])
+    df = df.assign(file_name=os.path.basename(path), sheet_name=sheet_name, **aba)
+    return df[COLUNAS_FINANCEIRO]
+
+
+def listar_abas(path):
+    """Abas de demonstrativos da pasta de trabalho, na ordem do arquivo"""
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        return [nome for nome in workbook.sheetnames if identificar_aba(nome) is not None]
+    finally:
+        workbook.close()
+
+
+def expandir_fontes(fontes):
+    """Caminhos das pastas de trabalho, expandindo diretórios"""
+    caminhos = []
+    for fonte in fontes:
+        if os.path.isdir(fonte):
+            caminhos += sorted(
+                path for path in glob.glob(os.path.join(fonte, '*.xlsx'))
+                if not os.path.basename(path).startswith('~$')
+            )
+        else:
+            caminhos.append(fonte)
+    return caminhos
+
+
+def load_manifesto(dataset_path=dataset_financeiro_path):
+    path = os.path.join(dataset_path, MANIFESTO)
+    if not os.path.exists(path):
+        return {'planilhas': {}}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _salvar_manifesto(manifesto, dataset_path):
+    path = os.path.join(dataset_path, MANIFESTO)
+    with tempfile.NamedTemporaryFile('w', dir=dataset_path, suffix='.tmp', delete=False, encoding='utf-8') as f:
+        json.dump(manifesto, f, indent=2, ensure_ascii=False, sort_keys=True)
+    os.replace(f.name, path)
+
+
+def _sha256(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while bloco := f.read(1 << 20):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def _arquivo_saida(dataset_path, file_name):
+    return os.path.join(dataset_path, os.path.splitext(file_name)[0] + '.parquet')
+
+
+def _publicar_planilha(df, dataset_path, file_name):
+    # Arquivos iniciados por "_" são ignorados na leitura do diretório
+    arquivo = _arquivo_saida(dataset_path, file_name)
+    tmp_file = os.path.join(dataset_path, '_' + os.path.basename(arquivo) + '.tmp')
+    tipar_financeiro(df).to_parquet(tmp_file, index=False)
+    os.replace(tmp_file, arquivo)
+
+
+def ingerir(fontes, dataset_path=dataset_financeiro_path, processos=None, forcar=False):
+    """Processa as pastas de trabalho novas ou alteradas, uma tarefa por aba.
+
+    Retorna uma lista com o resultado de cada pasta: ``gravada``,
+    ``inalterada`` ou ``erro`` (com as mensagens de validação). Pastas com
+    erro não são gravadas e mantêm a versão anterior.
+    """
+    os.makedirs(dataset_path, exist_ok=True)
+    manifesto = load_manifesto(dataset_path)
+    resultados = []
+    pendentes = {}
+    for path in expandir_fontes(fontes):
+        file_name = os.path.basename(path)
+        sha = _sha256(path)
+        anterior = manifesto['planilhas'].get(file_name)
+        if anterior and anterior['sha256'] == sha and os.path.exists(_arquivo_saida(dataset_path, file_name)) and not forcar:
+            resultados.append({'planilha': file_name, 'status': 'inalterada', 'linhas': anterior['linhas'], 'erros': []})
+            continue
+        pendentes[path] = sha
+
+    if pendentes:
+        with ProcessPoolExecutor(max_workers=processos) as pool:
+            tarefas = {
+                path: [(sheet_name, pool.submit(processar_aba, path, sheet_name)) for sheet_name in listar_abas(path)]
+                for path in pendentes
+            }
+            for path, abas in tarefas.items():
+                file_name = os.path.basename(path)
+                partes, erros = [], []
+                for sheet_name, tarefa in abas:
+                    try:
+                        partes.append(tarefa.result())
+                    except Exception as e:
+                        erros.append(str(e))
+                if not abas:
+                    erros.append(f"{file_name}: nenhuma aba no formato EMPRESA_T<trimestre>_<ano>")
+                if erros:
+                    resultados.append({'planilha': file_name, 'status': 'erro', 'linhas': 0, 'erros': erros})
+                    continue
+
+                df = pd.concat(partes, ignore_index=True)
+                _publicar_planilha(df, dataset_path, file_name)
+                manifesto['planilhas'][file_name] = {
+                    'sha256': pendentes[path],
+                    'abas': [sheet_name for sheet_name, _ in abas],
+                    'linhas': len(df),
+                    'processado_em': datetime.now().isoformat(timespec='seconds'),
+                }
+                resultados.append({'planilha': file_name, 'status': 'gravada', 'linhas': len(df), 'erros': []})
+        _salvar_manifesto(manifesto, dataset_path)
+    return resultados
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('fontes', nargs='+', help="pastas de trabalho .xlsx ou diretórios com elas")
+    parser.add_argument('--destino', default=dataset_financeiro_path)
+    parser.add_argument('--processos', type=int, default=None, help="tamanho do pool (padrão: número de CPUs)")
+    parser.add_argument('--forcar', action='store_true', help="reprocessa mesmo planilhas inalteradas")
+    parser.add_argument('--sem-snapshot', action='store_true', help="não publica um novo snapshot para o app")
+    args = parser.parse_args()
+
+    resultados = ingerir(args.fontes, args.destino, args.processos, args.forcar)
+    for resultado in resultados:
+        print(f"{resultado['planilha']}: {resultado['status']} ({resultado['linhas']} linhas)")
+        for erro in resultado['erros']:
+            print(f"  {erro}")
+    if any(resultado['status'] == 'gravada' for resultado in resultados) and not args.sem_snapshot:
+        print(f"snapshot {publicar_snapshot(montar_snapshot())} publicado")
+    if any(resultado['status'] == 'erro' for resultado in resultados):
+        raise SystemExit(1)
@@ -0,0 +1,282 @@
+"""Métricas de execução das saídas do dashboard.
+
+Cada ``reactive.calc`` e cada render do app (e as etapas que rodam no pool de
+threads: agregação e montagem das figuras) registram tempo de execução, linhas
+(dos frames recebidos ou retornados) e bytes do payload; o cache de figuras e
+as sessões abertas completam o quadro. Os valores são expostos em formato texto
+do Prometheus, em ``ROTA_METRICAS``, e/ou em linhas JSON periódicas no log.
+
+A coleta é ligada pela variável de ambiente ``ANAC_METRICAS`` (``prometheus``,
+``log`` ou ``prometheus,log``). Desligada, ``instrumentar`` retorna a própria
+função e ``medir`` um objeto nulo compartilhado, sem custo por chamada.
+
+Cada worker do uvicorn tem suas próprias métricas; o rótulo ``worker`` (pid)
+separa as séries de workers diferentes.
+
+Os tempos de inicialização (import do app e primeira resposta HTTP) são
+sempre registrados e escritos no log do uvicorn no boot, com ou sem
+``ANAC_METRICAS``.
+"""
+import bisect
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+import pandas as pd
+from shiny.types import SilentCancelOutputException, SilentException
+
+
+ROTA_METRICAS = '/metrics'
+INTERVALO_LOG = float(os.environ.get('ANAC_METRICAS_INTERVALO', 60))
+
+# Limites (em segundos) dos buckets do histograma de tempos
+BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+# Saídas que ainda aguardam dados ou foram canceladas não são erros
+SILENCIOSAS = (SilentException, SilentCancelOutputException)
+
+logger = logging.getLogger(__name__)
+# Logger já configurado pelo uvicorn, para as mensagens de boot saírem junto com as dele
+logger_boot = logging.getLogger('uvicorn.error')
+
+
+class _MedicaoNula:
+    """Medição usada com as métricas desligadas: aceita e descarta tudo"""
+    linhas = None
+    bytes = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, nome, valor):
+        pass
+
+
+MEDICAO_NULA = _MedicaoNula()
+
+
+def contar_linhas(valor):
+    """Linhas de um frame, ou a soma das linhas dos frames de uma tupla (ex.: ``Agregados``)"""
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return len(valor)
+    if isinstance(valor, tuple):
+        linhas = [len(item) for item in valor if isinstance(item, pd.DataFrame)]
+        return sum(linhas) if linhas else None
+    return None
+
+
+class Medicao:
+    """Tempo de um bloco; ``linhas`` e ``bytes`` podem ser preenchidos dentro dele"""
+
+    def __init__(self, metricas, nome):
+        self.metricas = metricas
+        self.nome = nome
+        self.linhas = None
+        self.bytes = None
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, exc, tb):
+        if tipo is None:
+            self.metricas.registrar(self.nome, time.perf_counter() - self.inicio, self.linhas, self.bytes)
+        elif not issubclass(tipo, SILENCIOSAS):
+            self.metricas.registrar_erro(self.nome)
+        return False
+
+
+class Metricas:
+    """Contadores por saída, sessões e cache de figuras de um worker"""
+
+    def __init__(self, modos=()):
+        self.modos = set(modos)
+        self.ativo = bool(self.modos)
+        self.cache = None
+        self.sessoes_ativas = 0
+        self.sessoes_total = 0
+        self.inicializacao = {}
+        self._buckets = defaultdict(lambda: [0] * (len(BUCKETS) + 1))
+        self._soma = defaultdict(float)
+        self._contagem = defaultdict(int)
+        self._erros = defaultdict(int)
+        self._linhas = {}
+        self._bytes = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def medir(self, nome):
+        """Context manager que registra o tempo do bloco em ``nome``"""
+        if not self.ativo:
+            return MEDICAO_NULA
+        return Medicao(self, nome)
+
+    def instrumentar(self, fn=None, *, nome=None):
+        """Decorador que mede cada chamada de ``fn``; textos têm o tamanho registrado em bytes.
+
+        As linhas são as dos frames recebidos como argumento; calcs e renders sem
+        argumentos registram as linhas do frame (ou dos frames) que retornam.
+        """
+        if fn is None:
+            return functools.partial(self.instrumentar, nome=nome)
+        if not self.ativo:
+            return fn
+        nome = nome or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with self.medir(nome) as medicao:
+                resultado = fn(*args, **kwargs)
+                linhas = [len(arg) for arg in args if isinstance(arg, pd.DataFrame)]
+                medicao.linhas = sum(linhas) if linhas else contar_linhas(resultado)
+                if isinstance(resultado, str):
+                    medicao.bytes = len(resultado.encode())
+            return resultado
+        return wrapper
+
+    def registrar(self, nome, segundos, linhas=None, tamanho=None):
+        with self._lock:
+            self._buckets[nome][bisect.bisect_left(BUCKETS, segundos)] += 1
+            self._soma[nome] += segundos
+            self._contagem[nome] += 1
+            if linhas is not None:
+                self._linhas[nome] = linhas
+            if tamanho is not None:
+                self._bytes[nome] = tamanho
+
+    def registrar_erro(self, nome):
+        with self._lock:
+            self._erros[nome] += 1
+
+    def sessao_iniciada(self):
+        with self._lock:
+            self.sessoes_ativas += 1
+            self.sessoes_total += 1
+
+    def sessao_encerrada(self):
+        with self._lock:
+            self.sessoes_ativas -= 1
+
+    def registrar_inicializacao(self, etapa, segundos):
+        """Registra e escreve no log o tempo de uma etapa da inicialização"""
+        self.inicializacao[etapa] = segundos
+        logger_boot.info("inicialização: %s em %.3f s", etapa, segundos)
+
+    def observar_cache(self, cache):
+        """Inclui as estatísticas de um ``CacheFiguras`` nas métricas"""
+        self.cache = cache
+
+    def resumo(self):
+        """Estado atual das métricas como dicionário (usado nas linhas de log)"""
+        with self._lock:
+            saidas = {
+                nome: {
+                    'chamadas': self._contagem[nome],
+                    'segundos': round(self._soma[nome], 6),
+                    'erros': self._erros.get(nome, 0),
+                    'linhas': self._linhas.get(nome),
+                    'bytes': self._bytes.get(nome),
+                }
+                for nome in sorted(set(self._contagem) | set(self._erros))
+            }
+            resumo = {
+                'worker': os.getpid(),
+                'sessoes_ativas': self.sessoes_ativas,
+                'sessoes_total': self.sessoes_total,
+                'inicializacao': dict(self.inicializacao),
+                'saidas': saidas,
+            }
+        if self.cache is not None:
+            resumo['cache_figuras'] = self.cache.estatisticas()
+        return resumo
+
+    def prometheus(self):
+        """Métricas no formato texto de exposição do Prometheus"""
+        worker = f'worker="{os.getpid()}"'
+        linhas = [
+            '# TYPE anac_sessoes_ativas gauge',
+            f'anac_sessoes_ativas{{{worker}}} {self.sessoes_ativas}',
+            '# TYPE anac_sessoes_total counter',
+            f'anac_sessoes_total{{{worker}}} {self.sessoes_total}',
+            '# TYPE anac_inicializacao_segundos gauge',
+        ]
+        linhas += [f'anac_inicializacao_segundos{{{worker},etapa="{etapa}"}} {segundos}' for etapa, segundos in self.inicializacao.items()]
+        with self._lock:
+            linhas.append('# TYPE anac_saida_segundos histogram')
+            for nome in sorted(self._contagem):
+                rotulos = f'{worker},saida="{nome}"'
+                acumulado = 0
+                for limite, quantidade in zip(BUCKETS + ['+Inf'], self._buckets[nome]):
+                    acumulado += quantidade
+                    linhas.append(f'anac_saida_segundos_bucket{{{rotulos},le="{limite}"}} {acumulado}')
+                linhas.append(f'anac_saida_segundos_sum{{{rotulos}}} {self._soma[nome]}')
+                linhas.append(f'anac_saida_segundos_count{{{rotulos}}} {self._contagem[nome]}')
+            for metrica, tipo, valores in [
+                ('anac_saida_erros_total', 'counter', self._erros),
+                ('anac_saida_linhas', 'gauge', self._linhas),
+                ('anac_saida_bytes', 'gauge', self._bytes),
+            ]:
+                linhas.append(f'# TYPE {metrica} {tipo}')
+                linhas += [f'{metrica}{{{worker},saida="{nome}"}} {valor}' for nome, valor in sorted(valores.items())]
+
+        if self.cache is not None:
+            estatisticas = self.cache.estatisticas()
+            for chave, tipo in [('hits', 'counter'), ('misses', 'counter'), ('evictions', 'counter'), ('itens', 'gauge'), ('bytes', 'gauge')]:
+                metrica = f'anac_cache_figuras_{chave}' + ('_total' if tipo == 'counter' else '')
+                linhas.append(f'# TYPE {metrica} {tipo}')
+                linhas.append(f'{metrica}{{{worker}}} {estatisticas[chave]}')
+        return '\n'.join(linhas) + '\n'
+
+    def iniciar_log(self, intervalo=INTERVALO_LOG):
+        """Inicia a thread que escreve o resumo no log a cada ``intervalo`` segundos"""
+        with self._lock:
+            if 'log' not in self.modos or self._thread is not None:
+                return
+            if not logger.handlers:
+                handler = logging.StreamHandler()
+                handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(message)s'))
+                logger.addHandler(handler)
+                logger.setLevel(logging.INFO)
+            self._thread = threading.Thread(target=self._escrever_log, args=(intervalo,), name='metricas-log', daemon=True)
+            self._thread.start()
+
+    def _escrever_log(self, intervalo):
+        while True:
+            time.sleep(intervalo)
+            logger.info(json.dumps(self.resumo(), ensure_ascii=False))
+
+
+class PrimeiraResposta:
+    """Middleware ASGI que registra o tempo entre ``inicio`` e a primeira resposta HTTP"""
+
+    def __init__(self, app, inicio):
+        self.app = app
+        self.inicio = inicio
+        self.pendente = True
+
+    async def __call__(self, scope, receive, send):
+        if not self.pendente or scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        async def enviar(mensagem):
+            if self.pendente and mensagem['type'] == 'http.response.start':
+                self.pendente = False
+                metricas.registrar_inicializacao('primeira_resposta', time.perf_counter() - self.inicio)
+            await send(mensagem)
+        return await self.app(scope, receive, enviar)
+
+
+def modos_ambiente():
+    """Modos de exposição pedidos em ``ANAC_METRICAS``"""
+    return [modo.strip() for modo in os.environ.get('ANAC_METRICAS', '').split(',') if modo.strip()]
+
+
+# Instância do worker, usada pelo app e pelo cache de figuras
+metricas = Metricas(modos_ambiente())
@@ -0,0 +1,166 @@
+"""Motores de agregação das linhas de rota.
+
+O dashboard, a API e o explorador de rotas só consultam agregados (cubo
+mensal, índice de destinos e índice de rotas); as linhas de rota são lidas
+apenas para montá-los, em ``snapshot.montar_snapshot``. O motor define como
+essa leitura é feita:
+
+- ``pandas`` (padrão): carrega a tabela inteira e agrupa em memória;
+- ``arrow``: lê o dataset Parquet um arquivo (um mês) por vez, com os filtros
+  aplicados na leitura, e agrupa cada parte no motor de execução do Arrow;
+  só os agregados ficam em memória, e o pico é o de um mês de linhas;
+- ``duckdb``: uma consulta SQL sobre os arquivos Parquet, com filtros e
+  agrupamento executados pelo DuckDB, que usa o disco quando passa de
+  ``ANAC_DUCKDB_MEMORIA``. Requer o extra ``duckdb`` (``uv sync --extra
+  duckdb``); o pacote é importado só aqui.
+
+``arrow`` e ``duckdb`` entregam as linhas já somadas no grão (mês, empresa,
+nacionalidade, origem, destino), que basta para os três agregados; a partir
+daí todos os motores passam pelas mesmas funções ``build_*``.
+
+O motor padrão vem de ``ANAC_MOTOR``; ``snapshot.py --motor`` escolhe outro
+na publicação.
+
+Os motores valem só para essa montagem. As consultas do dashboard e da API
+continuam sobre o cubo e os índices em memória, sem pushdown por consulta: o
+que limita a memória é o tamanho dos agregados (meses x empresas x rotas), não
+o número de linhas de rota.
+"""
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from cubo import build_cubo, build_indice_destinos
+from dados import COLUNAS_CATEGORICAS, COLUNAS_METRICAS, DATA_DIR, dataset_operacional_path, load_operacional, ordenar_categorias
+from rotas import build_indice_rotas
+
+
+MOTOR_PADRAO = os.environ.get('ANAC_MOTOR', 'pandas')
+LIMITE_MEMORIA_DUCKDB = os.environ.get('ANAC_DUCKDB_MEMORIA', '2GB')
+DIRETORIO_TEMPORARIO_DUCKDB = os.path.join(DATA_DIR, '.duckdb')
+
+# Grão das linhas entregues pelos motores que agregam fora do pandas
+GRAO_REDUZIDO = ['dt_referencia'] + COLUNAS_CATEGORICAS
+
+
+def _filtrar_pandas(df, inicio, fim, empresas, nacionalidades):
+    mask = pd.Series(True, index=df.index)
+    if inicio is not None:
+        mask &= df['dt_referencia'] >= pd.Timestamp(inicio)
+    if fim is not None:
+        mask &= df['dt_referencia'] <= pd.Timestamp(fim)
+    if empresas:
+        mask &= df['EMPRESA (SIGLA)'].isin(empresas)
+    if nacionalidades:
+        mask &= df['EMPRESA (NACIONALIDADE)'].isin(nacionalidades)
+    return df if mask.all() else df.loc[mask]
+
+
+def linhas_pandas(dataset_path, inicio=None, fim=None, empresas=None, nacionalidades=None):
+    """Linhas de rota carregadas inteiras em memória"""
+    return _filtrar_pandas(load_operacional(dataset_path=dataset_path), inicio, fim, empresas, nacionalidades)
+
+
+def _para_pandas(tabela):
+    # Textos viram categorias ordenadas, como no carregamento pelo pandas
+    for coluna in COLUNAS_CATEGORICAS:
+        posicao = tabela.schema.get_field_index(coluna)
+        tabela = tabela.set_column(posicao, coluna, pc.dictionary_encode(pc.cast(tabela[coluna], pa.string())))
+    df = tabela.to_pandas()
+    df['dt_referencia'] = df['dt_referencia'].astype('datetime64[ns]')
+    return ordenar_categorias(df)
+
+
+def linhas_arrow(dataset_path, inicio=None, fim=None, empresas=None, nacionalidades=None):
+    """Linhas somadas no grão reduzido, um arquivo do dataset por vez"""
+    dataset = ds.dataset(dataset_path, format='parquet', partitioning='hive')
+    # Partições ano/mês fora do período nem são abertas; o resto do filtro vai para a leitura
+    poda = ds.scalar(True)
+    filtro = ds.scalar(True)
+    if inicio is not None:
+        inicio = pd.Timestamp(inicio)
+        poda &= ds.field('ano') >= inicio.year
+        filtro &= ds.field('dt_referencia') >= pa.scalar(inicio, pa.timestamp('ns'))
+    if fim is not None:
+        fim = pd.Timestamp(fim)
+        poda &= ds.field('ano') <= fim.year
+        filtro &= ds.field('dt_referencia') <= pa.scalar(fim, pa.timestamp('ns'))
+    if empresas:
+        filtro &= ds.field('EMPRESA (SIGLA)').isin(list(empresas))
+    if nacionalidades:
+        filtro &= ds.field('EMPRESA (NACIONALIDADE)').isin(list(nacionalidades))
+
+    partes = []
+    for fragmento in dataset.get_fragments(filter=poda):
+        tabela = fragmento.to_table(columns=GRAO_REDUZIDO + COLUNAS_METRICAS, filter=filtro)
+        tabela = tabela.cast(pa.schema([
+            pa.field(campo.name, pa.string()) if pa.types.is_dictionary(campo.type) else campo
+            for campo in tabela.schema
+        ]))
+        agregada = tabela.group_by(GRAO_REDUZIDO).aggregate([(coluna, 'sum') for coluna in COLUNAS_METRICAS])
+        partes.append(agregada.rename_columns({f'{coluna}_sum': coluna for coluna in COLUNAS_METRICAS}))
+    if not partes:
+        raise ValueError(f"nenhum arquivo do dataset {dataset_path} no período pedido")
+    return _para_pandas(pa.concat_tables(partes))
+
+
+def linhas_duckdb(dataset_path, inicio=None, fim=None, empresas=None, nacionalidades=None):
+    """Linhas somadas no grão reduzido por uma consulta do DuckDB sobre os arquivos Parquet"""
+    try:
+        import duckdb
+    except ModuleNotFoundError as erro:
+        raise RuntimeError("o motor duckdb requer o extra duckdb (uv sync --extra duckdb)") from erro
+
+    condicoes, parametros = [], []
+    if inicio is not None:
+        inicio = pd.Timestamp(inicio)
+        condicoes += ['ano >= ?', 'dt_referencia >= ?']
+        parametros += [inicio.year, inicio.to_pydatetime()]
+    if fim is not None:
+        fim = pd.Timestamp(fim)
+        condicoes += ['ano <= ?', 'dt_referencia <= ?']
+        parametros += [fim.year, fim.to_pydatetime()]
+    if empresas:
+        condicoes.append('list_contains(?, "EMPRESA (SIGLA)")')
+        parametros.append(list(empresas))
+    if nacionalidades:
+        condicoes.append('list_contains(?, "EMPRESA (NACIONALIDADE)")')
+        parametros.append(list(nacionalidades))
+
+    arquivos = os.path.join(dataset_path, '**', '*.parquet').replace("'", "''")
+    chaves = ', '.join(f'"{coluna}"' for coluna in GRAO_REDUZIDO)
+    somas = ', '.join(f'sum("{coluna}") AS "{coluna}"' for coluna in COLUNAS_METRICAS)
+    onde = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+    consulta = f"""
+        SELECT {chaves}, {somas}
+        FROM read_parquet('{arquivos}', hive_partitioning = true)
+        {onde}
+        GROUP BY {chaves}
+    """
+    with duckdb.connect() as conexao:
+        conexao.execute(f"SET memory_limit = '{LIMITE_MEMORIA_DUCKDB}'")
+        conexao.execute(f"SET temp_directory = '{DIRETORIO_TEMPORARIO_DUCKDB}'")
+        tabela = conexao.execute(consulta, parametros).fetch_arrow_table()
+    return _para_pandas(tabela)
+
+
+MOTORES = {
+    'pandas': linhas_pandas,
+    'arrow': linhas_arrow,
+    'duckdb': linhas_duckdb,
+}
+
+
+def montar_agregados(dataset_path=dataset_operacional_path, motor=MOTOR_PADRAO, **filtros):
+    """Cubo, índice de destinos e índice de rotas a partir das linhas lidas pelo motor.
+
+    ``filtros`` (``inicio``, ``fim``, ``empresas``, ``nacionalidades``) restringem
+    as linhas usadas; nos motores ``arrow`` e ``duckdb`` são aplicados na leitura.
+    """
+    if motor not in MOTORES:
+        raise ValueError(f"motor desconhecido {motor!r}: use um de {', '.join(MOTORES)}")
+    df = MOTORES[motor](dataset_path, **filtros)
+    return build_cubo(df), build_indice_destinos(df), build_indice_rotas(df)
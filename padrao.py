@@ -0,0 +1,174 @@
+"""Visões padrão do dashboard, pré-renderizadas a cada publicação do snapshot.
+
+A maioria das visitas não mexe nos filtros: a aba operacional abre com
+BRASILEIRA (AZU, GLO e TAM) em todo o período e a financeira com o período
+mais recente e todas as empresas. ``snapshot.publicar_snapshot`` calcula uma
+vez os textos dos KPIs e as figuras dessas seleções e grava tudo em
+``padrao.json``, na pasta da versão; cada versão nova dos dados traz as suas.
+
+As saídas são agrupadas pelos filtros de que dependem (``GRUPOS``). No app,
+enquanto os filtros de um grupo forem os padrão da versão em uso, as saídas
+do grupo vêm de ``padrao.json``, sem agregação nem montagem de figuras; o
+cálculo ao vivo só começa quando o usuário muda uma entrada do grupo.
+
+``textos_operacionais`` e ``textos_financeiros`` formatam os KPIs aqui e no
+app, para as duas origens darem o mesmo texto.
+"""
+import base64
+import json
+import math
+import os
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from cubo import agregar_selecao, filtrar_selecao
+from figuras import figura_financeiro, figura_rpk_ask_load_factor, figura_trimestral
+from financeiro import CONTAS_KPI, empresas_disponiveis, periodos_disponiveis, saldos_periodo
+from formatacao import format_kpi
+
+
+ARQUIVO_PADRAO = 'padrao.json'
+
+EMPRESAS_PADRAO = ['AZU', 'GLO', 'TAM']
+
+# Filtros de que cada grupo de saídas depende, na ordem gravada
+GRUPOS = {
+    'operacional': ('inicio', 'fim', 'empresas', 'comparacao'),
+    'kpis_financeiros': ('periodo', 'empresas', 'comparacao'),
+    'financeiro': ('conta', 'empresas', 'comparacao'),
+}
+
+# Conta e sinal exibido de cada KPI financeiro
+KPIS_FINANCEIROS = {
+    'kpi_receita_operacional': (CONTAS_KPI[0], 1),
+    'kpi_custo_servicos': (CONTAS_KPI[1], -1),
+    'kpi_lucro_bruto': (CONTAS_KPI[2], 1),
+    'kpi_resultado_liquido': (CONTAS_KPI[3], 1),
+}
+
+
+def textos_operacionais(agregados, comparacao=None):
+    """Texto de cada KPI operacional; com ``comparacao``, acrescido da variação"""
+    totais = agregados.totais
+
+    def anterior(*colunas):
+        return math.nan if comparacao is None else sum(comparacao.totais[coluna] for coluna in colunas)
+
+    if totais['ASK'] == 0:
+        load_factor = "0%"
+    else:
+        atual = totais['RPK'] / totais['ASK'] * 100
+        # Load factor já é um percentual: a comparação é em pontos percentuais
+        base = anterior('RPK') / anterior('ASK') * 100
+        load_factor = f"{atual:.2f}%" if math.isnan(base) else f"{atual:.2f}% ({atual - base:+.2f} p.p.)"
+
+    return {
+        'kpi_ask': format_kpi(totais['ASK'], anterior('ASK')),
+        'kpi_rpk': format_kpi(totais['RPK'], anterior('RPK')),
+        'kpi_load_factor': load_factor,
+        'kpi_passageiros': format_kpi(totais['PASSAGEIROS PAGOS'] + totais['PASSAGEIROS GRÁTIS'], anterior('PASSAGEIROS PAGOS', 'PASSAGEIROS GRÁTIS')),
+        'kpi_decolagens': format_kpi(totais['DECOLAGENS'], anterior('DECOLAGENS')),
+        'kpi_destinos': format_kpi(agregados.destinos, math.nan if comparacao is None else comparacao.destinos),
+    }
+
+
+def textos_financeiros(saldos, anteriores=None):
+    """Texto de cada KPI financeiro a partir dos saldos por conta (e dos do período anterior)"""
+    return {
+        nome: format_kpi(sinal * saldos[conta], math.nan if anteriores is None else sinal * anteriores[conta])
+        for nome, (conta, sinal) in KPIS_FINANCEIROS.items()
+    }
+
+
+def chave_filtros(*filtros):
+    """Filtros na forma gravada em JSON (tuplas viram listas e datas, textos), para comparação"""
+    return json.loads(json.dumps(filtros, default=str))
+
+
+def filtros_padrao(snapshot):
+    """Filtros de cada grupo com as seleções iniciais do app"""
+    cubo = snapshot.cubo
+    demonstrativos = snapshot.financeiro
+    empresas_fin = empresas_disponiveis(demonstrativos)
+    return {
+        'operacional': (cubo['dt_referencia'].min().date(), cubo['dt_referencia'].max().date(), EMPRESAS_PADRAO, 'nenhuma'),
+        'kpis_financeiros': (periodos_disponiveis(demonstrativos)[0], empresas_fin, 'nenhuma'),
+        'financeiro': (CONTAS_KPI[0], empresas_fin, 'nenhuma'),
+    }
+
+
+def renderizar_padrao(snapshot):
+    """Filtros e saídas (textos e figuras em JSON) de cada grupo nas seleções iniciais"""
+    filtros = filtros_padrao(snapshot)
+    inicio, fim, empresas, _ = filtros['operacional']
+    agregados = agregar_selecao(*filtrar_selecao(snapshot.cubo, snapshot.indice_destinos, inicio, fim, empresas))
+    periodo, empresas_fin, _ = filtros['kpis_financeiros']
+    conta = filtros['financeiro'][0]
+    demonstrativos = snapshot.financeiro
+
+    saidas = {
+        'operacional': {
+            **textos_operacionais(agregados),
+            'plot_rpk_ask_loadf_operacionalactor': figura_rpk_ask_load_factor(agregados.mensal),
+            'plot_passageiros': figura_trimestral(agregados.trimestral, 'PASSAGEIROS PAGOS'),
+            'plot_decolagens': figura_trimestral(agregados.trimestral, 'DECOLAGENS'),
+            'plot_destinos': figura_trimestral(agregados.destinos_trimestral, 'AEROPORTO DE DESTINO (SIGLA)'),
+        },
+        'kpis_financeiros': textos_financeiros(saldos_periodo(demonstrativos, CONTAS_KPI, empresas_fin, periodo)),
+        'financeiro': {
+            'plot_financeiro': figura_financeiro(demonstrativos, conta, empresas_fin),
+        },
+    }
+    return {
+        grupo: {
+            'filtros': chave_filtros(*filtros[grupo]),
+            'saidas': {
+                nome: json.loads(pio.to_json(saida)) if isinstance(saida, go.Figure) else saida
+                for nome, saida in saidas[grupo].items()
+            },
+        }
+        for grupo in GRUPOS
+    }
+
+
+def escrever_padrao(padrao, pasta):
+    with open(os.path.join(pasta, ARQUIVO_PADRAO), 'w', encoding='utf-8') as f:
+        json.dump(padrao, f, ensure_ascii=False)
+
+
+def ler_padrao(pasta):
+    """Visões gravadas na pasta de uma versão, ou None (versões publicadas antes delas)"""
+    try:
+        with open(os.path.join(pasta, ARQUIVO_PADRAO), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def saidas_padrao(padrao, grupo, *filtros):
+    """Saídas gravadas do grupo se ``filtros`` são os padrão da versão; senão None"""
+    if padrao is None or padrao[grupo]['filtros'] != chave_filtros(*filtros):
+        return None
+    return padrao[grupo]['saidas']
+
+
+def _decodificar(objeto):
+    # O Plotly grava arrays NumPy como {dtype, bdata (base64), shape}; voltam a ser
+    # arrays para o widget enviá-los como buffers binários, como nas figuras ao vivo
+    if isinstance(objeto, dict):
+        if 'bdata' in objeto and 'dtype' in objeto:
+            array = np.frombuffer(base64.b64decode(objeto['bdata']), dtype=objeto['dtype'])
+            if 'shape' in objeto:
+                array = array.reshape([int(n) for n in str(objeto['shape']).split(',')])
+            return array
+        return {chave: _decodificar(valor) for chave, valor in objeto.items()}
+    if isinstance(objeto, list):
+        return [_decodificar(valor) for valor in objeto]
+    return objeto
+
+
+def figura(saida):
+    """Figura do Plotly a partir do JSON gravado"""
+    return go.Figure(_decodificar(saida))
@@ -0,0 +1,133 @@
+"""Utilitários reativos que o Shiny para Python não traz prontos.
+
+Além do ``debounce``, as tarefas em thread (``tarefa_em_thread``) tiram do
+event loop os cálculos pesados: enquanto uma sessão agrega um período longo,
+as demais continuam respondendo. O trabalho roda em um pool de threads
+compartilhado pelo worker e o resultado volta pela ``ExtendedTask`` do Shiny,
+que mantém a saída em estado de carregamento até terminar.
+
+Entre a mudança de um filtro e a nova invocação, ``result()`` ainda devolve o
+resultado da seleção anterior. As tarefas de ``tarefa_com_chave`` guardam a
+chave da invocação junto com o resultado, e ``resultado_da_chave`` só entrega
+o resultado da seleção atual; até lá a saída fica em carregamento.
+"""
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from shiny import reactive
+from shiny.types import SilentOperationInProgressException
+
+
+# Pool compartilhado por todas as sessões do worker
+executor = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix='tarefas-dashboard')
+
+
+def debounce(segundos):
+    """Decorador que cria um ``reactive.calc`` atualizado só após ``segundos`` sem mudanças.
+
+    Enquanto as dependências de ``fn`` continuam mudando (um intervalo de
+    datas sendo arrastado, empresas sendo marcadas), quem lê o valor não é
+    invalidado; o valor novo é publicado uma única vez, quando as entradas
+    param de mudar. Deve ser usado dentro da função ``server``.
+    """
+    def decorator(fn):
+        prazo = reactive.Value(None)
+        gatilho = reactive.Value(0)
+        primeira_execucao = True
+
+        @reactive.calc
+        def atual():
+            return fn()
+
+        @reactive.effect(priority=102)
+        def _agendar():
+            # Toda mudança nas dependências adia a publicação
+            nonlocal primeira_execucao
+            try:
+                atual()
+            except Exception:
+                pass
+            if primeira_execucao:
+                # O valor inicial já é lido diretamente por quem depende dele
+                primeira_execucao = False
+                return
+            prazo.set(time.monotonic() + segundos)
+
+        @reactive.effect(priority=101)
+        def _publicar():
+            limite = prazo()
+            if limite is None:
+                return
+            restante = limite - time.monotonic()
+            if restante > 0:
+                reactive.invalidate_later(restante)
+                return
+            with reactive.isolate():
+                prazo.set(None)
+                gatilho.set(gatilho() + 1)
+
+        @reactive.calc
+        @reactive.event(gatilho, ignore_none=False)
+        @functools.wraps(fn)
+        def estavel():
+            return atual()
+
+        return estavel
+    return decorator
+
+
+def tarefa_em_thread(fn):
+    """ExtendedTask que executa ``fn(*args)`` no pool de threads.
+
+    ``fn`` não pode ler valores reativos: tudo o que ela usa deve ser
+    passado na invocação. Deve ser usado dentro da função ``server``.
+    """
+    @reactive.extended_task
+    @functools.wraps(fn)
+    async def tarefa(*args):
+        return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(fn, *args))
+    return tarefa
+
+
+def tarefa_com_chave(fn):
+    """``tarefa_em_thread`` cujo ``invoke(chave, *args)`` resulta em ``(chave, fn(*args))``"""
+    @functools.wraps(fn)
+    def com_chave(chave, *args):
+        return chave, fn(*args)
+    return tarefa_em_thread(com_chave)
+
+
+def resultado_da_chave(tarefa, chave, aguardar_invocacao=False):
+    """Resultado de uma ``tarefa_com_chave`` invocada com ``chave``; senão, a saída segue em carregamento.
+
+    Uma tarefa nunca invocada deixa a saída vazia, como no ``result()`` do
+    Shiny; com ``aguardar_invocacao``, em carregamento (a invocação está a caminho).
+    """
+    if aguardar_invocacao and tarefa.status() == 'initial':
+        raise SilentOperationInProgressException()
+    chave_resultado, resultado = tarefa.result()
+    if chave_resultado != chave:
+        raise SilentOperationInProgressException()
+    return resultado
+
+
+def invocar_mais_recente(tarefa, *args):
+    """Invoca a tarefa descartando a execução em andamento, que ficou obsoleta"""
+    with reactive.isolate():
+        em_andamento = tarefa.status() == 'running'
+    if em_andamento:
+        # A thread termina o que começou, mas o resultado é ignorado
+        tarefa.cancel()
+    tarefa.invoke(*args)
+
+
+async def iterar_em_thread(iteravel):
+    """Percorre um iterador bloqueante no pool de threads, um item por vez"""
+    loop = asyncio.get_running_loop()
+    iterador = iter(iteravel)
+    fim = object()
+    while (item := await loop.run_in_executor(executor, next, iterador, fim)) is not fim:
+        yield item
@@ -0,0 +1,109 @@
+"""Índice esparso de rotas para o explorador de rotas.
+
+As linhas de rota são somadas uma vez no grão (mês, empresa, origem,
+destino), guardando só as combinações com movimento. Meses, empresas e
+aeroportos viram ids inteiros (origem e destino compartilham a mesma
+numeração) e o índice é um par de matrizes NumPy: ``chaves`` com os ids e
+``metricas`` com as somas, uma coluna por rota.
+
+As rotas ficam ordenadas por mês, então o período de uma consulta é um
+recorte contíguo encontrado por busca binária; empresas, aeroportos e rotas
+são comparações entre inteiros. Os agrupamentos (top-N de rotas, empresas de
+um aeroporto, série de uma rota) são ``np.unique`` + ``np.bincount`` sobre o
+recorte, sem voltar às linhas de rota a cada interação.
+"""
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from dados import COLUNAS_METRICAS
+
+
+COLUNA_ORIGEM = 'AEROPORTO DE ORIGEM (SIGLA)'
+COLUNA_DESTINO = 'AEROPORTO DE DESTINO (SIGLA)'
+GRAO_ROTAS = ['dt_referencia', 'EMPRESA (SIGLA)', COLUNA_ORIGEM, COLUNA_DESTINO]
+
+# Linhas de ``IndiceRotas.chaves``
+MES, EMPRESA, ORIGEM, DESTINO = range(4)
+
+
+class IndiceRotas(NamedTuple):
+    """Rotas com movimento; a coluna i de ``chaves`` e de ``metricas`` é uma rota em um mês"""
+    chaves: np.ndarray  # int32, 4 x rotas: ids de mês, empresa, origem e destino, ordenadas por mês
+    metricas: np.ndarray  # float64, COLUNAS_METRICAS x rotas
+    meses: pd.DatetimeIndex  # mês de cada id, em ordem
+    empresas: pd.Index  # sigla de cada id de empresa
+    aeroportos: pd.Index  # sigla de cada id de aeroporto (origem e destino)
+
+
+def build_indice_rotas(df):
+    """Soma as métricas por mês, empresa, origem e destino em um índice de ids inteiros"""
+    rotas = df.groupby(GRAO_ROTAS, observed=True, sort=True)[COLUNAS_METRICAS].sum()
+    chaves = rotas.index.to_frame(index=False)
+    meses = pd.DatetimeIndex(chaves['dt_referencia'].unique())
+    empresas = pd.Index(df['EMPRESA (SIGLA)'].cat.categories)
+    aeroportos = pd.Index(sorted(set(df[COLUNA_ORIGEM].cat.categories) | set(df[COLUNA_DESTINO].cat.categories)))
+    ids = np.vstack([
+        meses.get_indexer(chaves['dt_referencia']),
+        empresas.get_indexer(chaves['EMPRESA (SIGLA)']),
+        aeroportos.get_indexer(chaves[COLUNA_ORIGEM]),
+        aeroportos.get_indexer(chaves[COLUNA_DESTINO]),
+    ]).astype(np.int32)
+    return IndiceRotas(ids, np.ascontiguousarray(rotas.to_numpy().T), meses, empresas, aeroportos)
+
+
+def recortar(indice, inicio, fim, empresas=None):
+    """Posições das rotas no período (inclusivo) e nas empresas; ``empresas`` vazio ou None = todas"""
+    mes_inicio = indice.meses.searchsorted(pd.Timestamp(inicio), side='left')
+    mes_fim = indice.meses.searchsorted(pd.Timestamp(fim), side='right')
+    primeira, ultima = np.searchsorted(indice.chaves[MES], [mes_inicio, mes_fim])
+    posicoes = np.arange(primeira, ultima)
+    if empresas:
+        posicoes = posicoes[np.isin(indice.chaves[EMPRESA, primeira:ultima], indice.empresas.get_indexer(list(empresas)))]
+    return posicoes
+
+
+def somar_por(indice, posicoes, grupo):
+    """Soma das métricas das rotas em ``posicoes`` por valor de ``grupo`` (um id inteiro por rota)"""
+    grupos, inverso = np.unique(grupo, return_inverse=True)
+    somas = np.vstack([np.bincount(inverso, weights=metrica[posicoes], minlength=len(grupos)) for metrica in indice.metricas])
+    return grupos, pd.DataFrame(somas.T, columns=COLUNAS_METRICAS)
+
+
+def top_rotas(indice, inicio, fim, empresas=None, metrica='RPK', n=10):
+    """As ``n`` rotas (origem, destino) com maior ``metrica`` no período, com a participação no total"""
+    posicoes = recortar(indice, inicio, fim, empresas)
+    quantidade = len(indice.aeroportos)
+    pares = indice.chaves[ORIGEM, posicoes].astype(np.int64) * quantidade + indice.chaves[DESTINO, posicoes]
+    pares, somas = somar_por(indice, posicoes, pares)
+
+    total = somas[metrica].sum()
+    maiores = np.argsort(-somas[metrica].to_numpy(), kind='stable')[:n]
+    resultado = somas.iloc[maiores].reset_index(drop=True)
+    resultado.insert(0, 'DESTINO', indice.aeroportos[pares[maiores] % quantidade])
+    resultado.insert(0, 'ORIGEM', indice.aeroportos[pares[maiores] // quantidade])
+    resultado['PARTICIPAÇÃO'] = resultado[metrica] / total * 100 if total else np.nan
+    return resultado
+
+
+def empresas_aeroporto(indice, aeroporto, inicio, fim, empresas=None):
+    """Métricas das empresas nas rotas com origem ou destino no aeroporto, no período"""
+    posicoes = recortar(indice, inicio, fim, empresas)
+    id_aeroporto = indice.aeroportos.get_indexer([aeroporto])[0]
+    posicoes = posicoes[(indice.chaves[ORIGEM, posicoes] == id_aeroporto) | (indice.chaves[DESTINO, posicoes] == id_aeroporto)]
+    ids, somas = somar_por(indice, posicoes, indice.chaves[EMPRESA, posicoes])
+    somas.insert(0, 'EMPRESA (SIGLA)', indice.empresas[ids])
+    return somas
+
+
+def serie_rota(indice, origem, destino, inicio, fim, empresas=None):
+    """Métricas de uma rota por mês e empresa, no período"""
+    posicoes = recortar(indice, inicio, fim, empresas)
+    ids_origem, ids_destino = indice.aeroportos.get_indexer([origem, destino])
+    posicoes = posicoes[(indice.chaves[ORIGEM, posicoes] == ids_origem) & (indice.chaves[DESTINO, posicoes] == ids_destino)]
+    quantidade = len(indice.empresas)
+    grupos, somas = somar_por(indice, posicoes, indice.chaves[MES, posicoes].astype(np.int64) * quantidade + indice.chaves[EMPRESA, posicoes])
+    somas.insert(0, 'EMPRESA (SIGLA)', indice.empresas[grupos % quantidade])
+    somas.insert(0, 'dt_referencia', indice.meses[grupos // quantidade])
+    return somas
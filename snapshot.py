@@ -0,0 +1,288 @@
+"""Snapshot compartilhado e somente leitura dos dados do dashboard.
+
+O cubo operacional, os índices de destinos e de rotas e os demonstrativos
+financeiros são publicados uma vez em arquivos Arrow IPC/NumPy sem
+compressão. Cada worker do Shiny abre esses arquivos com memory-map: as
+páginas ficam no page cache do sistema e são compartilhadas entre processos,
+então um worker a mais não duplica os dados nem precisa fazer parse de nada
+na inicialização.
+
+Os arquivos dos demonstrativos são mapeados junto com os demais, mas a
+conversão para pandas e a indexação só acontecem no primeiro acesso a
+``financeiro``: quem abre apenas a aba operacional não paga por elas.
+
+Cada versão publicada leva também as visões padrão do dashboard (KPIs e
+figuras das seleções iniciais), pré-renderizadas por ``padrao.py``.
+
+Cada publicação grava uma versão nova em um diretório próprio e só então
+troca o ponteiro ``CURRENT`` com ``os.replace``, que é atômico. O app observa
+esse ponteiro em uma thread e troca o snapshot em uso sem reiniciar.
+
+Uso: python snapshot.py [--destino DIRETORIO] [--motor pandas|arrow|duckdb]
+                        [--inicio AAAA-MM-DD] [--fim AAAA-MM-DD]
+                        [--empresa SIGLA ...] [--nacionalidade NACIONALIDADE ...]
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Callable, NamedTuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from cubo import IndiceDestinos
+from dados import DATA_DIR, dataset_operacional_path, load_financeiro
+from financeiro import Demonstrativos, build_demonstrativos, indexar_demonstrativos
+from motores import MOTOR_PADRAO, MOTORES, montar_agregados
+from padrao import escrever_padrao, ler_padrao, renderizar_padrao
+from rotas import IndiceRotas
+
+
+snapshot_path = os.path.join(DATA_DIR, 'snapshot')
+
+PONTEIRO = 'CURRENT'
+VERSOES_MANTIDAS = 2
+INTERVALO_RECARGA = 10
+
+logger = logging.getLogger(__name__)
+
+
+class Snapshot(NamedTuple):
+    versao: str | None
+    cubo: pd.DataFrame
+    indice_destinos: IndiceDestinos
+    indice_rotas: IndiceRotas
+    carregar_financeiro: Callable[[], Demonstrativos]  # chamado no primeiro acesso a financeiro
+    padrao: dict | None = None  # visões padrão pré-renderizadas (só em versões publicadas)
+
+    @property
+    def financeiro(self):
+        return self.carregar_financeiro()
+
+
+def sob_demanda(fn, *args):
+    """Função sem argumentos que chama ``fn(*args)`` uma única vez e guarda o resultado.
+
+    Chamadas simultâneas (sessões em threads diferentes) esperam a primeira
+    terminar, em vez de carregar de novo.
+    """
+    lock = threading.Lock()
+    resultado = []
+
+    def carregar():
+        if not resultado:
+            with lock:
+                if not resultado:
+                    resultado.append(fn(*args))
+        return resultado[0]
+    return carregar
+
+
+def _montar_demonstrativos():
+    return build_demonstrativos(load_financeiro())
+
+
+def montar_snapshot(dataset_path=dataset_operacional_path, motor=MOTOR_PADRAO, **filtros):
+    """Monta o snapshot em memória a partir do dataset operacional e do CSV financeiro.
+
+    ``motor`` e ``filtros`` são repassados a ``motores.montar_agregados``.
+    """
+    cubo, indice_destinos, indice_rotas = montar_agregados(dataset_path, motor, **filtros)
+    return Snapshot(None, cubo, indice_destinos, indice_rotas, sob_demanda(_montar_demonstrativos))
+
+
+def _escrever_tabela(df, path):
+    # Strings viram dicionários para não repetir textos longos em cada linha
+    df = df.copy()
+    for coluna in df.columns[df.dtypes == object]:
+        df[coluna] = df[coluna].astype('category')
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, tabela.schema) as writer:
+        writer.write_table(tabela)
+
+
+def _mapear_tabela(path):
+    # Só mapeia: os buffers apontam para o arquivo, sem cópia nem conversão, e o
+    # mapeamento fica vivo enquanto houver buffers apontando para ele
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+def _ler_tabela(path):
+    # split_blocks evita consolidar colunas, mantendo as numéricas como views
+    return _mapear_tabela(path).to_pandas(split_blocks=True)
+
+
+def publicar_snapshot(snapshot=None, destino=snapshot_path):
+    """Grava uma nova versão do snapshot e a torna a versão corrente"""
+    if snapshot is None:
+        snapshot = montar_snapshot()
+    os.makedirs(destino, exist_ok=True)
+
+    versao = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+    tmp_path = tempfile.mkdtemp(prefix='.tmp-', dir=destino)
+    _escrever_tabela(snapshot.cubo, os.path.join(tmp_path, 'cubo.arrow'))
+    _escrever_tabela(snapshot.indice_destinos.chaves, os.path.join(tmp_path, 'destinos.arrow'))
+    np.save(os.path.join(tmp_path, 'destinos_bits.npy'), snapshot.indice_destinos.bits)
+    indice_rotas = snapshot.indice_rotas
+    np.save(os.path.join(tmp_path, 'rotas_chaves.npy'), indice_rotas.chaves)
+    np.save(os.path.join(tmp_path, 'rotas_metricas.npy'), indice_rotas.metricas)
+    saldos = snapshot.financeiro.saldos
+    np.save(os.path.join(tmp_path, 'saldos.npy'), saldos.to_numpy())
+    _escrever_tabela(saldos.index.to_frame(index=False), os.path.join(tmp_path, 'saldos_linhas.arrow'))
+    _escrever_tabela(saldos.columns.to_frame(index=False), os.path.join(tmp_path, 'saldos_colunas.arrow'))
+    _escrever_tabela(snapshot.financeiro.contas, os.path.join(tmp_path, 'contas.arrow'))
+    escrever_padrao(renderizar_padrao(snapshot), tmp_path)
+    with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'versao': versao,
+            'aeroportos': snapshot.indice_destinos.aeroportos.tolist(),
+            'rotas': {
+                'meses': indice_rotas.meses.strftime('%Y-%m-%d').tolist(),
+                'empresas': indice_rotas.empresas.tolist(),
+                'aeroportos': indice_rotas.aeroportos.tolist(),
+            },
+        }, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(destino, versao))
+
+    with tempfile.NamedTemporaryFile('w', dir=destino, prefix='.tmp-', delete=False) as f:
+        f.write(versao)
+    os.replace(f.name, os.path.join(destino, PONTEIRO))
+
+    _remover_versoes_antigas(destino)
+    return versao
+
+
+def _remover_versoes_antigas(destino):
+    # Workers que ainda usam uma versão removida continuam lendo normalmente:
+    # abrir_snapshot mapeia todos os arquivos da versão (os dos demonstrativos
+    # também, só a conversão fica para depois) e um arquivo removido só é
+    # liberado quando o último mapeamento é fechado
+    versoes = sorted(nome for nome in os.listdir(destino) if nome[0].isdigit())
+    for versao in versoes[:-VERSOES_MANTIDAS]:
+        shutil.rmtree(os.path.join(destino, versao), ignore_errors=True)
+
+
+def versao_corrente(destino=snapshot_path):
+    """Versão apontada por CURRENT, ou None se nada foi publicado"""
+    try:
+        with open(os.path.join(destino, PONTEIRO), encoding='utf-8') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def abrir_snapshot(versao=None, destino=snapshot_path):
+    """Abre (via memory-map) uma versão publicada do snapshot"""
+    versao = versao or versao_corrente(destino)
+    if versao is None:
+        return None
+    path = os.path.join(destino, versao)
+    with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    indice_destinos = IndiceDestinos(
+        _ler_tabela(os.path.join(path, 'destinos.arrow')),
+        np.load(os.path.join(path, 'destinos_bits.npy'), mmap_mode='r'),
+        pd.Index(meta['aeroportos']),
+    )
+    indice_rotas = IndiceRotas(
+        np.load(os.path.join(path, 'rotas_chaves.npy'), mmap_mode='r'),
+        np.load(os.path.join(path, 'rotas_metricas.npy'), mmap_mode='r'),
+        pd.DatetimeIndex(meta['rotas']['meses']),
+        pd.Index(meta['rotas']['empresas']),
+        pd.Index(meta['rotas']['aeroportos']),
+    )
+    return Snapshot(
+        versao,
+        _ler_tabela(os.path.join(path, 'cubo.arrow')),
+        indice_destinos,
+        indice_rotas,
+        sob_demanda(
+            _abrir_demonstrativos,
+            np.load(os.path.join(path, 'saldos.npy'), mmap_mode='r'),
+            _mapear_tabela(os.path.join(path, 'saldos_linhas.arrow')),
+            _mapear_tabela(os.path.join(path, 'saldos_colunas.arrow')),
+            _mapear_tabela(os.path.join(path, 'contas.arrow')),
+        ),
+        ler_padrao(path),
+    )
+
+
+def _abrir_demonstrativos(valores, linhas, colunas, contas):
+    # Recebe os arquivos já mapeados; aqui só converte e indexa
+    saldos = pd.DataFrame(
+        valores,
+        index=pd.MultiIndex.from_frame(linhas.to_pandas(split_blocks=True).astype(str)),
+        columns=pd.MultiIndex.from_frame(colunas.to_pandas(split_blocks=True).astype(str)),
+        copy=False,
+    )
+    contas = contas.to_pandas(split_blocks=True).astype({'descricao_conta': str})
+    return indexar_demonstrativos(saldos, contas)
+
+
+def carregar_snapshot(destino=snapshot_path):
+    """Abre o snapshot publicado ou, se não houver, monta um em memória"""
+    return abrir_snapshot(destino=destino) or montar_snapshot()
+
+
+class ObservadorSnapshot:
+    """Mantém o snapshot corrente e recarrega, em uma thread, quando CURRENT muda"""
+
+    def __init__(self, destino=snapshot_path, intervalo=INTERVALO_RECARGA):
+        self.destino = destino
+        self.intervalo = intervalo
+        self.atual = carregar_snapshot(destino)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def iniciar(self):
+        """Inicia a thread de observação (uma única vez por processo)"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._observar, name='observador-snapshot', daemon=True)
+                self._thread.start()
+
+    def verificar(self):
+        """Carrega a versão apontada por CURRENT, se for nova; retorna True se trocou"""
+        versao = versao_corrente(self.destino)
+        if versao is None or versao == self.atual.versao:
+            return False
+        # A troca é uma atribuição: quem já leu self.atual segue com a versão anterior
+        self.atual = abrir_snapshot(versao, self.destino)
+        logger.info("snapshot %s carregado", versao)
+        return True
+
+    def _observar(self):
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                self.verificar()
+            except Exception:
+                # Ex.: versão removida entre a leitura de CURRENT e a abertura;
+                # a próxima verificação tenta de novo
+                logger.exception("falha ao recarregar o snapshot")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--destino', default=snapshot_path)
+    parser.add_argument('--motor', choices=list(MOTORES), default=MOTOR_PADRAO)
+    parser.add_argument('--inicio')
+    parser.add_argument('--fim')
+    parser.add_argument('--empresa', nargs='+', dest='empresas')
+    parser.add_argument('--nacionalidade', nargs='+', dest='nacionalidades')
+    args = parser.parse_args()
+    snapshot = montar_snapshot(
+        motor=args.motor,
+        inicio=args.inicio,
+        fim=args.fim,
+        empresas=args.empresas,
+        nacionalidades=args.nacionalidades,
+    )
+    print(publicar_snapshot(snapshot, destino=args.destino))
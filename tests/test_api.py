@@ -0,0 +1,143 @@
+"""API HTTP: formatos de resposta, ETag/304 e erros de consulta, chamando o app ASGI direto."""
+import asyncio
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from urllib.parse import urlencode
+
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import criar_api
+from financeiro import CONTAS_KPI
+from ingestao import ingerir_fonte
+from snapshot import montar_snapshot
+
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def chamar(app, caminho, consulta='', cabecalhos=None):
+    """GET no app ASGI; retorna (status, cabeçalhos, corpo)"""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': caminho, 'raw_path': caminho.encode(), 'root_path': '', 'query_string': consulta.encode(),
+        'headers': [(nome.lower().encode(), valor.encode()) for nome, valor in (cabecalhos or {}).items()],
+        'server': ('testserver', 80), 'client': ('testclient', 50000),
+    }
+    mensagens = []
+    pedidos = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+    async def receive():
+        # Depois do corpo, o cliente só se desconectaria: espera até a resposta terminar
+        if pedidos:
+            return pedidos.pop()
+        await asyncio.Future()
+
+    async def send(mensagem):
+        mensagens.append(mensagem)
+
+    asyncio.run(app(scope, receive, send))
+    inicio = mensagens[0]
+    corpo = b''.join(mensagem.get('body', b'') for mensagem in mensagens[1:])
+    return inicio['status'], {nome.decode(): valor.decode() for nome, valor in inicio['headers']}, corpo
+
+
+class TestApi(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        dataset = os.path.join(cls.tmp, 'operacional')
+        ingerir_fonte(os.path.join(FIXTURES, 'anac_2024_v1.csv'), dataset)
+        cls.linhas = pd.read_parquet(dataset)
+        cls.snapshot = montar_snapshot(dataset_path=dataset)._replace(versao='v1')
+        cls.app = criar_api(lambda: cls.snapshot)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def operacional(self, consulta='', cabecalhos=None):
+        return chamar(self.app, '/operacional', consulta, cabecalhos)
+
+    def test_totais_por_empresa(self):
+        status, cabecalhos, corpo = self.operacional('nivel=total&empresa=AZU&empresa=TAM')
+        self.assertEqual(status, 200)
+        self.assertEqual(cabecalhos['content-type'], 'application/json')
+        df = pd.DataFrame(json.loads(corpo)).set_index('EMPRESA (SIGLA)')
+        esperado = self.linhas.groupby('EMPRESA (SIGLA)', observed=True)['ASK'].sum()
+        self.assertEqual(df.index.tolist(), ['AZU', 'TAM'])
+        self.assertEqual(df['ASK'].tolist(), esperado[['AZU', 'TAM']].tolist())
+
+    def test_formatos_com_os_mesmos_dados(self):
+        consulta = 'nivel=trimestral&inicio=2024-01-01&fim=2024-02-01'
+        json_ = pd.DataFrame(json.loads(self.operacional(consulta)[2]))
+        _, cabecalhos, corpo = self.operacional(consulta + '&formato=csv')
+        self.assertEqual(cabecalhos['content-type'], 'text/csv; charset=utf-8')
+        csv = pd.read_csv(io.BytesIO(corpo))
+        _, cabecalhos, corpo = self.operacional(consulta + '&formato=arrow')
+        self.assertEqual(cabecalhos['content-type'], 'application/vnd.apache.arrow.stream')
+        arrow = pa.ipc.open_stream(corpo).read_all().to_pandas()
+
+        self.assertGreater(len(json_), 0)
+        for df in (csv, arrow):
+            self.assertEqual(list(df.columns), list(json_.columns))
+            pd.testing.assert_frame_equal(df, json_, check_dtype=False)
+
+    def test_etag_e_304(self):
+        status, cabecalhos, _ = self.operacional('empresa=AZU')
+        tag = cabecalhos['etag']
+        self.assertTrue(tag.startswith('"v1-'))
+        self.assertEqual(cabecalhos['cache-control'], 'no-cache')
+
+        status, cabecalhos, corpo = self.operacional('empresa=AZU', {'If-None-Match': tag})
+        self.assertEqual((status, corpo), (304, b''))
+        self.assertEqual(cabecalhos['etag'], tag)
+        # A ordem dos parâmetros não muda a consulta; outro filtro muda
+        self.assertEqual(self.operacional('empresa=AZU&nivel=mensal')[1]['etag'], self.operacional('nivel=mensal&empresa=AZU')[1]['etag'])
+        self.assertNotEqual(self.operacional('empresa=GLO')[1]['etag'], tag)
+        self.assertEqual(self.operacional('empresa=GLO', {'If-None-Match': tag})[0], 200)
+
+    def test_sem_etag_sem_versao_publicada(self):
+        app = criar_api(lambda: self.snapshot._replace(versao=None))
+        status, cabecalhos, _ = chamar(app, '/operacional', '', {'If-None-Match': '"v1-0"'})
+        self.assertEqual(status, 200)
+        self.assertNotIn('etag', cabecalhos)
+
+    def test_consultas_invalidas(self):
+        for caminho, consulta in [
+            ('/operacional', 'formato=xml'),
+            ('/operacional', 'nivel=anual'),
+            ('/operacional', 'inicio=ontem'),
+            ('/financeiro', 'empresa=AZU'),
+        ]:
+            with self.subTest(caminho=caminho, consulta=consulta):
+                status, cabecalhos, corpo = chamar(self.app, caminho, consulta)
+                self.assertEqual(status, 400)
+                self.assertIn('erro', json.loads(corpo))
+
+    def test_selecao_vazia(self):
+        self.assertEqual(json.loads(self.operacional('empresa=XXX')[2]), [])
+        colunas = list(pd.DataFrame(json.loads(self.operacional()[2])).columns)
+        self.assertEqual(list(pd.read_csv(io.BytesIO(self.operacional('empresa=XXX&formato=csv')[2])).columns), colunas)
+        tabela = pa.ipc.open_stream(self.operacional('empresa=XXX&formato=arrow')[2]).read_all()
+        self.assertEqual((tabela.num_rows, tabela.column_names), (0, colunas))
+
+    def test_financeiro(self):
+        status, _, corpo = chamar(self.app, '/financeiro', urlencode({'conta': CONTAS_KPI[0], 'empresa': 'AZU'}))
+        self.assertEqual(status, 200)
+        df = pd.DataFrame(json.loads(corpo))
+        self.assertGreater(len(df), 0)
+        self.assertEqual(set(df['descricao_conta']), {CONTAS_KPI[0]})
+        self.assertEqual(set(df['empresa']), {'AZU'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+"""Cubo mensal: filtros, agregados e comparações conferidos contra as linhas de rota."""
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cubo import (
+    COLUNA_DESTINO, MESES_COMPARACAO, agregar_por_empresa, agregar_selecao, build_cubo, build_indice_destinos,
+    comparar_selecao, contar_destinos, contar_destinos_por, filtrar_destinos, filtrar_selecao,
+)
+from dados import COLUNAS_METRICAS, tipar_operacional
+
+
+EMPRESAS = {'AZU': 'BRASILEIRA', 'GLO': 'BRASILEIRA', 'TAM': 'BRASILEIRA', 'AAL': 'ESTRANGEIRA'}
+# Mais de 64 aeroportos, para os bitsets terem mais de uma palavra
+AEROPORTOS = [f'SB{i:03d}' for i in range(150)]
+
+
+def linhas_rota(meses=36, linhas=4000, semente=0):
+    """Linhas de rota sintéticas, tipadas como as do dataset"""
+    rng = np.random.default_rng(semente)
+    empresas = rng.choice(list(EMPRESAS), linhas)
+    df = pd.DataFrame({
+        'dt_referencia': pd.date_range('2022-01-01', periods=meses, freq='MS')[rng.integers(0, meses, linhas)],
+        'EMPRESA (SIGLA)': empresas,
+        'EMPRESA (NACIONALIDADE)': [EMPRESAS[empresa] for empresa in empresas],
+        'AEROPORTO DE ORIGEM (SIGLA)': rng.choice(AEROPORTOS, linhas),
+        'AEROPORTO DE DESTINO (SIGLA)': rng.choice(AEROPORTOS, linhas),
+        **{coluna: rng.integers(0, 1000, linhas).astype('float64') for coluna in COLUNAS_METRICAS},
+    })
+    return tipar_operacional(df)
+
+
+def recorte(df, inicio, fim, empresas):
+    return df[df['dt_referencia'].between(inicio, fim) & df['EMPRESA (SIGLA)'].isin(empresas)]
+
+
+class TestCubo(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.linhas = linhas_rota()
+        cls.cubo = build_cubo(cls.linhas)
+        cls.indice = build_indice_destinos(cls.linhas)
+
+    def selecao(self, inicio, fim, empresas):
+        return agregar_selecao(*filtrar_selecao(self.cubo, self.indice, inicio, fim, empresas))
+
+    def test_cubo_preserva_os_totais(self):
+        self.assertLess(len(self.cubo), len(self.linhas))
+        np.testing.assert_allclose(self.cubo[COLUNAS_METRICAS].sum(), self.linhas[COLUNAS_METRICAS].sum())
+
+    def test_selecao_igual_as_linhas_filtradas(self):
+        inicio, fim, empresas = '2022-05-01', '2023-10-01', ['AZU', 'TAM']
+        agregados = self.selecao(inicio, fim, empresas)
+        linhas = recorte(self.linhas, inicio, fim, empresas)
+
+        np.testing.assert_allclose(agregados.totais[COLUNAS_METRICAS], linhas[COLUNAS_METRICAS].sum())
+        mensal = linhas.groupby('dt_referencia')[COLUNAS_METRICAS].sum()
+        self.assertEqual(agregados.mensal['dt_referencia'].tolist(), mensal.index.tolist())
+        np.testing.assert_allclose(agregados.mensal[COLUNAS_METRICAS], mensal)
+
+        trimestral = linhas.groupby(['EMPRESA (SIGLA)', linhas['dt_referencia'].dt.to_period('Q')], observed=True)[COLUNAS_METRICAS].sum()
+        self.assertEqual(len(agregados.trimestral), len(trimestral))
+        np.testing.assert_allclose(agregados.trimestral[COLUNAS_METRICAS], trimestral)
+        self.assertEqual(agregados.destinos, linhas[COLUNA_DESTINO].nunique())
+
+    def test_selecao_vazia(self):
+        agregados = self.selecao('2022-01-01', '2024-12-01', [])
+        self.assertTrue(agregados.mensal.empty)
+        self.assertEqual(agregados.totais.sum(), 0)
+        self.assertEqual(agregados.destinos, 0)
+        self.assertTrue(agregados.destinos_trimestral.empty)
+
+    def test_agregar_por_empresa(self):
+        cubo, destinos = filtrar_selecao(self.cubo, self.indice, '2023-01-01', '2023-12-01', list(EMPRESAS))
+        linhas = recorte(self.linhas, '2023-01-01', '2023-12-01', list(EMPRESAS))
+        for nivel, tempo in [('mensal', linhas['dt_referencia']), ('trimestral', linhas['dt_referencia'].dt.to_period('Q')), ('total', None)]:
+            with self.subTest(nivel=nivel):
+                df = agregar_por_empresa(cubo, destinos, nivel)
+                chaves = [linhas['EMPRESA (SIGLA)']] + ([] if tempo is None else [tempo])
+                grupos = linhas.groupby(chaves, observed=True)
+                esperado = grupos[COLUNAS_METRICAS].sum()
+                np.testing.assert_allclose(df[COLUNAS_METRICAS], esperado)
+                np.testing.assert_allclose(df['LOAD FACTOR'], esperado['RPK'] / esperado['ASK'] * 100)
+                self.assertEqual(df[COLUNA_DESTINO].tolist(), grupos[COLUNA_DESTINO].nunique().tolist())
+
+    def test_agregar_por_empresa_sem_linhas(self):
+        df = agregar_por_empresa(*filtrar_selecao(self.cubo, self.indice, '2022-01-01', '2022-12-01', []), 'trimestral')
+        self.assertTrue(df.empty)
+        self.assertIn(COLUNA_DESTINO, df.columns)
+
+
+class TestIndiceDestinos(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.linhas = linhas_rota(semente=1)
+        cls.indice = build_indice_destinos(cls.linhas)
+
+    def test_um_bitset_por_mes_e_empresa(self):
+        self.assertEqual(len(self.indice.chaves), self.linhas.groupby(['dt_referencia', 'EMPRESA (SIGLA)'], observed=True).ngroups)
+        self.assertEqual(self.indice.bits.shape[1], -(-len(AEROPORTOS) // 64))
+        self.assertEqual(self.indice.bits.dtype, np.uint64)
+
+    def test_contagem_igual_a_nunique(self):
+        meses = self.indice.chaves['dt_referencia']
+        for inicio, fim in [('2022-01-01', '2024-12-01'), ('2023-03-01', '2023-03-01'), ('2025-01-01', '2025-12-01')]:
+            with self.subTest(inicio=inicio, fim=fim):
+                mask = meses.between(inicio, fim)
+                linhas = self.linhas[self.linhas['dt_referencia'].between(inicio, fim)]
+                self.assertEqual(contar_destinos(filtrar_destinos(self.indice, mask)), linhas[COLUNA_DESTINO].nunique())
+
+    def test_aeroportos_nas_bordas_das_palavras(self):
+        # Ids 63/64 e 127/128 caem no fim de uma palavra de 64 bits e no início da seguinte
+        linhas = self.linhas.iloc[:4].copy()
+        linhas['dt_referencia'] = pd.Timestamp('2022-01-01')
+        linhas['EMPRESA (SIGLA)'] = 'AZU'
+        linhas[COLUNA_DESTINO] = pd.Categorical([AEROPORTOS[i] for i in (63, 64, 127, 128)], categories=AEROPORTOS)
+        indice = build_indice_destinos(linhas)
+        self.assertEqual(contar_destinos(indice), 4)
+        self.assertEqual(indice.bits[0].tolist(), [1 << 63, 1 | (1 << 63), 1])
+
+    def test_contagem_por_empresa_e_trimestre(self):
+        chaves = self.indice.chaves
+        por = contar_destinos_por(self.indice, {
+            'EMPRESA (SIGLA)': chaves['EMPRESA (SIGLA)'],
+            'quarter': chaves['dt_referencia'].dt.to_period('Q'),
+        })
+        esperado = self.linhas.groupby(
+            [self.linhas['EMPRESA (SIGLA)'], self.linhas['dt_referencia'].dt.to_period('Q')], observed=True,
+        )[COLUNA_DESTINO].nunique()
+        self.assertEqual(por[COLUNA_DESTINO].tolist(), esperado.tolist())
+        self.assertEqual(por['quarter'].tolist(), esperado.index.get_level_values(1).tolist())
+
+    def test_indice_vazio(self):
+        vazio = filtrar_destinos(self.indice, np.zeros(len(self.indice.chaves), dtype=bool))
+        self.assertEqual(contar_destinos(vazio), 0)
+        self.assertTrue(contar_destinos_por(vazio, {'EMPRESA (SIGLA)': vazio.chaves['EMPRESA (SIGLA)']}).empty)
+
+
+class TestComparacao(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.linhas = linhas_rota(semente=2)
+        cls.cubo = build_cubo(cls.linhas)
+        cls.indice = build_indice_destinos(cls.linhas)
+
+    def anteriores(self, inicio, fim, empresas, meses):
+        # Linhas do período anterior com as datas levadas para as da seleção
+        deslocamento = pd.DateOffset(months=meses)
+        linhas = recorte(self.linhas, pd.Timestamp(inicio) - deslocamento, pd.Timestamp(fim) - deslocamento, empresas)
+        return linhas.assign(dt_referencia=linhas['dt_referencia'] + deslocamento)
+
+    def test_periodo_anterior_alinhado_a_selecao(self):
+        empresas = ['AZU', 'GLO']
+        for modo, inicio, fim in [('yoy', '2023-01-01', '2023-12-01'), ('qoq', '2023-04-01', '2023-09-01')]:
+            with self.subTest(modo=modo):
+                atual, anterior = comparar_selecao(self.cubo, self.indice, inicio, fim, empresas, MESES_COMPARACAO[modo])
+                esperado = agregar_selecao(*filtrar_selecao(self.cubo, self.indice, inicio, fim, empresas))
+                np.testing.assert_allclose(atual.totais, esperado.totais)
+                self.assertEqual(atual.destinos, esperado.destinos)
+
+                linhas = self.anteriores(inicio, fim, empresas, MESES_COMPARACAO[modo])
+                np.testing.assert_allclose(anterior.totais[COLUNAS_METRICAS], linhas[COLUNAS_METRICAS].sum())
+                self.assertEqual(anterior.destinos, linhas[COLUNA_DESTINO].nunique())
+                mensal = linhas.groupby('dt_referencia')[COLUNAS_METRICAS].sum().reindex(atual.mensal['dt_referencia'])
+                np.testing.assert_allclose(anterior.mensal[COLUNAS_METRICAS], mensal)
+                trimestre = [linhas['EMPRESA (SIGLA)'], linhas['dt_referencia'].dt.to_period('Q').rename('quarter')]
+                trimestral = linhas.groupby(trimestre, observed=True)[COLUNAS_METRICAS].sum()
+                chaves = pd.MultiIndex.from_frame(atual.trimestral[['EMPRESA (SIGLA)', 'quarter']])
+                np.testing.assert_allclose(anterior.trimestral[COLUNAS_METRICAS], trimestral.reindex(chaves))
+                destinos = linhas.groupby(trimestre, observed=True)[COLUNA_DESTINO].nunique()
+                chaves = pd.MultiIndex.from_frame(atual.destinos_trimestral[['EMPRESA (SIGLA)', 'quarter']])
+                np.testing.assert_allclose(anterior.destinos_trimestral[COLUNA_DESTINO], destinos.reindex(chaves))
+
+    def test_sem_dados_do_periodo_anterior(self):
+        # Os dados começam em 2022-01: o ano anterior a 2022-03 não existe
+        atual, anterior = comparar_selecao(self.cubo, self.indice, '2022-03-01', '2022-12-01', ['TAM'], MESES_COMPARACAO['yoy'])
+        self.assertGreater(atual.totais['ASK'], 0)
+        self.assertTrue(anterior.totais.isna().all())
+        self.assertTrue(np.isnan(anterior.destinos))
+        self.assertEqual(len(anterior.mensal), len(atual.mensal))
+        self.assertTrue(anterior.mensal[COLUNAS_METRICAS].isna().all().all())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+"""Exportação em lotes: seleções vazias e arquivos válidos em CSV e Parquet."""
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exportacao import lotes_agregados, lotes_financeiro, lotes_rotas, serializar
+from financeiro import CONTAS_KPI
+from ingestao import ingerir_fonte
+from snapshot import montar_snapshot
+
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+INICIO, FIM = '2024-01-01', '2024-02-01'
+
+
+def ler_parquet(lotes):
+    return pq.read_table(io.BytesIO(b''.join(serializar(lotes, 'parquet'))))
+
+
+def ler_csv(lotes):
+    return pd.read_csv(io.BytesIO(b''.join(serializar(lotes, 'csv'))))
+
+
+class TestExportacao(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        cls.dataset = os.path.join(cls.tmp, 'operacional')
+        ingerir_fonte(os.path.join(FIXTURES, 'anac_2024_v1.csv'), cls.dataset)
+        cls.snapshot = montar_snapshot(dataset_path=cls.dataset)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def rotas(self, empresas, linhas_lote=50_000):
+        return lotes_rotas(INICIO, FIM, empresas, dataset_path=self.dataset, linhas_lote=linhas_lote)
+
+    def assertVazioValido(self, fabrica, colunas):
+        tabela = ler_parquet(fabrica())
+        self.assertEqual(tabela.num_rows, 0)
+        self.assertEqual(tabela.column_names, colunas)
+        self.assertFalse(any(pa.types.is_null(tipo) for tipo in tabela.schema.types))
+        csv = ler_csv(fabrica())
+        self.assertEqual(len(csv), 0)
+        self.assertEqual(list(csv.columns), colunas)
+
+    def test_rotas_filtra_periodo_e_empresas(self):
+        tabela = ler_parquet(self.rotas(['AZU', 'TAM'], linhas_lote=1))
+        self.assertEqual(sorted(tabela.column('EMPRESA (SIGLA)').to_pylist()), ['AZU', 'AZU', 'TAM'])
+        self.assertEqual(len(ler_csv(self.rotas(['GLO']))), 1)
+
+    def test_rotas_sem_empresas(self):
+        colunas = ler_parquet(self.rotas(['AZU'])).column_names
+        self.assertVazioValido(lambda: self.rotas([]), colunas)
+
+    def test_agregados_sem_empresas(self):
+        for nivel, periodo in [('mensal', 'dt_referencia'), ('trimestral', 'quarter')]:
+            with self.subTest(nivel=nivel):
+                cheio = ler_parquet(lotes_agregados(self.snapshot, INICIO, FIM, ['AZU', 'GLO'], nivel))
+                self.assertIn(periodo, cheio.column_names)
+                self.assertGreater(cheio.num_rows, 0)
+                self.assertVazioValido(lambda: lotes_agregados(self.snapshot, INICIO, FIM, [], nivel), cheio.column_names)
+
+    def test_financeiro_sem_empresas(self):
+        demonstrativos = self.snapshot.financeiro
+        self.assertVazioValido(
+            lambda: lotes_financeiro(demonstrativos, [], 'conta', CONTAS_KPI[0]),
+            ['descricao_conta', 'empresa', 'periodo', 'valor_saldo'],
+        )
+        self.assertVazioValido(
+            lambda: lotes_financeiro(demonstrativos, [], 'demonstrativos'),
+            ['empresa', 'periodo', 'demonstrativo', 'conta', 'descricao_conta', 'tipo_saldo', 'valor_saldo'],
+        )
+
+    def test_csv_tem_um_cabecalho_so(self):
+        texto = b''.join(serializar(self.rotas(['AZU', 'GLO', 'TAM'], linhas_lote=1), 'csv')).decode()
+        linhas = texto.splitlines()
+        self.assertEqual(len(linhas), 5)
+        self.assertEqual(sum(linha.startswith('dt_referencia') for linha in linhas), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
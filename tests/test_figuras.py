@@ -0,0 +1,94 @@
+"""Agregação por trimestre das séries longas, o load factor do período anterior e os rótulos das barras."""
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from figuras import MAX_PONTOS_MENSAIS, TEMPLATE, agregar_meses, barras_por_empresa, figura_rpk_ask_load_factor
+
+
+def serie_mensal(meses, inicio='2022-01-01', sem_anterior=0):
+    """RPK/ASK constantes por mês; os ``sem_anterior`` primeiros meses não têm ano anterior"""
+    datas = pd.date_range(inicio, periods=meses, freq='MS')
+    mensal = pd.DataFrame({'dt_referencia': datas, 'RPK': 80.0, 'ASK': 100.0})
+    anterior = pd.DataFrame({'RPK': 60.0, 'ASK': 100.0}, index=range(meses))
+    anterior.iloc[:sem_anterior] = np.nan
+    return mensal, anterior
+
+
+class TestAgregarMeses(unittest.TestCase):
+
+    def test_serie_curta_fica_mensal(self):
+        mensal, _ = serie_mensal(MAX_PONTOS_MENSAIS)
+        df, dtick = agregar_meses(mensal.iloc[::-1], ['RPK', 'ASK'])
+        self.assertEqual(dtick, 'M1')
+        self.assertTrue(df['dt_referencia'].is_monotonic_increasing)
+
+    def test_serie_longa_soma_por_trimestre(self):
+        mensal, _ = serie_mensal(48)
+        df, dtick = agregar_meses(mensal, ['RPK', 'ASK'])
+        self.assertEqual(dtick, 'M3')
+        self.assertEqual(len(df), 16)
+        self.assertEqual(df['RPK'].tolist(), [240.0] * 16)
+        self.assertEqual(df['dt_referencia'].iloc[1], pd.Timestamp('2022-04-01'))
+
+    def test_trimestre_sem_ano_anterior_fica_sem_valor(self):
+        # Começa em fevereiro e sem ano anterior até abril: o 1º trimestre não tem
+        # nenhum mês com valor e o 2º tem só parte dos meses
+        mensal, anterior = serie_mensal(40, inicio='2022-02-01', sem_anterior=3)
+        df = mensal.assign(**{'RPK anterior': anterior['RPK'].to_numpy()})
+        df, _ = agregar_meses(df, ['RPK', 'RPK anterior'])
+        self.assertEqual(df['RPK'].iloc[:2].tolist(), [160.0, 240.0])
+        self.assertTrue(df['RPK anterior'].iloc[:2].isna().all())
+        self.assertEqual(df['RPK anterior'].iloc[2], 180.0)
+
+    def test_load_factor_anterior_sem_zeros(self):
+        mensal, anterior = serie_mensal(40, inicio='2022-02-01', sem_anterior=3)
+        fig = figura_rpk_ask_load_factor(mensal, anterior)
+        (linha,) = [trace for trace in fig.data if trace.name == 'Load Factor (anterior)']
+        lf = np.asarray(linha.y, dtype='float64')
+        self.assertTrue(np.isnan(lf[:2]).all())
+        np.testing.assert_allclose(lf[2:], 60.0)
+
+
+class TestRotulos(unittest.TestCase):
+
+    def barras(self, variacao=None):
+        df = pd.DataFrame({
+            'quarter': ['2024Q1', '2024Q2'] * 2,
+            'EMPRESA (SIGLA)': ['AZU', 'AZU', 'GLO', 'GLO'],
+            'valor': [1.5e9, 2.25e9, 9.5e8, 1.2e9],
+        })
+        coluna = None if variacao is None else 'variacao'
+        return barras_por_empresa(df.assign(variacao=variacao), 'quarter', 'valor', coluna_variacao=coluna)
+
+    def test_valores_na_escala_da_figura(self):
+        fig = self.barras()
+        barra = fig.layout.template.data.bar[0]
+        self.assertEqual(barra.texttemplate, '%{customdata:.1f}B')
+        self.assertEqual(barra.hovertemplate, barra.texttemplate)
+        self.assertEqual(barra.textangle, -90)
+        self.assertEqual(fig.data[0].customdata.dtype, np.float32)
+        np.testing.assert_allclose(fig.data[1].customdata, [0.95, 1.2], rtol=1e-6)
+        self.assertTrue(all(trace.text is None for trace in fig.data))
+        # O template compartilhado pelas figuras não é alterado
+        self.assertIsNone(TEMPLATE.data.bar[0].texttemplate)
+
+    def test_variacao_no_customdata(self):
+        fig = self.barras([10.0, -5.0, 2.5, 0.0])
+        self.assertEqual(fig.layout.template.data.bar[0].texttemplate, '%{customdata[0]:.1f}B (%{customdata[1]:+.1f}%)')
+        np.testing.assert_allclose(fig.data[0].customdata, [[1.5, 10.0], [2.25, -5.0]])
+
+    def test_pontos_sem_base_de_comparacao(self):
+        fig = self.barras([np.nan, -5.0, np.nan, 12.0])
+        self.assertEqual(fig.layout.template.data.bar[0].texttemplate, '%{customdata:.1f}B%{text}')
+        self.assertEqual(list(fig.data[0].text), ['', ' (-5.0%)'])
+        self.assertEqual(list(fig.data[1].text), ['', ' (+12.0%)'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""Matriz de saldos: recortes por conta, empresa e período, e contas renomeadas."""
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from financeiro import build_demonstrativos, saldos_comparacao, saldos_periodo, serie_conta, tabela_contas
+
+
+RECEITA = '(=) Receita Operacional Líquida'
+EMPRESTIMOS = 'Empréstimos e Financiamentos'
+EMPRESTIMOS_NOVO = 'Empréstimos e Arrendamentos'
+
+
+def linha(empresa, periodo, conta, descricao, valor, tipo_saldo='saldo_inicio_periodo', demonstrativo='DRE'):
+    return {
+        'empresa': empresa, 'periodo': periodo, 'demonstrativo': demonstrativo, 'conta': conta,
+        'descricao_conta': descricao, 'nivel_conta': 1, 'tipo_saldo': tipo_saldo, 'valor_saldo': valor,
+    }
+
+
+def demonstrativos():
+    return build_demonstrativos(pd.DataFrame([
+        linha('AZU', '2024T1', '3.01', RECEITA, 100.0),
+        linha('GLO', '2024T1', '3.01', RECEITA, 50.0),
+        linha('AZU', '2024T2', '3.01', RECEITA, 120.0),
+        linha('AZU', '2024T2', '3.01', RECEITA, 90.0, tipo_saldo='saldo_inicio_periodo_ano_anterior'),
+        # Mesma conta com a descrição trocada a partir de 2024T2
+        linha('AZU', '2024T1', '2.1.2', EMPRESTIMOS, 10.0, demonstrativo='BP'),
+        linha('AZU', '2024T2', '2.1.2', EMPRESTIMOS_NOVO, 20.0, demonstrativo='BP'),
+    ]))
+
+
+class TestFinanceiro(unittest.TestCase):
+
+    def setUp(self):
+        self.demonstrativos = demonstrativos()
+
+    def test_saldos_periodo_soma_as_empresas(self):
+        saldos = saldos_periodo(self.demonstrativos, [RECEITA], ['AZU', 'GLO'], '2024T1')
+        self.assertEqual(saldos[RECEITA], 150.0)
+        # Empresa sem coluna no período é ignorada
+        self.assertEqual(saldos_periodo(self.demonstrativos, [RECEITA], ['GLO'], '2024T2')[RECEITA], 0.0)
+
+    def test_descricao_seleciona_so_os_saldos_publicados_com_ela(self):
+        antigos = serie_conta(self.demonstrativos, EMPRESTIMOS, ['AZU'])
+        novos = serie_conta(self.demonstrativos, EMPRESTIMOS_NOVO, ['AZU'])
+        self.assertEqual(antigos.tolist(), [10.0])
+        self.assertEqual(antigos.index.get_level_values('periodo').tolist(), ['2024T1'])
+        self.assertEqual(novos.tolist(), [20.0])
+        self.assertEqual(saldos_periodo(self.demonstrativos, [EMPRESTIMOS], ['AZU'], '2024T2')[EMPRESTIMOS], 0.0)
+
+    def test_comparacoes(self):
+        yoy = saldos_comparacao(self.demonstrativos, [RECEITA], ['AZU'], '2024T2', 'yoy')
+        qoq = saldos_comparacao(self.demonstrativos, [RECEITA], ['AZU'], '2024T2', 'qoq')
+        self.assertEqual((yoy[RECEITA], qoq[RECEITA]), (90.0, 100.0))
+        # Sem o período anterior nos dados, a comparação fica sem valor
+        self.assertTrue(np.isnan(saldos_comparacao(self.demonstrativos, [RECEITA], ['AZU'], '2024T1', 'qoq')[RECEITA]))
+
+    def test_tabela_contas(self):
+        tabela = tabela_contas(self.demonstrativos, [RECEITA, EMPRESTIMOS_NOVO], ['AZU'], periodos=['2024T2'])
+        self.assertEqual(tabela['descricao_conta'].tolist(), [RECEITA, EMPRESTIMOS_NOVO])
+        self.assertEqual(tabela['valor_saldo'].tolist(), [120.0, 20.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
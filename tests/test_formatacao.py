@@ -0,0 +1,44 @@
+"""Paridade entre a formatação vetorizada e a formatação de um valor isolado."""
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from formatacao import format_number, format_numbers, format_percent
+
+
+# Empates na casa arredondada, em cada faixa e com sinal
+EMPATES = [
+    0.5, 1.5, 2.5, 999.5,
+    1050, 1150, 1250, 999_950, 12_345.65,
+    1_050_000, 2_250_000, 1.05e9, 4.85e9,
+    -1050, -1_050_000, -2.5,
+]
+
+
+class TestFormatacao(unittest.TestCase):
+
+    def test_format_numbers_igual_a_format_number_nos_empates(self):
+        self.assertEqual(format_numbers(EMPATES).tolist(), [format_number(v) for v in EMPATES])
+        self.assertEqual(format_numbers([1050, 1_050_000]).tolist(), ['1.1K', '1.1M'])
+
+    def test_format_numbers_igual_a_format_number(self):
+        rng = np.random.default_rng(0)
+        valores = np.concatenate([
+            rng.uniform(-1e10, 1e10, 2000),
+            np.round(rng.uniform(0, 1e6, 2000), 2),
+            [np.nan, 0, -0.3],
+        ])
+        self.assertEqual(format_numbers(valores).tolist(), [format_number(v) for v in valores])
+
+    def test_format_percent_igual_ao_f_string(self):
+        valores = [1.005, 0.125, 2.675, 83.455, 50.0]
+        self.assertEqual(format_percent(valores).tolist(), [f'{v:.2f}%' for v in valores])
+        self.assertEqual(format_percent([np.nan]).tolist(), [''])
+
+
+if __name__ == '__main__':
+    unittest.main()
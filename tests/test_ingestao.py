@@ -0,0 +1,83 @@
+"""Ingestão incremental com bases locais no formato do gov.br (``;``, latin1, vírgula decimal)."""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingestao import ARQUIVO_PARTICAO, MANIFESTO, ingerir_fonte, ler_fonte, load_manifesto
+
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+BASE_V1 = os.path.join(FIXTURES, 'anac_2024_v1.csv')
+# Mesma base com fevereiro revisado (passageiros pagos de uma rota da TAM)
+BASE_V2 = os.path.join(FIXTURES, 'anac_2024_v2.csv')
+
+
+def arquivo_particao(dataset_path, ano, mes):
+    return os.path.join(dataset_path, f'ano={ano}', f'mes={mes}', ARQUIVO_PARTICAO)
+
+
+class TestIngestao(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.dataset = os.path.join(self.tmp, 'operacional')
+        # A fonte é sempre o mesmo caminho, como a URL de uma base anual
+        self.fonte = os.path.join(self.tmp, 'base_2024.csv')
+        shutil.copy(BASE_V1, self.fonte)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_dt_referencia_vem_de_ano_e_mes(self):
+        df = pd.concat(ler_fonte(BASE_V1, chunksize=3))
+        self.assertNotIn('ANO', df.columns)
+        self.assertNotIn('MÊS', df.columns)
+        self.assertEqual(
+            df['dt_referencia'].tolist(),
+            [pd.Timestamp('2024-01-01')] * 2 + [pd.Timestamp('2024-02-01')] * 2,
+        )
+        # Vírgula decimal lida como separador de casas
+        self.assertEqual(df['ASK'].iloc[0], 2500000.5)
+
+    def test_fonte_inalterada_e_ignorada(self):
+        primeira = ingerir_fonte(self.fonte, self.dataset)
+        self.assertEqual(primeira['gravados'], ['2024-01', '2024-02'])
+        manifesto = load_manifesto(self.dataset)
+        self.assertEqual(manifesto['fontes'][self.fonte]['meses'], ['2024-01', '2024-02'])
+        mtimes = {mes: os.stat(arquivo_particao(self.dataset, 2024, mes)).st_mtime_ns for mes in (1, 2)}
+        mtime_manifesto = os.stat(os.path.join(self.dataset, MANIFESTO)).st_mtime_ns
+
+        segunda = ingerir_fonte(self.fonte, self.dataset)
+        self.assertEqual(segunda['gravados'], [])
+        self.assertEqual(segunda['inalterados'], ['2024-01', '2024-02'])
+        self.assertEqual(load_manifesto(self.dataset)['fontes'][self.fonte]['sha256'], manifesto['fontes'][self.fonte]['sha256'])
+        # O sha256 da fonte bate com o do manifesto: nada é lido nem regravado
+        self.assertEqual(os.stat(os.path.join(self.dataset, MANIFESTO)).st_mtime_ns, mtime_manifesto)
+        for mes, mtime in mtimes.items():
+            self.assertEqual(os.stat(arquivo_particao(self.dataset, 2024, mes)).st_mtime_ns, mtime)
+
+    def test_mes_alterado_regrava_so_a_particao(self):
+        ingerir_fonte(self.fonte, self.dataset)
+        janeiro = os.stat(arquivo_particao(self.dataset, 2024, 1)).st_mtime_ns
+
+        shutil.copy(BASE_V2, self.fonte)
+        resultado = ingerir_fonte(self.fonte, self.dataset)
+        self.assertEqual(resultado['gravados'], ['2024-02'])
+        self.assertEqual(resultado['inalterados'], ['2024-01'])
+        self.assertEqual(os.stat(arquivo_particao(self.dataset, 2024, 1)).st_mtime_ns, janeiro)
+
+        fevereiro = pd.read_parquet(arquivo_particao(self.dataset, 2024, 2))
+        tam = fevereiro[fevereiro['EMPRESA (SIGLA)'] == 'TAM']
+        self.assertEqual(tam['PASSAGEIROS PAGOS'].tolist(), [21000.0])
+        self.assertEqual(sorted(os.listdir(os.path.dirname(arquivo_particao(self.dataset, 2024, 2)))), [ARQUIVO_PARTICAO])
+        self.assertTrue(os.path.exists(os.path.join(self.dataset, MANIFESTO)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+"""Linhas, bytes e erros registrados pelas saídas instrumentadas."""
+import os
+import sys
+import unittest
+
+import pandas as pd
+from shiny.types import SilentException
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cubo import Agregados
+from metricas import Metricas
+
+
+class TestInstrumentar(unittest.TestCase):
+
+    def setUp(self):
+        self.metricas = Metricas(['log'])
+
+    def saida(self, nome):
+        return self.metricas.resumo()['saidas'][nome]
+
+    def test_calc_sem_argumentos_registra_linhas_do_resultado(self):
+        @self.metricas.instrumentar
+        def rotas_principais():
+            return pd.DataFrame({'RPK': range(7)})
+
+        rotas_principais()
+        self.assertEqual(self.saida('rotas_principais')['linhas'], 7)
+
+    def test_agregados_somam_as_linhas_dos_frames(self):
+        frame = pd.DataFrame({'RPK': range(3)})
+
+        @self.metricas.instrumentar
+        def agregados_operacionais():
+            return Agregados(pd.Series({'RPK': 3.0}), frame, frame.iloc[:2], 10, frame.iloc[:1])
+
+        agregados_operacionais()
+        self.assertEqual(self.saida('agregados_operacionais')['linhas'], 6)
+
+    def test_argumentos_tem_precedencia_e_textos_registram_bytes(self):
+        @self.metricas.instrumentar(nome='plot.montar')
+        def montar(trimestral, anterior=None):
+            return 'ção'
+
+        montar(pd.DataFrame({'RPK': range(4)}))
+        self.assertEqual(self.saida('plot.montar')['linhas'], 4)
+        self.assertEqual(self.saida('plot.montar')['bytes'], len('ção'.encode()))
+
+    def test_saida_silenciosa_nao_e_erro(self):
+        @self.metricas.instrumentar
+        def aguardando():
+            raise SilentException()
+
+        with self.assertRaises(SilentException):
+            aguardando()
+        self.assertNotIn('aguardando', self.metricas.resumo()['saidas'])
+
+    def test_desligado_retorna_a_propria_funcao(self):
+        def kpi_ask():
+            return '1.0B'
+
+        self.assertIs(Metricas().instrumentar(kpi_ask), kpi_ask)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""Visões padrão pré-renderizadas: gravação, leitura e correspondência com os filtros do app."""
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cubo import agregar_selecao, filtrar_selecao
+from figuras import figura_trimestral
+from ingestao import ingerir_fonte
+from padrao import (
+    EMPRESAS_PADRAO, GRUPOS, escrever_padrao, figura, filtros_padrao, ler_padrao, renderizar_padrao, saidas_padrao,
+    textos_operacionais,
+)
+from snapshot import montar_snapshot
+
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+class TestPadrao(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        dataset = os.path.join(cls.tmp, 'operacional')
+        ingerir_fonte(os.path.join(FIXTURES, 'anac_2024_v1.csv'), dataset)
+        cls.snapshot = montar_snapshot(dataset_path=dataset)
+        escrever_padrao(renderizar_padrao(cls.snapshot), cls.tmp)
+        cls.padrao = ler_padrao(cls.tmp)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def test_grava_todos_os_grupos(self):
+        self.assertEqual(set(self.padrao), set(GRUPOS))
+        for grupo, nomes in GRUPOS.items():
+            self.assertEqual(len(self.padrao[grupo]['filtros']), len(nomes))
+        self.assertIsNone(ler_padrao(os.path.join(self.tmp, 'operacional')))
+
+    def test_filtros_do_app_encontram_as_saidas(self):
+        # O app passa datas, tuplas ordenadas e a comparação como vêm das entradas
+        inicio = datetime.date(2024, 1, 1)
+        fim = datetime.date(2024, 2, 1)
+        saidas = saidas_padrao(self.padrao, 'operacional', inicio, fim, tuple(EMPRESAS_PADRAO), 'nenhuma')
+        self.assertIsNotNone(saidas)
+        agregados = agregar_selecao(*filtrar_selecao(self.snapshot.cubo, self.snapshot.indice_destinos, inicio, fim, EMPRESAS_PADRAO))
+        for nome, texto in textos_operacionais(agregados).items():
+            self.assertEqual(saidas[nome], texto)
+
+        periodo, empresas, comparacao = filtros_padrao(self.snapshot)['kpis_financeiros']
+        self.assertIsNotNone(saidas_padrao(self.padrao, 'kpis_financeiros', periodo, tuple(empresas), comparacao))
+
+    def test_outros_filtros_calculam_ao_vivo(self):
+        inicio, fim, empresas, _ = filtros_padrao(self.snapshot)['operacional']
+        for filtros in [
+            (inicio, fim, ('AZU', 'GLO'), 'nenhuma'),
+            (inicio, fim, tuple(EMPRESAS_PADRAO), 'yoy'),
+            (inicio, datetime.date(2024, 1, 1), tuple(EMPRESAS_PADRAO), 'nenhuma'),
+        ]:
+            with self.subTest(filtros=filtros):
+                self.assertIsNone(saidas_padrao(self.padrao, 'operacional', *filtros))
+        # Versão publicada antes das visões padrão
+        self.assertIsNone(saidas_padrao(None, 'operacional', inicio, fim, tuple(empresas), 'nenhuma'))
+
+    def test_figura_gravada_igual_a_ao_vivo(self):
+        inicio, fim, empresas, _ = filtros_padrao(self.snapshot)['operacional']
+        agregados = agregar_selecao(*filtrar_selecao(self.snapshot.cubo, self.snapshot.indice_destinos, inicio, fim, empresas))
+        ao_vivo = figura_trimestral(agregados.trimestral, 'DECOLAGENS')
+        gravada = figura(self.padrao['operacional']['saidas']['plot_decolagens'])
+        self.assertEqual(len(gravada.data), len(ao_vivo.data))
+        for trace_gravado, trace in zip(gravada.data, ao_vivo.data):
+            self.assertEqual(trace_gravado.name, trace.name)
+            # Arrays numéricos voltam como arrays, e não como o dict base64 do JSON
+            self.assertIsInstance(trace_gravado.y, np.ndarray)
+            np.testing.assert_array_equal(trace_gravado.y, np.asarray(trace.y))
+
+
+if __name__ == '__main__':
+    unittest.main()
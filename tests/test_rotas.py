@@ -0,0 +1,89 @@
+"""Índice de rotas: top-N, empresas por aeroporto e série de rota conferidos contra as linhas de rota."""
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dados import COLUNAS_METRICAS, tipar_operacional
+from rotas import COLUNA_DESTINO, COLUNA_ORIGEM, build_indice_rotas, empresas_aeroporto, serie_rota, top_rotas
+
+
+AEROPORTOS = ['SBGR', 'SBSP', 'SBRJ', 'SBKP', 'SBBR', 'SBCF', 'SBPA', 'SBRF']
+EMPRESAS = ['AZU', 'GLO', 'TAM']
+INICIO, FIM = '2023-03-01', '2023-10-01'
+
+
+def linhas_rota(linhas=3000, semente=0):
+    """Linhas de rota sintéticas, com rotas repetidas no mesmo mês e empresa"""
+    rng = np.random.default_rng(semente)
+    df = pd.DataFrame({
+        'dt_referencia': pd.date_range('2023-01-01', periods=12, freq='MS')[rng.integers(0, 12, linhas)],
+        'EMPRESA (SIGLA)': rng.choice(EMPRESAS, linhas),
+        'EMPRESA (NACIONALIDADE)': 'BRASILEIRA',
+        COLUNA_ORIGEM: rng.choice(AEROPORTOS, linhas),
+        COLUNA_DESTINO: rng.choice(AEROPORTOS, linhas),
+        **{coluna: rng.integers(0, 1000, linhas).astype('float64') for coluna in COLUNAS_METRICAS},
+    })
+    return tipar_operacional(df)
+
+
+class TestRotas(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.linhas = linhas_rota()
+        cls.indice = build_indice_rotas(cls.linhas)
+
+    def recorte(self, empresas):
+        df = self.linhas
+        return df[df['dt_referencia'].between(INICIO, FIM) & df['EMPRESA (SIGLA)'].isin(empresas)]
+
+    def test_indice_preserva_os_totais(self):
+        self.assertEqual(self.indice.chaves.dtype, np.int32)
+        self.assertTrue((np.diff(self.indice.chaves[0]) >= 0).all())
+        np.testing.assert_allclose(self.indice.metricas.sum(axis=1), self.linhas[COLUNAS_METRICAS].sum())
+
+    def test_top_rotas(self):
+        linhas = self.recorte(['AZU', 'GLO'])
+        for metrica in ['RPK', 'PASSAGEIROS PAGOS']:
+            with self.subTest(metrica=metrica):
+                top = top_rotas(self.indice, INICIO, FIM, ['AZU', 'GLO'], metrica=metrica, n=5)
+                somas = linhas.groupby([COLUNA_ORIGEM, COLUNA_DESTINO], observed=True)[metrica].sum()
+                esperado = somas.sort_values(ascending=False, kind='stable').head(5)
+                self.assertEqual(len(top), 5)
+                np.testing.assert_allclose(top[metrica], esperado)
+                self.assertEqual(list(zip(top['ORIGEM'], top['DESTINO'])), esperado.index.tolist())
+                np.testing.assert_allclose(top['PARTICIPAÇÃO'], esperado / somas.sum() * 100)
+
+    def test_top_rotas_sem_rotas_no_periodo(self):
+        top = top_rotas(self.indice, '2030-01-01', '2030-12-01')
+        self.assertTrue(top.empty)
+        self.assertIn('PARTICIPAÇÃO', top.columns)
+
+    def test_empresas_aeroporto(self):
+        linhas = self.recorte(EMPRESAS)
+        linhas = linhas[(linhas[COLUNA_ORIGEM] == 'SBKP') | (linhas[COLUNA_DESTINO] == 'SBKP')]
+        df = empresas_aeroporto(self.indice, 'SBKP', INICIO, FIM)
+        esperado = linhas.groupby('EMPRESA (SIGLA)', observed=True)[COLUNAS_METRICAS].sum()
+        self.assertEqual(df['EMPRESA (SIGLA)'].tolist(), esperado.index.tolist())
+        np.testing.assert_allclose(df[COLUNAS_METRICAS], esperado)
+        self.assertTrue(empresas_aeroporto(self.indice, 'XXXX', INICIO, FIM).empty)
+
+    def test_serie_rota(self):
+        linhas = self.recorte(['TAM', 'GLO'])
+        linhas = linhas[(linhas[COLUNA_ORIGEM] == 'SBGR') & (linhas[COLUNA_DESTINO] == 'SBRJ')]
+        df = serie_rota(self.indice, 'SBGR', 'SBRJ', INICIO, FIM, ['TAM', 'GLO'])
+        esperado = linhas.groupby(['dt_referencia', 'EMPRESA (SIGLA)'], observed=True)[COLUNAS_METRICAS].sum()
+        self.assertEqual(list(zip(df['dt_referencia'], df['EMPRESA (SIGLA)'])), esperado.index.tolist())
+        np.testing.assert_allclose(df[COLUNAS_METRICAS], esperado)
+        # O sentido da rota importa
+        volta = serie_rota(self.indice, 'SBRJ', 'SBGR', INICIO, FIM, ['TAM', 'GLO'])
+        self.assertNotEqual(volta['RPK'].sum(), df['RPK'].sum())
+
+
+if __name__ == '__main__':
+    unittest.main()